@@ -0,0 +1,428 @@
+import os
+import sys
+import json
+import gzip
+import time
+import argparse
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from openai_client import create_client
+from dotenv import load_dotenv
+from consistency_check import check_consistency, remove_stale_entries
+
+logger = logging.getLogger(__name__)
+
+# Every command works from one snapshot of the account's files, vector stores and assistant,
+# reused from disk while it is younger than SNAPSHOT_MAX_AGE so consecutive commands list
+# the catalog once. Deleting commands update the snapshot rather than invalidating it.
+
+# Bump when the snapshot layout changes so old snapshots are refetched
+SNAPSHOT_FORMAT = 1
+
+SNAPSHOT_FILE = os.getenv('ADMIN_SNAPSHOT_FILE', 'admin_snapshot.json.gz')
+SNAPSHOT_MAX_AGE = int(os.getenv('ADMIN_SNAPSHOT_MAX_AGE', 300))
+
+# Deletes run on a thread pool; the OpenAI client paces them to the account's quota,
+# and ADMIN_MUTATION_RATE can cap them lower (0 means no extra cap)
+MUTATION_WORKERS = int(os.getenv('ADMIN_MUTATION_WORKERS', 8))
+MUTATION_RATE = float(os.getenv('ADMIN_MUTATION_RATE', 0))
+
+LIST_PAGE_SIZE = 100
+CATEGORIES_FILE = 'categories.json'
+DIFF_FILE = 'consistency_diff.jsonl'
+
+def is_test_file(filename):
+    return filename.startswith('test') or filename == 'sample.txt'
+
+def is_test_store(store):
+    return store['name'] is None or store['name'].lower().startswith('test')
+
+def list_all(list_method, **params):
+    """Yield every item of a cursor-paginated OpenAI listing."""
+    params = {'limit': LIST_PAGE_SIZE, **params}
+    while True:
+        page = list_method(**params)
+        data = page.data or []
+        for item in data:
+            yield item
+        has_more = getattr(page, 'has_more', None)
+        if not data or has_more is False or (has_more is None and len(data) < params['limit']):
+            return
+        params['after'] = data[-1].id
+
+def assistant_vector_store_ids(assistant):
+    tool_resources = getattr(assistant, 'tool_resources', None)
+    file_search = getattr(tool_resources, 'file_search', None) if tool_resources else None
+    return list(getattr(file_search, 'vector_store_ids', None) or [])
+
+class Snapshot:
+    """Files, vector stores and assistant details fetched together and cached on disk."""
+
+    def __init__(self, client, path=SNAPSHOT_FILE, max_age=SNAPSHOT_MAX_AGE, assistant_id=None, refresh=False):
+        self.client = client
+        self.path = path
+        self.max_age = max_age
+        self.assistant_id = assistant_id
+        self.refresh = refresh
+        self.data = None
+
+    def load(self):
+        """Return the snapshot, fetching a new one if it is missing, stale or a refresh was asked for."""
+        if not self.refresh and self.data is None:
+            self.data = self._read()
+        if self.refresh or self.data is None or time.time() - self.data['fetched_at'] > self.max_age:
+            self.data = self._fetch()
+            self.refresh = False
+            self._write()
+        return self.data
+
+    def _read(self):
+        try:
+            with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('format') != SNAPSHOT_FORMAT or data.get('assistant_id') != self.assistant_id:
+                return None
+            logger.info(f"Using snapshot of {len(data['files'])} files from {time.time() - data['fetched_at']:.0f}s ago")
+            return data
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Error reading admin snapshot: {str(e)}")
+            return None
+
+    def _write(self):
+        try:
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+                json.dump(self.data, f, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"Error saving admin snapshot: {str(e)}")
+
+    def _fetch(self):
+        logger.info("Fetching files, vector stores and assistant from OpenAI...")
+        files = [{
+            'id': file.id,
+            'filename': file.filename,
+            'purpose': file.purpose,
+            'created_at': file.created_at,
+            'bytes': file.bytes
+        } for file in list_all(self.client.files.list)]
+        stores = [{'id': store.id, 'name': store.name} for store in list_all(self.client.beta.vector_stores.list)]
+        assistant = None
+        if self.assistant_id:
+            details = self.client.beta.assistants.retrieve(self.assistant_id)
+            assistant = {'id': details.id, 'name': details.name, 'vector_store_ids': assistant_vector_store_ids(details)}
+        logger.info(f"Fetched {len(files)} files and {len(stores)} vector stores")
+        return {
+            'format': SNAPSHOT_FORMAT,
+            'fetched_at': time.time(),
+            'assistant_id': self.assistant_id,
+            'assistant': assistant,
+            'files': files,
+            'vector_stores': stores
+        }
+
+    def forget(self, file_ids=(), store_ids=()):
+        """Drop deleted files and vector stores so the snapshot stays usable."""
+        file_ids, store_ids = set(file_ids), set(store_ids)
+        if not file_ids and not store_ids:
+            return
+        self.data['files'] = [f for f in self.data['files'] if f['id'] not in file_ids]
+        self.data['vector_stores'] = [s for s in self.data['vector_stores'] if s['id'] not in store_ids]
+        self._write()
+
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart across threads."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0
+        self._lock = threading.Lock()
+        self._next_at = 0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = max(0, self._next_at - now)
+            self._next_at = max(now, self._next_at) + self.interval
+        if delay:
+            time.sleep(delay)
+
+def run_mutations(items, action, workers=MUTATION_WORKERS, rate=MUTATION_RATE):
+    """Apply action to every item in parallel under a shared rate limit.
+
+    Returns (succeeded, failed) where failed is a list of (item, error message).
+    """
+    limiter = RateLimiter(rate)
+
+    def run(item):
+        limiter.wait()
+        try:
+            action(item)
+            return item, None
+        except Exception as e:
+            logger.error(f"Error applying change to {item}: {str(e)}")
+            return item, str(e)
+
+    succeeded, failed = [], []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for item, error in executor.map(run, items):
+            if error is None:
+                succeeded.append(item)
+            else:
+                failed.append((item, error))
+    return succeeded, failed
+
+def count_files(snapshot, args):
+    """Count non-test files by extension."""
+    extension_count = defaultdict(int)
+    files = [f for f in snapshot.load()['files'] if not is_test_file(f['filename'])]
+    for file in files:
+        ext = os.path.splitext(file['filename'])[1].lower()
+        extension_count[ext or 'no extension'] += 1
+    return {'total': len(files), 'by_extension': dict(sorted(extension_count.items()))}
+
+def print_count(result):
+    print(f"Total BWE Files: {result['total']}")
+    print("\nBreakdown by type:")
+    for ext, count in result['by_extension'].items():
+        print(f"- {ext}: {count} files")
+
+def duplicate_groups(files):
+    """Map filename to its files, newest first, for every filename uploaded more than once."""
+    by_name = defaultdict(list)
+    for file in files:
+        if not is_test_file(file['filename']):
+            by_name[file['filename']].append(file)
+    return {
+        filename: sorted(group, key=lambda f: (f['created_at'], f['id']), reverse=True)
+        for filename, group in by_name.items() if len(group) > 1
+    }
+
+def find_near_duplicates(filenames):
+    """Return near-duplicate clusters among the given {file_id: filename} files."""
+    from text_index import TextIndex
+    from near_duplicates import NearDuplicateIndex
+
+    text_index = TextIndex(os.getenv('TEXT_INDEX_FILE', 'text_index.sqlite3'))
+    index = NearDuplicateIndex(os.getenv('NEAR_DUPLICATE_INDEX_FILE', 'near_duplicates.sqlite3'))
+
+    # Sign any indexed documents that arrived before near-duplicate detection existed
+    index.add_documents([
+        (file_id, text) for file_id, filename, text in text_index.documents()
+        if text and file_id not in index and file_id in filenames
+    ])
+    return [cluster for cluster in index.clusters() if all(file_id in filenames for file_id in cluster['files'])]
+
+def find_duplicates(snapshot, args):
+    """Report test files, files uploaded more than once and near-duplicate documents."""
+    files = snapshot.load()['files']
+    filenames = {f['id']: f['filename'] for f in files}
+    return {
+        'test_files': [{'id': f['id'], 'filename': f['filename']} for f in files if is_test_file(f['filename'])],
+        'duplicates': {filename: [f['id'] for f in group] for filename, group in duplicate_groups(files).items()},
+        'near_duplicates': [
+            {'files': [{'id': file_id, 'filename': filenames[file_id]} for file_id in cluster['files']],
+             'pairs': cluster['pairs']}
+            for cluster in find_near_duplicates(filenames)
+        ]
+    }
+
+def print_duplicates(result):
+    if result['test_files']:
+        print("Remaining test files:")
+        for file in result['test_files']:
+            print(f"- {file['filename']} (ID: {file['id']})")
+    print("\nDuplicate files:")
+    if not result['duplicates']:
+        print("No duplicate files found.")
+    for filename, file_ids in result['duplicates'].items():
+        print(f"\n{filename}:")
+        for file_id in file_ids:
+            print(f"- ID: {file_id}")
+    print("\nNear-duplicate documents:")
+    if not result['near_duplicates']:
+        print("No near-duplicate documents found.")
+    for cluster in result['near_duplicates']:
+        names = {file['id']: file['filename'] for file in cluster['files']}
+        print("")
+        for file in cluster['files']:
+            print(f"- {file['filename']} (ID: {file['id']})")
+        for a, b, similarity in cluster['pairs']:
+            print(f"  {names[a]} ~ {names[b]}: {similarity:.0%} similar")
+
+def delete_files(snapshot, client, files, args):
+    """Delete files unless this is a dry run, and report the outcome per file."""
+    if args.dry_run:
+        return [], []
+    deleted, failed = run_mutations(files, lambda f: client.files.delete(f['id']), args.workers, args.rate)
+    snapshot.forget(file_ids=[f['id'] for f in deleted])
+    return deleted, failed
+
+def cleanup_duplicates(snapshot, args):
+    """Delete every copy of a duplicated filename except the newest."""
+    groups = duplicate_groups(snapshot.load()['files'])
+    to_delete = [f for group in groups.values() for f in group[1:]]
+    deleted, failed = delete_files(snapshot, args.client, to_delete, args)
+    return {
+        'dry_run': args.dry_run,
+        'keep': {filename: group[0]['id'] for filename, group in groups.items()},
+        'planned': [f['id'] for f in to_delete],
+        'deleted': [f['id'] for f in deleted],
+        'failed': [{'id': f['id'], 'error': error} for f, error in failed]
+    }
+
+def print_cleanup_duplicates(result):
+    print(f"Found {len(result['keep'])} files with duplicates. Will keep the newest version of each.")
+    print(f"Files to be deleted: {len(result['planned'])}")
+    for filename, file_id in result['keep'].items():
+        print(f"- KEEP {filename}: {file_id}")
+    print_deletions(result)
+
+def cleanup_test_files(snapshot, args):
+    """Delete test files and unnamed or test vector stores."""
+    data = snapshot.load()
+    files = [f for f in data['files'] if is_test_file(f['filename'])]
+    stores = [s for s in data['vector_stores'] if is_test_store(s)]
+    deleted, failed = delete_files(snapshot, args.client, files, args)
+    deleted_stores, failed_stores = [], []
+    if not args.dry_run:
+        deleted_stores, failed_stores = run_mutations(
+            stores, lambda s: args.client.beta.vector_stores.delete(s['id']), args.workers, args.rate
+        )
+        snapshot.forget(store_ids=[s['id'] for s in deleted_stores])
+    return {
+        'dry_run': args.dry_run,
+        'planned': [f['id'] for f in files] + [s['id'] for s in stores],
+        'deleted': [f['id'] for f in deleted] + [s['id'] for s in deleted_stores],
+        'failed': [{'id': item['id'], 'error': error} for item, error in failed + failed_stores]
+    }
+
+def print_deletions(result):
+    if result['dry_run']:
+        print(f"Dry run: would delete {len(result['planned'])} items")
+        for item_id in result['planned']:
+            print(f"- DELETE {item_id}")
+        return
+    print(f"Deleted {len(result['deleted'])} of {len(result['planned'])} items")
+    for failure in result['failed']:
+        print(f"- FAILED {failure['id']}: {failure['error']}")
+
+def assistant_state(snapshot, args):
+    """Show the assistant, its files and vector stores; test files and unnamed stores only with --all."""
+    data = snapshot.load()
+    return {
+        'assistant': data['assistant'],
+        'files': [
+            {'id': f['id'], 'filename': f['filename']} for f in data['files']
+            if args.all or not is_test_file(f['filename'])
+        ],
+        'vector_stores': [s for s in data['vector_stores'] if args.all or s['name']]
+    }
+
+def print_state(result):
+    if result['assistant']:
+        print(f"Assistant Name: {result['assistant']['name']}")
+    print("\nFiles in OpenAI:")
+    for file in result['files']:
+        print(f"- {file['filename']} (ID: {file['id']})")
+    print("\nVector Stores:")
+    for store in result['vector_stores']:
+        print(f"- {store['name']} (ID: {store['id']})")
+    if result['assistant'] and result['assistant']['vector_store_ids']:
+        print("\nAssistant's Vector Store IDs:")
+        for store_id in result['assistant']['vector_store_ids']:
+            print(f"- {store_id}")
+
+def verify_consistency(snapshot, args):
+    """Compare the category store with the assistant files and drop mappings for deleted files.
+
+    Streams the listing straight from OpenAI instead of using the snapshot,
+    so memory stays bounded on very large catalogs.
+    """
+    openai_files = ((file.id, file.filename) for file in list_all(args.client.files.list, purpose='assistants'))
+    diff = sys.stdout if args.diff == '-' else open(args.diff, 'w')
+    try:
+        summary, stale_ids = check_consistency(openai_files, args.categories_file, diff)
+    finally:
+        if diff is not sys.stdout:
+            diff.close()
+    removed = 0
+    refused = False
+    if stale_ids and not summary['openai_files'] and not args.force:
+        # An empty listing is far more likely an outage than a deleted knowledge base
+        logger.warning(f"OpenAI listed no files; not removing {len(stale_ids)} category entries (use --force to remove them)")
+        refused = True
+    elif stale_ids and not args.dry_run:
+        removed = remove_stale_entries(args.categories_file, stale_ids)
+    return dict(summary, dry_run=args.dry_run, removed=removed, refused=refused, diff=args.diff)
+
+def print_consistency(result):
+    print("File Consistency Check:")
+    print(f"Files in OpenAI: {result['openai_files']}")
+    print(f"Files in categories: {result['categorized_files']}")
+    print(f"Files in categories but not in OpenAI: {result['missing_from_openai']} ({result['removed']} removed)")
+    print(f"Files in OpenAI but not categorized: {result['missing_from_categories']}")
+    if result['refused']:
+        print("OpenAI listed no files, so no entries were removed (use --force to remove them)")
+    if result['diff'] != '-':
+        print(f"Differences written to {result['diff']}")
+
+COMMANDS = {
+    'count': (count_files, print_count, "Count files by extension"),
+    'duplicates': (find_duplicates, print_duplicates, "Report test files, duplicate names and near-duplicate documents"),
+    'cleanup-duplicates': (cleanup_duplicates, print_cleanup_duplicates, "Delete all but the newest copy of duplicated files"),
+    'cleanup-test-files': (cleanup_test_files, print_deletions, "Delete test files and test vector stores"),
+    'state': (assistant_state, print_state, "Show the assistant, files and vector stores"),
+    'verify': (verify_consistency, print_consistency, "Check the category store against OpenAI"),
+}
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Manage the OpenAI files behind the assistant",
+        epilog="example: python admin_cli.py --json duplicates"
+    )
+    parser.add_argument('--json', action='store_true', help="print results as JSON")
+    parser.add_argument('--refresh', action='store_true', help="fetch a new snapshot even if the cached one is fresh")
+    parser.add_argument('--max-age', type=int, default=SNAPSHOT_MAX_AGE, help="reuse a cached snapshot up to this many seconds old")
+    parser.add_argument('--snapshot', default=SNAPSHOT_FILE, help="where the snapshot is cached")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for name, (command, printer, help_text) in COMMANDS.items():
+        subparser = subparsers.add_parser(name, help=help_text)
+        if name in ('cleanup-duplicates', 'cleanup-test-files', 'verify'):
+            subparser.add_argument('--dry-run', action='store_true', help="report what would change without changing it")
+        if name in ('cleanup-duplicates', 'cleanup-test-files'):
+            subparser.add_argument('--workers', type=int, default=MUTATION_WORKERS, help="parallel delete requests")
+            subparser.add_argument('--rate', type=float, default=MUTATION_RATE, help="cap on delete requests per second (0: as fast as the quota allows)")
+        if name == 'state':
+            subparser.add_argument('--all', action='store_true', help="include test files and unnamed vector stores")
+        if name == 'verify':
+            subparser.add_argument('--categories-file', default=CATEGORIES_FILE)
+            subparser.add_argument('--diff', default=DIFF_FILE, help="where to write differences as JSON lines ('-' for stdout)")
+            subparser.add_argument('--force', action='store_true', help="remove entries even when OpenAI lists no files at all")
+    return parser
+
+def main(argv=None, client=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.json and getattr(args, 'diff', None) == '-':
+        # Both would go to stdout and the JSON would no longer parse
+        parser.error("--diff - cannot be combined with --json; write the diff to a file")
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    args.client = client or create_client(default_headers={"OpenAI-Beta": "assistants=v2"})
+    snapshot = Snapshot(args.client, args.snapshot, args.max_age, os.getenv('OPENAI_ASSISTANT_ID'), args.refresh)
+
+    command, printer, help_text = COMMANDS[args.command]
+    result = command(snapshot, args)
+    if args.json:
+        json.dump(result, sys.stdout, indent=2)
+        print()
+    else:
+        printer(result)
+    return 1 if result.get('failed') or result.get('refused') else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,13 +1,35 @@
 import os
 import json
-import calendar
+import base64
+import bisect
+import mimetypes
 import re
+import itertools
+import threading
+import uuid
+from collections import Counter
+from functools import lru_cache
 from datetime import datetime
-from flask import Flask, render_template, request, jsonify, send_from_directory, redirect, url_for, flash
+from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session, send_file
 from werkzeug.utils import secure_filename
+from urllib.parse import quote
 import logging
 import sys
-from assistant_analyzer import AssistantAnalyzer
+from assistant_analyzer import AssistantAnalyzer, OPENAI_UNAVAILABLE_MESSAGE
+from circuit_breaker import CircuitOpenError
+from catalog_version import CatalogVersion
+from shared_cache import SharedCatalog
+from static_assets import load_manifest, static_response, compress_response
+from logging_config import configure_logging
+from gap_engine import GapEngine, month_index, month_label, current_month_index
+from series_index import SeriesIndex
+from ingestion_tracker import IngestionTracker
+from text_index import TextIndex
+from near_duplicates import NearDuplicateIndex
+from categorizer import CategorizationRules, CategorizationCache
+from file_cache import FileCache, CHUNK_SIZE
+from preview_pipeline import PreviewStore, PreviewPipeline, download_to_temp
+from task_queue import TaskQueue
 from pathlib import Path
 from dotenv import load_dotenv
 from flask_cors import CORS
@@ -16,14 +38,7 @@ from flask_cors import CORS
 load_dotenv()
 
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('app.log'),
-        logging.StreamHandler()
-    ]
-)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Configure Flask logging
@@ -35,7 +50,8 @@ logging.getLogger('werkzeug').disabled = True
 cli = sys.modules['flask.cli']
 cli.show_server_banner = lambda *x: None
 
-app = Flask(__name__)
+# Static files are served by serve_static so they get fingerprinting and precompression
+app = Flask(__name__, static_folder=None)
 CORS(app)  # Enable CORS for all routes
 app.logger.setLevel(logging.INFO)
 
@@ -57,155 +73,178 @@ app.config.update(
     SECRET_KEY=os.urandom(24)
 )
 
+# Catalog shared by the worker processes on this host; set CATALOG_SHARED_DB empty to disable
+shared_catalog_path = os.getenv('CATALOG_SHARED_DB', 'catalog_cache.sqlite3')
+shared_catalog = SharedCatalog(shared_catalog_path) if shared_catalog_path else None
+
 # Initialize OpenAI Assistant
 analyzer = AssistantAnalyzer(
     api_key=os.getenv('OPENAI_API_KEY'),
     assistant_id=os.getenv('OPENAI_ASSISTANT_ID'),
-    vector_store_id=os.getenv('OPENAI_VECTOR_STORE_ID')
+    vector_store_id=os.getenv('OPENAI_VECTOR_STORE_ID'),
+    snapshot_path=os.getenv('CATALOG_SNAPSHOT_FILE', 'catalog_snapshot.json.gz'),
+    categories_file=CATEGORIES_FILE,
+    shared_cache=shared_catalog
+)
+
+# Follows vector store indexing of uploads so the UI can tell when files become searchable
+ingestion_tracker = IngestionTracker(analyzer, store=shared_catalog)
+
+# Full-text index of extracted document text for content search
+text_index = TextIndex(os.getenv('TEXT_INDEX_FILE', 'text_index.sqlite3'))
+analyzer.add_catalog_listener(text_index.on_catalog_change)
+
+# MinHash signatures of document text for spotting re-scanned or renamed copies
+near_duplicate_index = NearDuplicateIndex(os.getenv('NEAR_DUPLICATE_INDEX_FILE', 'near_duplicates.sqlite3'))
+analyzer.add_catalog_listener(near_duplicate_index.on_catalog_change)
+
+# Downloaded document content, kept on disk so popular files are served without asking OpenAI again
+file_cache = FileCache(os.getenv('FILE_CACHE_DIR', 'file_cache'))
+analyzer.add_catalog_listener(file_cache.on_catalog_change)
+
+def preview_source(file):
+    """Local copy of a file for the preview pipeline; uncached files are downloaded to a temporary file."""
+    path = file_cache.lookup(file['id'])
+    if path:
+        return path, False
+    return download_to_temp(analyzer.stream_file_content(file['id'], CHUNK_SIZE)), True
+
+def index_document_text(documents):
+    """Add text parsed by the preview pipeline to the search and near-duplicate indexes."""
+    text_index.add_documents(documents)
+    near_duplicate_index.add_documents([(file_id, text) for file_id, filename, text in documents if text])
+
+# First-page text, page and word counts, parsed in a process pool outside of requests; the full
+# text parsed along the way is indexed for search
+preview_store = PreviewStore(os.getenv('PREVIEW_FILE', 'previews.json'))
+preview_pipeline = PreviewPipeline(preview_store, preview_source, leases=shared_catalog, on_text=index_document_text)
+analyzer.add_catalog_listener(preview_pipeline.on_catalog_change)
+
+# Keyword rules live in a data file and are picked up again whenever it is edited
+categorization_rules = CategorizationRules(os.getenv('CATEGORIZATION_RULES_FILE', 'categorization_rules.json'))
+
+# Keyword scoring model shared by uploads, listings and reconciliation; results are
+# remembered next to the category store and rescored only where the rules change
+categorizer = CategorizationCache(
+    categorization_rules,
+    os.getenv('CATEGORIZATION_CACHE_FILE', os.path.join(os.path.dirname(CATEGORIES_FILE), 'categorization_cache.json'))
 )
 
+# Deletions and category reassignments are persisted here and run by worker threads,
+# so requests return at once and interrupted work resumes after a restart
+task_queue = TaskQueue(os.getenv('TASK_QUEUE_DB', 'tasks.sqlite3'))
+
+# Map logical static paths to their fingerprinted build outputs
+asset_manifest = load_manifest()
+
+@app.template_global()
+def asset_url(filename):
+    """URL of the fingerprinted build of a static asset, falling back to the source file."""
+    return url_for('serve_static', filename=asset_manifest.get(filename, filename))
+
+@app.template_global()
+def file_preview(file_id):
+    """Stored preview of a file for templates, or None while it is still being generated."""
+    return preview_store.get(file_id)
+
+@app.after_request
+def compress_html(response):
+    """Compress page and JSON responses for clients that accept it."""
+    if request.endpoint == 'file_content':
+        # Document content is passed through as stored, even when it is HTML
+        return response
+    return compress_response(request, response)
+
+# Catalog version shared by all workers; drives ETag/Last-Modified headers
+catalog_version = CatalogVersion(os.getenv('CATALOG_VERSION_FILE', 'catalog_version.json'))
+
+# How long a reconciliation with OpenAI is trusted before conditional requests re-check it
+CATALOG_REVALIDATE_SECONDS = int(os.getenv('CATALOG_REVALIDATE_SECONDS', 60))
+
+def on_catalog_change(event, file):
+    """Invalidate cached responses when a sync finds files added or removed outside this worker."""
+    catalog_version.bump(f"file {event}: {file['id']}")
+
+analyzer.add_catalog_listener(on_catalog_change)
+
 ALLOWED_EXTENSIONS = {'txt', 'pdf', 'doc', 'docx', 'xls', 'xlsx', 'csv', 'md'}
 
+# Categories expected to hold one report per month
+MONTHLY_REPORT_CATEGORIES = ["Financial Reports", "Building Management"]
+
+# Gap results are cached per series until its months change
+gap_engine = GapEngine()
+
+# How long a category deletion waits for its queued reassignment before redirecting
+CATEGORY_TASK_WAIT_SECONDS = 2
+
+# Upper bound on items accepted by /update_categories in one request
+MAX_BULK_UPDATES = 1000
+
+# Serializes read-modify-write cycles on the categories file within a worker
+categories_lock = threading.Lock()
+
+# Category file lists are paged to the browser in chunks of this size
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Sorted file list per category, with the catalog version it was built at
+category_listings = {}
+category_listings_lock = threading.Lock()
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def catalog_revision():
+    """What the integrity pass depends on: the shared catalog version, whether the catalog is stale and the rules."""
+    return (
+        catalog_version.current(),
+        analyzer.catalog_stale if analyzer else None,
+        categorization_rules.current().ruleset_hash
+    )
+
+def revalidate_catalog():
+    """Sync with OpenAI if this worker has not done so recently, and reconcile if that changed anything.
+
+    The integrity pass only runs again once the catalog revision changes, so
+    an empty or stale catalog is not re-checked on every request.
+    """
+    if catalog_version.verified_within(CATALOG_REVALIDATE_SECONDS):
+        return
+    if analyzer:
+        analyzer.get_file_list()
+    revision = catalog_revision()
+    if catalog_version.verified_at(revision):
+        catalog_version.mark_verified(revision)
+        return
+    verify_categories_integrity()
+
+def is_not_modified(etag):
+    """Check whether the client already holds the response identified by etag."""
+    # Pending flash messages must be rendered, so never answer 304 while one is queued
+    if session.get('_flashes'):
+        return False
+    return request.if_none_match.contains_weak(etag)
+
+def not_modified_response(etag):
+    """Build an empty 304 response carrying the current validators."""
+    return with_cache_headers(app.response_class(status=304), etag)
+
+def with_cache_headers(response, etag):
+    """Attach ETag and Last-Modified validators derived from the catalog version."""
+    response.set_etag(etag, weak=True)
+    response.last_modified = catalog_version.last_modified()
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 def categorize_file(filename, content):
-    """Improved file categorization based on filename and content."""
-    filename_lower = filename.lower()
-    content_lower = content.lower() if content else ""
-    
-    # Financial Reports
-    financial_keywords = {
-        'financial', 'finance', 'budget', 'expense', 'revenue', 'assessment',
-        'balance sheet', 'income', 'cash flow', 'invoice', 'payment',
-        'accounting', 'fiscal', 'tax', 'audit', 'special assessment'
-    }
-    
-    # Building Management
-    building_keywords = {
-        'building', 'maintenance', 'repair', 'facility', 'property',
-        'renovation', 'upgrade', 'construction', 'improvement',
-        'work schedule', 'inspection'
-    }
-    
-    # Emergency & Safety
-    emergency_keywords = {
-        'emergency', 'safety', 'security', 'evacuation', 'fire',
-        'disaster', 'hazard', 'incident', 'alert', 'warning',
-        'protection', 'prevention'
-    }
-    
-    # Legal & Governance
-    legal_keywords = {
-        'legal', 'law', 'regulation', 'policy', 'compliance', 'contract',
-        'bylaw', 'statute', 'declaration', 'amendment', 'certificate',
-        'articles', 'incorporation', 'governance'
-    }
-    
-    # Insurance & Assessments
-    insurance_keywords = {
-        'insurance', 'assessment', 'claim', 'coverage', 'policy',
-        'liability', 'risk', 'premium', 'deductible', 'certificate'
-    }
-    
-    # Maintenance & Installation
-    maintenance_keywords = {
-        'maintenance', 'installation', 'repair', 'equipment', 'system',
-        'service', 'inspection', 'replacement', 'upgrade', 'fix',
-        'cleaning', 'hvac', 'elevator', 'plumbing'
-    }
-    
-    # Meeting Documents
-    meeting_keywords = {
-        'meeting', 'minutes', 'agenda', 'board', 'committee',
-        'discussion', 'resolution', 'vote', 'attendance', 'quorum'
-    }
-    
-    # Resident Information
-    resident_keywords = {
-        'resident', 'tenant', 'owner', 'occupant', 'community',
-        'neighbor', 'directory', 'contact', 'parking', 'pet',
-        'move-in', 'move-out', 'handbook'
-    }
-    
-    # Rules & Regulations
-    rules_keywords = {
-        'rule', 'regulation', 'guideline', 'policy', 'procedure',
-        'requirement', 'standard', 'restriction', 'conduct', 'code'
-    }
-    
-    # Structural Reports
-    structural_keywords = {
-        'structural', 'engineering', 'inspection', 'foundation',
-        'building envelope', 'roof', 'wall', 'concrete', 'steel',
-        'assessment', 'integrity', 'structure'
-    }
-    
-    # Check content and filename against keywords
-    def check_keywords(text, keywords):
-        return any(keyword in text for keyword in keywords)
-    
-    if check_keywords(filename_lower, financial_keywords):
-        return "Financial Reports"
-    elif check_keywords(filename_lower, building_keywords):
-        return "Building Management"
-    elif check_keywords(filename_lower, emergency_keywords):
-        return "Emergency & Safety"
-    elif check_keywords(filename_lower, legal_keywords):
-        return "Legal & Governance"
-    elif check_keywords(filename_lower, insurance_keywords):
-        return "Insurance & Assessments"
-    elif check_keywords(filename_lower, maintenance_keywords):
-        return "Maintenance & Installation"
-    elif check_keywords(filename_lower, meeting_keywords):
-        return "Meeting Documents"
-    elif check_keywords(filename_lower, resident_keywords):
-        return "Resident Information"
-    elif check_keywords(filename_lower, rules_keywords):
-        return "Rules & Regulations"
-    elif check_keywords(filename_lower, structural_keywords):
-        return "Structural Reports"
-    
-    # If no match found in filename, try content
-    if content:
-        if check_keywords(content_lower, financial_keywords):
-            return "Financial Reports"
-        elif check_keywords(content_lower, building_keywords):
-            return "Building Management"
-        elif check_keywords(content_lower, emergency_keywords):
-            return "Emergency & Safety"
-        elif check_keywords(content_lower, legal_keywords):
-            return "Legal & Governance"
-        elif check_keywords(content_lower, insurance_keywords):
-            return "Insurance & Assessments"
-        elif check_keywords(content_lower, maintenance_keywords):
-            return "Maintenance & Installation"
-        elif check_keywords(content_lower, meeting_keywords):
-            return "Meeting Documents"
-        elif check_keywords(content_lower, resident_keywords):
-            return "Resident Information"
-        elif check_keywords(content_lower, rules_keywords):
-            return "Rules & Regulations"
-        elif check_keywords(content_lower, structural_keywords):
-            return "Structural Reports"
-    
-    # Special cases based on file patterns
-    if 'declaration' in filename_lower or 'amendment' in filename_lower:
-        return "Legal & Governance"
-    elif 'assessment' in filename_lower:
-        return "Insurance & Assessments"
-    elif 'schedule' in filename_lower:
-        return "Building Management"
-    elif 'certificate' in filename_lower:
-        return "Legal & Governance"
-    elif 'reference' in filename_lower:
-        return "Resident Information"
-    
-    return "General Documents"
+    """Pick the best scoring category for a file from its filename and content."""
+    return categorizer.categorize(filename, content)
 
-def extract_month_year(file):
-    """Extract month and year from file metadata and filename."""
-    filename = file.get('filename', '').lower()
+@lru_cache(maxsize=16384)
+def extract_month_year_from_filename(filename):
+    """Extract month and year from a filename, or (None, None) if it carries no date."""
+    filename = filename.lower()
     
     # Try to find a date pattern in the filename
     date_patterns = [
@@ -237,69 +276,87 @@ def extract_month_year(file):
                 if 1 <= month <= 12:
                     return month, year
     
+    return None, None
+
+def filename_month_index(filename):
+    """Month index of the date in a filename, or None if it carries no date."""
+    month, year = extract_month_year_from_filename(filename)
+    return month_index(year, month) if month and year else None
+
+# Files grouped into recurring series by normalized filename; kept current by catalog events
+series_index = SeriesIndex(month_of=filename_month_index, gap_engine=gap_engine)
+analyzer.add_catalog_listener(series_index.on_catalog_change, per_process=True)
+
+def ensure_series_index():
+    """Build the series index from the catalog on first use."""
+    if not series_index.built:
+        series_index.build(analyzer.get_file_list() if analyzer else [])
+    return series_index
+
+def extract_month_year(file):
+    """Extract month and year from file metadata and filename."""
+    month, year = extract_month_year_from_filename(file.get('filename', ''))
+    if month and year:
+        return month, year
+    
     # If no date found in filename, try to use the upload date
     created_at = file.get('created_at')
     if created_at:
         try:
-            date = datetime.strptime(created_at, '%Y-%m-%d')
+            # OpenAI reports created_at as a Unix timestamp
+            if isinstance(created_at, (int, float)):
+                date = datetime.fromtimestamp(created_at)
+            else:
+                date = datetime.strptime(created_at, '%Y-%m-%d')
             return date.month, date.year
-        except ValueError:
+        except (ValueError, OverflowError, OSError):
             pass
     
     return None, None
 
-def identify_gaps(files):
-    """Identify gaps in monthly reports."""
-    if not files:
-        return []
+def identify_gaps(files, series_key='default', filename_dates_only=False, revision=None):
+    """Identify gaps in monthly reports over the last 12 months.
+
+    With a revision, the result cached for it is returned before files are
+    looked at, so files may be a generator that is only consumed on a miss.
+    """
+    if revision is not None:
+        # The window ends at the current month, so a new month is a new revision
+        revision = (revision, current_month_index())
+        cached = gap_engine.cached_months(series_key, revision)
+        if cached is not None:
+            return cached
     
-    # Extract dates and sort files by date
-    dated_files = []
+    # Convert each file's report month to a month index
+    indices = []
     for file in files:
         try:
-            month, year = extract_month_year(file)
+            if filename_dates_only:
+                month, year = extract_month_year_from_filename(file.get('filename', ''))
+            else:
+                month, year = extract_month_year(file)
             if month and year:
-                dated_files.append({
-                    'file': file,
-                    'date': datetime(year, month, 1),
-                    'month': month,
-                    'year': year
-                })
+                indices.append(month_index(year, month))
         except Exception as e:
-            print(f"Error extracting date from file {file.get('filename', 'unknown')}: {str(e)}")
-    
-    # Sort by date
-    dated_files.sort(key=lambda x: x['date'])
+            logger.error(f"Error extracting date from file {file.get('filename', 'unknown')}: {str(e)}")
     
-    # If no dated files found, return empty list
-    if not dated_files:
-        return []
+    # If no dated files found there are no gaps; remembered so undated categories are not rescanned
+    if not indices:
+        return gap_engine.missing_months(series_key, indices, revision=revision)
     
-    # Find the date range we should check
-    end_date = datetime.now()
-    start_date = dated_files[0]['date']
-    
-    # Only check the last 12 months
-    twelve_months_ago = datetime(end_date.year, end_date.month, 1)
-    if (end_date - start_date).days > 365:
-        start_date = twelve_months_ago
-    
-    # Create a set of all months we have files for
-    existing_dates = {(f['year'], f['month']) for f in dated_files}
-    
-    # Check each month in the range
-    missing_months = []
-    current_date = start_date
-    while current_date <= end_date:
-        if (current_date.year, current_date.month) not in existing_dates:
-            missing_months.append(f"{calendar.month_name[current_date.month]} {current_date.year}")
-        current_date = datetime(
-            current_date.year + (current_date.month // 12),
-            (current_date.month % 12) + 1,
-            1
-        )
-    
-    return missing_months
+    # Monthly report series run up to now; other dated files only between their first and last month
+    end = current_month_index() if not filename_dates_only else max(indices)
+    start = max(min(indices), current_month_index() - 11)
+    return gap_engine.missing_months(series_key, indices, start, end, revision=revision)
+
+def category_gaps(category, files, revision=None):
+    """Missing months for a category; categories without monthly reports only use dates in filenames."""
+    return identify_gaps(
+        files,
+        series_key=('category', category),
+        filename_dates_only=category not in MONTHLY_REPORT_CATEGORIES,
+        revision=revision
+    )
 
 def get_file_category(file_info, file_categories):
     """Get category for a file based on its ID or filename pattern."""
@@ -308,77 +365,7 @@ def get_file_category(file_info, file_categories):
         return file_categories[file_info['id']]
     
     # If not found, try to determine category from filename
-    filename = file_info['filename'].lower()
-    
-    # Define category patterns
-    patterns = {
-        'Financial Reports': [
-            'budget', 'financial', 'expense', 'revenue', 'assessment',
-            'balance sheet', 'income', 'cash flow', 'invoice', 'payment',
-            'accounting', 'fiscal', 'tax', 'audit', 'special assessment'
-        ],
-        'Building Management': [
-            'building', 'maintenance', 'repair', 'facility', 'property',
-            'renovation', 'upgrade', 'construction', 'improvement',
-            'work schedule', 'inspection'
-        ],
-        'Emergency & Safety': [
-            'emergency', 'safety', 'security', 'evacuation', 'fire',
-            'disaster', 'hazard', 'incident', 'alert', 'warning',
-            'protection', 'prevention'
-        ],
-        'Legal & Governance': [
-            'legal', 'law', 'regulation', 'policy', 'compliance', 'contract',
-            'bylaw', 'statute', 'declaration', 'amendment', 'certificate',
-            'articles', 'incorporation', 'governance'
-        ],
-        'Insurance & Assessments': [
-            'insurance', 'assessment', 'claim', 'coverage', 'policy',
-            'liability', 'risk', 'premium', 'deductible', 'certificate'
-        ],
-        'Maintenance & Installation': [
-            'maintenance', 'installation', 'repair', 'equipment', 'system',
-            'service', 'inspection', 'replacement', 'upgrade', 'fix',
-            'cleaning', 'hvac', 'elevator', 'plumbing'
-        ],
-        'Meeting Documents': [
-            'meeting', 'minutes', 'agenda', 'board', 'committee',
-            'discussion', 'resolution', 'vote', 'attendance', 'quorum'
-        ],
-        'Resident Information': [
-            'resident', 'tenant', 'owner', 'occupant', 'community',
-            'neighbor', 'directory', 'contact', 'parking', 'pet',
-            'move-in', 'move-out', 'handbook'
-        ],
-        'Rules & Regulations': [
-            'rule', 'regulation', 'guideline', 'policy', 'procedure',
-            'requirement', 'standard', 'restriction', 'conduct', 'code'
-        ],
-        'Structural Reports': [
-            'structural', 'engineering', 'inspection', 'foundation',
-            'building envelope', 'roof', 'wall', 'concrete', 'steel',
-            'assessment', 'integrity', 'structure'
-        ]
-    }
-    
-    # Check filename against patterns
-    for category, keywords in patterns.items():
-        if any(keyword in filename for keyword in keywords):
-            return category
-            
-    # Special cases based on file patterns
-    if 'declaration' in filename or 'amendment' in filename:
-        return "Legal & Governance"
-    elif 'assessment' in filename:
-        return "Insurance & Assessments"
-    elif 'schedule' in filename:
-        return "Building Management"
-    elif 'certificate' in filename:
-        return "Legal & Governance"
-    elif 'reference' in filename:
-        return "Resident Information"
-    
-    return "General Documents"
+    return categorizer.categorize(file_info['filename'])
 
 def verify_categories_integrity():
     """Verify the integrity of categories and their contents."""
@@ -395,41 +382,40 @@ def verify_categories_integrity():
         openai_file_ids = {f['id'] for f in files}
         category_file_ids = set(file_categories.keys())
         
-        # Check 1: All default categories exist
-        default_categories = [
-            "Building Management", "Emergency & Safety", "Financial Reports",
-            "General Documents", "Insurance & Assessments", "Legal & Governance",
-            "Maintenance & Installation", "Meeting Documents", "Resident Information",
-            "Rules & Regulations", "Structural Reports", "Uncategorized"
-        ]
-        missing_categories = [cat for cat in default_categories if cat not in all_categories]
+        # Check 1: All default categories exist; categories added to the rules file are created here
+        missing_categories = [cat for cat in categorization_rules.category_names if cat not in all_categories]
         if missing_categories:
-            logger.error(f"Missing default categories: {missing_categories}")
-            return False
+            logger.warning(f"Adding categories from the categorization rules: {missing_categories}")
+            all_categories = sorted(all_categories + missing_categories)
+            save_categories(file_categories, all_categories)
             
         # Check 2: All categorized files exist in OpenAI
+        # A stale catalog may predate recent uploads, and an empty one is more likely an outage
+        # than a deleted knowledge base, so never drop mappings based on either
+        catalog_changed = False
+        catalog_stale = analyzer.catalog_stale
         ghost_files = category_file_ids - openai_file_ids
-        if ghost_files:
+        if ghost_files and catalog_stale:
+            logger.warning(f"Skipping removal of {len(ghost_files)} unknown files while the catalog is stale")
+        elif ghost_files and not files:
+            logger.warning(f"Skipping removal of {len(ghost_files)} unknown files because OpenAI returned no files")
+        elif ghost_files:
             logger.error(f"Found {len(ghost_files)} files in categories that don't exist in OpenAI")
             for file_id in ghost_files:
                 del file_categories[file_id]
             save_categories(file_categories)
+            catalog_changed = True
             
         # Check 3: All OpenAI files are categorized
         uncategorized_files = openai_file_ids - category_file_ids
         if uncategorized_files:
             logger.error(f"Found {len(uncategorized_files)} uncategorized files")
-            for file_id in uncategorized_files:
-                file = next(f for f in files if f['id'] == file_id)
-                # Try both categorization methods
-                cat = get_file_category(file, file_categories)
-                if cat == "General Documents":
-                    # If get_file_category returns General, try categorize_file
-                    alt_cat = categorize_file(file['filename'], None)
-                    if alt_cat != "General Documents":
-                        cat = alt_cat
-                file_categories[file_id] = cat
+            new_files = [f for f in files if f['id'] in uncategorized_files]
+            assigned = categorizer.categorize_batch([(f['filename'], None) for f in new_files])
+            for file, cat in zip(new_files, assigned):
+                file_categories[file['id']] = cat
             save_categories(file_categories)
+            catalog_changed = True
             
         # Check 4: All files are in valid categories
         invalid_categories = [cat for cat in set(file_categories.values()) if cat not in all_categories]
@@ -439,23 +425,57 @@ def verify_categories_integrity():
                 if cat not in all_categories:
                     file_categories[file_id] = "General Documents"
             save_categories(file_categories)
+            catalog_changed = True
             
-        # Check 5: Verify categorization is optimal
+        # Check 5: Files placed by earlier rules follow the current rules; categories users chose are kept
+        # Cached results the rule change did not touch are reused; waits for a full catalog like Check 2
+        files_by_id = {f['id']: f for f in files}
+        user_assigned, rules_applied = load_category_assignments()
+        ruleset = categorization_rules.current().ruleset_hash
+        if rules_applied != ruleset and files and not catalog_stale:
+            assigned_ids = [
+                file_id for file_id in file_categories
+                if file_id in files_by_id and file_id not in user_assigned
+            ]
+            assigned = categorizer.categorize_batch([(files_by_id[file_id]['filename'], None) for file_id in assigned_ids])
+            moved = 0
+            for file_id, new_cat in zip(assigned_ids, assigned):
+                if new_cat == file_categories[file_id] or new_cat not in all_categories:
+                    continue
+                if rules_applied is None:
+                    # A store from before assignments were tracked: a mapping the rules disagree with was set by hand
+                    user_assigned.add(file_id)
+                    continue
+                logger.info(f"Rules moved {files_by_id[file_id]['filename']} from {file_categories[file_id]} to {new_cat}")
+                file_categories[file_id] = new_cat
+                moved += 1
+            save_categories(file_categories, user_assigned=user_assigned, rules_applied=ruleset)
+            catalog_changed = catalog_changed or moved > 0
+            
+        # Check 6: Verify categorization is optimal
+        # Every catch-all file is scored in one batch rather than one at a time
         changes_made = False
-        for file_id, current_cat in file_categories.items():
-            if current_cat in ["General Documents", "Uncategorized"]:
-                file = next(f for f in files if f['id'] == file_id)
-                # Try both categorization methods
-                new_cat = get_file_category(file, {})  # Empty dict to force pattern matching
-                if new_cat == "General Documents":
-                    new_cat = categorize_file(file['filename'], None)
-                if new_cat != current_cat and new_cat != "General Documents":
-                    file_categories[file_id] = new_cat
-                    changes_made = True
-                    logger.info(f"Recategorized {file['filename']} from {current_cat} to {new_cat}")
+        candidates = [
+            (file_id, current_cat) for file_id, current_cat in file_categories.items()
+            if current_cat in ["General Documents", "Uncategorized"] and file_id in files_by_id
+            and file_id not in user_assigned
+        ]
+        rankings = categorizer.score_batch([(files_by_id[file_id]['filename'], None) for file_id, current_cat in candidates], top=1)
+        for (file_id, current_cat), ranked in zip(candidates, rankings):
+            new_cat, confidence = ranked[0]
+            if new_cat != current_cat and new_cat != "General Documents":
+                file_categories[file_id] = new_cat
+                changes_made = True
+                logger.info(f"Recategorized {files_by_id[file_id]['filename']} from {current_cat} to {new_cat} (confidence {confidence:.2f})")
         
         if changes_made:
             save_categories(file_categories)
+            catalog_changed = True
+        
+        if catalog_changed:
+            catalog_version.bump("reconciliation")
+        # Also when ghost removal was refused: retrying cannot help until the catalog changes
+        catalog_version.mark_verified(catalog_revision())
             
         logger.info("Category verification complete")
         return True
@@ -465,20 +485,7 @@ def verify_categories_integrity():
 
 def load_categories():
     """Load categories from JSON file."""
-    default_categories = [
-        "Building Management",
-        "Emergency & Safety",
-        "Financial Reports",
-        "General Documents",
-        "Insurance & Assessments",
-        "Legal & Governance",
-        "Maintenance & Installation",
-        "Meeting Documents",
-        "Resident Information",
-        "Rules & Regulations",
-        "Structural Reports",
-        "Uncategorized"
-    ]
+    default_categories = list(categorization_rules.category_names)
     try:
         with open(app.config['CATEGORIES_FILE'], 'r') as f:
             data = json.load(f)
@@ -496,21 +503,49 @@ def load_categories():
         logger.error(f"Error loading categories: {str(e)}")
         return default_categories, {}
 
-def save_categories(file_categories):
-    """Save categories to JSON file."""
+def load_category_assignments():
+    """Return the IDs of files whose category a user chose, and the ruleset the other mappings follow.
+
+    The ruleset is None for a store written before assignments were tracked.
+    """
+    try:
+        with open(app.config['CATEGORIES_FILE'], 'r') as f:
+            data = json.load(f)
+        return set(data.get('user_assigned', [])), data.get('rules_applied')
+    except FileNotFoundError:
+        return set(), None
+    except Exception as e:
+        logger.error(f"Error loading category assignments: {str(e)}")
+        return set(), None
+
+def save_categories(file_categories, all_categories=None, user_assigned=None, rules_applied=None):
+    """Save categories to JSON file.
+
+    user_assigned and rules_applied are kept as stored unless given.
+    """
     try:
         # Load existing categories or use defaults
-        all_categories, _ = load_categories()
+        if all_categories is None:
+            all_categories, _ = load_categories()
+        if user_assigned is None or rules_applied is None:
+            stored_user_assigned, stored_rules_applied = load_category_assignments()
+            user_assigned = stored_user_assigned if user_assigned is None else user_assigned
+            rules_applied = stored_rules_applied if rules_applied is None else rules_applied
         
         # Prepare data to save
         data = {
             'categories': all_categories,
-            'file_categories': file_categories
+            'file_categories': file_categories,
+            'user_assigned': sorted(file_id for file_id in user_assigned if file_id in file_categories),
+            'rules_applied': rules_applied
         }
         
-        # Save to file
-        with open(app.config['CATEGORIES_FILE'], 'w') as f:
+        # Write to a temporary file and swap it in so readers never see a partial store
+        categories_file = app.config['CATEGORIES_FILE']
+        tmp_file = f"{categories_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w') as f:
             json.dump(data, f, indent=4)
+        os.replace(tmp_file, categories_file)
             
         logger.info("Successfully saved categories")
         return True
@@ -518,6 +553,49 @@ def save_categories(file_categories):
         logger.error(f"Error saving categories: {str(e)}")
         return False
 
+def run_file_deletion(payload):
+    """Task handler: delete a file from OpenAI, then forget it locally. Safe to run twice."""
+    file_id = payload['file_id']
+    if not analyzer.delete_file(file_id):
+        raise RuntimeError(OPENAI_UNAVAILABLE_MESSAGE if analyzer.openai_unavailable else f"OpenAI did not delete {file_id}")
+    with categories_lock:
+        all_categories, file_categories = load_categories()
+        if file_categories.pop(file_id, None) is not None and not save_categories(file_categories, all_categories):
+            raise RuntimeError("Failed to save categories")
+    text_index.remove_document(file_id)
+    near_duplicate_index.remove_document(file_id)
+    file_cache.remove(file_id)
+    catalog_version.bump("delete")
+
+def run_category_reassignment(payload):
+    """Task handler: remove a category and move its files to the target category. Safe to run twice."""
+    category, target = payload['category'], payload['target']
+    with categories_lock:
+        all_categories, file_categories = load_categories()
+        moved = [file_id for file_id, cat in file_categories.items() if cat == category]
+        if category not in all_categories and not moved:
+            return
+        for file_id in moved:
+            file_categories[file_id] = target
+        remaining = [cat for cat in all_categories if cat != category]
+        if target not in remaining:
+            remaining.append(target)
+        if not save_categories(file_categories, remaining):
+            raise RuntimeError("Failed to save categories")
+    logger.info(f"Deleted category {category}, moved {len(moved)} files to {target}")
+    catalog_version.bump("category deleted")
+
+task_queue.register('delete_file', run_file_deletion)
+task_queue.register('reassign_category', run_category_reassignment)
+
+def pending_deletions():
+    """IDs of files whose queued deletion has not finished; they are hidden from listings."""
+    try:
+        return {task['payload']['file_id'] for task in task_queue.unfinished('delete_file')}
+    except Exception as e:
+        logger.error(f"Error reading queued deletions: {str(e)}")
+        return set()
+
 @app.route('/update_category', methods=['POST'])
 def update_category():
     """Update a file's category."""
@@ -545,13 +623,16 @@ def update_category():
         if not file_exists:
             return jsonify({'success': False, 'error': f'File not found: {file_id}'}), 404
         
-        # Update category
+        # Update category; rule changes leave a category a user chose alone
         old_category = file_categories.get(file_id)
         file_categories[file_id] = new_category
+        user_assigned, _ = load_category_assignments()
+        user_assigned.add(file_id)
         
         # Save updated categories
-        if not save_categories(file_categories):
+        if not save_categories(file_categories, user_assigned=user_assigned):
             return jsonify({'success': False, 'error': 'Failed to save categories'}), 500
+        catalog_version.bump("recategorization")
         
         print(f"Updated category for file {file_id} from {old_category} to {new_category}")
         return jsonify({'success': True})
@@ -559,65 +640,118 @@ def update_category():
         print(f"Error updating category: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/update_categories', methods=['POST'])
+def update_categories():
+    """Move many files between categories with a single validation pass and one store write."""
+    try:
+        data = request.get_json(silent=True) or {}
+        updates = data.get('updates')
+        if not isinstance(updates, list) or not updates:
+            return jsonify({'success': False, 'error': 'Missing updates'}), 400
+        if len(updates) > MAX_BULK_UPDATES:
+            return jsonify({'success': False, 'error': f'At most {MAX_BULK_UPDATES} updates per request'}), 400
+        
+        if not analyzer:
+            return jsonify({'success': False, 'error': 'Assistant not initialized'}), 500
+        
+        # One catalog read serves every existence check
+        known_ids = {f['id'] for f in analyzer.get_file_list()}
+        
+        with categories_lock:
+            all_categories, file_categories = load_categories()
+            user_assigned, _ = load_category_assignments()
+            valid_categories = set(all_categories)
+            
+            results = []
+            changed = 0
+            marked = 0
+            for update in updates:
+                update = update if isinstance(update, dict) else {}
+                file_id = update.get('file_id')
+                new_category = update.get('category') or update.get('new_category')
+                result = {'file_id': file_id, 'category': new_category}
+                
+                if not file_id or not new_category:
+                    result.update(success=False, error='Missing file_id or category')
+                elif new_category not in valid_categories:
+                    result.update(success=False, error=f'Invalid category: {new_category}')
+                elif file_id not in known_ids:
+                    result.update(success=False, error=f'File not found: {file_id}')
+                else:
+                    old_category = file_categories.get(file_id)
+                    result.update(success=True, old_category=old_category)
+                    if old_category != new_category:
+                        file_categories[file_id] = new_category
+                        changed += 1
+                    if file_id not in user_assigned:
+                        # Confirming a file's category also keeps rule changes from moving it
+                        user_assigned.add(file_id)
+                        marked += 1
+                results.append(result)
+            
+            if (changed or marked) and not save_categories(file_categories, user_assigned=user_assigned):
+                return jsonify({'success': False, 'error': 'Failed to save categories'}), 500
+        
+        if changed:
+            catalog_version.bump("bulk recategorization")
+        
+        failed = sum(1 for result in results if not result['success'])
+        logger.info(f"Bulk category update: {changed} changed, {failed} failed out of {len(results)}")
+        return jsonify({
+            'success': failed == 0,
+            'changed': changed,
+            'failed': failed,
+            'results': results
+        })
+    except Exception as e:
+        logger.error(f"Error updating categories: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/')
 @app.route('/category/<category>')
 def index(category=None):
     try:
         # First verify categories integrity
-        verify_categories_integrity()
+        revalidate_catalog()
+        
+        # Nothing changed since the browser's copy, skip rebuilding the page
+        etag = catalog_version.etag('index', category, analyzer.catalog_stale, analyzer.openai_unavailable)
+        if is_not_modified(etag):
+            return not_modified_response(etag)
         
         # Load categories
         all_categories, file_categories = load_categories()
         
-        # Initialize empty categories
-        categories = {cat: [] for cat in all_categories}
-        gaps = {}
+        # Initialize empty category counts
+        category_counts = {cat: 0 for cat in all_categories}
         
         if not analyzer:
             return render_template('index.html', 
-                                categories=categories,
+                                category_counts=category_counts,
                                 all_categories=all_categories,
                                 selected_category=category,
-                                gaps=gaps,
                                 error="OpenAI configuration error. The application will work in limited mode.")
         
-        # Get all files from OpenAI
-        files = analyzer.get_file_list() if analyzer else []
-        logger.info(f"Retrieved {len(files)} files from OpenAI")
-        logger.info(f"Sample file data: {files[0] if files else 'No files'}")
-        
-        # Organize files by category
-        for file in files:
-            try:
-                cat = file_categories.get(file['id'], 'Uncategorized')
-                categories[cat].append(file)
-            except Exception as e:
-                logger.error(f"Error organizing file {file.get('filename', 'unknown')}: {str(e)}")
-                continue
-        
-        # Sort files and identify gaps
-        for cat in categories:
-            try:
-                if cat in ["Financial Reports", "Building Management"]:
-                    categories[cat].sort(key=lambda x: extract_month_year(x)[::-1], reverse=True)
-                    gaps[cat] = identify_gaps(categories[cat])
-                else:
-                    categories[cat].sort(key=lambda x: x.get('created_at', ''), reverse=True)
-            except Exception as e:
-                logger.error(f"Error sorting category {cat}: {str(e)}")
-        
-        # Verify we have all categories
-        for cat in all_categories:
-            if cat not in categories:
-                logger.error(f"Category {cat} missing after organization")
-                categories[cat] = []
-        
         # If category is specified but doesn't exist, redirect to home
         if category and category not in all_categories:
             return redirect(url_for('index'))
         
+        # Get all files from OpenAI, leaving out those being deleted
+        hidden = pending_deletions()
+        files = [f for f in (analyzer.get_file_list() if analyzer else []) if f['id'] not in hidden]
+        logger.info(f"Retrieved {len(files)} files from OpenAI")
+        logger.debug("Sample file data: %s", files[0] if files else 'No files')
+        
+        # Count files per category; the file lists themselves are paged in by the browser
+        counts = Counter(file_categories.get(f['id'], 'Uncategorized') for f in files)
+        for cat, count in counts.items():
+            if cat in category_counts:
+                category_counts[cat] = count
+            else:
+                logger.error(f"Files mapped to unknown category {cat}: {count}")
+        
         # Calculate total files and get last file date
-        total_files = sum(len(files) for files in categories.values())
+        total_files = sum(category_counts.values())
         last_file_date = None
         if files:
             try:
@@ -626,19 +760,19 @@ def index(category=None):
                 for file in files:
                     created_at = file.get('created_at')
                     if created_at:
-                        logger.info(f"Found created_at: {created_at} for file {file.get('filename')}")
+                        logger.debug("Found created_at: %s for file %s", created_at, file.get('filename'))
                         timestamps.append(created_at)
                 
                 if timestamps:
                     # Get the most recent timestamp
                     latest_timestamp = max(timestamps)
-                    logger.info(f"Latest timestamp: {latest_timestamp}")
+                    logger.debug("Latest timestamp: %s", latest_timestamp)
                     
                     # Convert to integer if it's a string
                     if isinstance(latest_timestamp, str):
                         try:
                             latest_timestamp = int(float(latest_timestamp))
-                            logger.info(f"Converted timestamp: {latest_timestamp}")
+                            logger.debug("Converted timestamp: %s", latest_timestamp)
                         except (ValueError, TypeError) as e:
                             logger.error(f"Could not convert timestamp: {latest_timestamp}, error: {str(e)}")
                             latest_timestamp = None
@@ -646,22 +780,244 @@ def index(category=None):
                     # Format the date
                     if latest_timestamp:
                         last_file_date = datetime.fromtimestamp(latest_timestamp).strftime('%Y-%m-%d')
-                        logger.info(f"Final last_file_date: {last_file_date}")
+                        logger.debug("Final last_file_date: %s", last_file_date)
             except Exception as e:
                 logger.error(f"Error getting last file date: {str(e)}")
                 logger.exception(e)
         
-        logger.info(f"Rendering template with last_file_date: {last_file_date}")
-        return render_template('index.html', 
-                             categories=categories,
+        logger.debug("Rendering template with last_file_date: %s", last_file_date)
+        response = app.make_response(render_template('index.html', 
+                             category_counts=category_counts,
                              all_categories=sorted(all_categories),
                              selected_category=category,
-                             gaps=gaps,
                              total_files=total_files,
-                             last_file_date=last_file_date)
+                             last_file_date=last_file_date,
+                             catalog_stale=analyzer.catalog_stale,
+                             openai_unavailable=analyzer.openai_unavailable))
+        return with_cache_headers(response, etag)
     except Exception as e:
         logger.error(f"Error in index route: {str(e)}")
-        return render_template('index.html', categories={}, error=str(e))
+        return render_template('index.html', category_counts={}, error=str(e))
+
+def category_sort_key(category, file):
+    """Ascending key that lists a category newest first, by report month where it matters.
+
+    The file ID breaks ties, so every file has its own position to page from.
+    """
+    if category in MONTHLY_REPORT_CATEGORIES:
+        month, year = extract_month_year(file)
+        return (-(year or 0), -(month or 0), -(file.get('created_at') or 0), file['id'])
+    return (-(file.get('created_at') or 0), file['id'])
+
+def category_listing(category):
+    """A category's files in listing order with their sort keys, cached until the catalog version changes."""
+    version = catalog_version.current()
+    with category_listings_lock:
+        cached = category_listings.get(category)
+        if cached and cached[0] == version:
+            return cached[1]
+    _, file_categories = load_categories()
+    files = analyzer.get_file_list() if analyzer else []
+    members = sorted(
+        ((category_sort_key(category, f), f) for f in files
+         if file_categories.get(f['id'], 'Uncategorized') == category),
+        key=lambda member: member[0]
+    )
+    listing = {
+        'version': version,
+        'keys': [key for key, f in members],
+        'files': [f for key, f in members],
+        'ids': {f['id'] for key, f in members}
+    }
+    with category_listings_lock:
+        category_listings[category] = (version, listing)
+    return listing
+
+def preview_fields(preview):
+    """The parts of a stored preview sent to the browser."""
+    if not preview:
+        return None
+    return {'first_page': preview['first_page'], 'pages': preview['pages'], 'words': preview['words']}
+
+def encode_cursor(key):
+    """Encode the sort key of the last file on a page as an opaque cursor string."""
+    return base64.urlsafe_b64encode(json.dumps({'after': key}).encode()).decode()
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor, raising ValueError if malformed."""
+    if not cursor:
+        return None
+    try:
+        key = tuple(json.loads(base64.urlsafe_b64decode(cursor.encode()))['after'])
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    if not key or not isinstance(key[-1], str) or not all(isinstance(part, (int, float)) for part in key[:-1]):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return key
+
+@app.route('/api/category/<category>/files')
+def category_files(category):
+    """Return one page of a category's files for the lazy-loaded file list."""
+    try:
+        all_categories, file_categories = load_categories()
+        if category not in all_categories:
+            return jsonify({'success': False, 'error': f'Invalid category: {category}'}), 404
+        
+        try:
+            after = decode_cursor(request.args.get('cursor'))
+            limit = min(max(int(request.args.get('limit', PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        revalidate_catalog()
+        etag = catalog_version.etag(
+            'category_files', category, after, limit, analyzer.catalog_stale, ingestion_tracker.revision(),
+            preview_store.revision()
+        )
+        if is_not_modified(etag):
+            return not_modified_response(etag)
+        
+        listing = category_listing(category)
+        keys, files = listing['keys'], listing['files']
+        hidden = pending_deletions()
+        # The page starts right after the last file already sent, wherever files were added or removed since
+        try:
+            position = bisect.bisect_right(keys, after) if after else 0
+        except TypeError:
+            return jsonify({'success': False, 'error': 'Cursor does not belong to this category'}), 400
+        page, last_key = [], None
+        while position < len(files) and len(page) < limit:
+            if files[position]['id'] not in hidden:
+                page.append(files[position])
+                last_key = keys[position]
+            position += 1
+        has_more = any(f['id'] not in hidden for f in itertools.islice(files, position, None))
+        ingestion = ingestion_tracker.statuses([f['id'] for f in page])
+        # Previews are only read here; missing ones are queued for the background pipeline
+        previews = preview_store.get_many([f['id'] for f in page])
+        if not analyzer.limited_mode:
+            preview_pipeline.schedule(page)
+        
+        response_data = {
+            'success': True,
+            'stale': analyzer.catalog_stale,
+            'category': category,
+            'total': len(files) - len(hidden & listing['ids']),
+            'files': [{
+                'id': f['id'],
+                'filename': f['filename'],
+                'created_at': f.get('created_at'),
+                'bytes': f.get('bytes'),
+                'ingestion': ingestion.get(f['id'], {}).get('status'),
+                'preview': preview_fields(previews.get(f['id']))
+            } for f in page],
+            'next_cursor': encode_cursor(last_key) if page and has_more else None
+        }
+        
+        # Gaps only need to be sent with the first page
+        if after is None:
+            response_data['gaps'] = category_gaps(
+                category, (f for f in files if f['id'] not in hidden), revision=(listing['version'], frozenset(hidden))
+            )
+        
+        return with_cache_headers(jsonify(response_data), etag)
+    except Exception as e:
+        logger.error(f"Error listing files for category {category}: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/ingestion')
+def ingestion_status():
+    """Report vector store indexing status for the given files, plus totals per status."""
+    try:
+        file_ids = request.args.getlist('file_id')
+        return jsonify({
+            'success': True,
+            'statuses': ingestion_tracker.statuses(file_ids) if file_ids else {},
+            'summary': ingestion_tracker.summary()
+        })
+    except Exception as e:
+        logger.error(f"Error reading ingestion status: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/tasks')
+def task_status():
+    """Report queued deletions and reassignments and how many tasks are in each state."""
+    try:
+        return jsonify({
+            'success': True,
+            'counts': task_queue.counts(),
+            'unfinished': [{
+                'id': task['id'],
+                'kind': task['kind'],
+                'payload': task['payload'],
+                'status': task['status'],
+                'attempts': task['attempts'],
+                'last_error': task['last_error']
+            } for task in task_queue.unfinished()]
+        })
+    except Exception as e:
+        logger.error(f"Error reading task queue: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/duplicates')
+def list_near_duplicates():
+    """Return clusters of documents whose text is nearly identical."""
+    try:
+        etag = catalog_version.etag('duplicates', near_duplicate_index.revision())
+        if is_not_modified(etag):
+            return not_modified_response(etag)
+        
+        files_by_id = {f['id']: f for f in analyzer.get_file_list()} if analyzer else {}
+        clusters = []
+        for cluster in near_duplicate_index.clusters():
+            clusters.append({
+                'files': [{
+                    'id': file_id,
+                    'filename': files_by_id.get(file_id, {}).get('filename')
+                } for file_id in cluster['files']],
+                'pairs': [{'a': a, 'b': b, 'similarity': similarity} for a, b, similarity in cluster['pairs']]
+            })
+        return with_cache_headers(jsonify({'success': True, 'clusters': clusters}), etag)
+    except Exception as e:
+        logger.error(f"Error listing near duplicates: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/series')
+def list_series():
+    """Return recurring file series with their date range, latest member and missing months."""
+    try:
+        min_members = max(int(request.args.get('min_members', 2)), 1)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'min_members must be an integer'}), 400
+    
+    try:
+        revalidate_catalog()
+        etag = catalog_version.etag('series', min_members, analyzer.catalog_stale)
+        if is_not_modified(etag):
+            return not_modified_response(etag)
+        
+        index = ensure_series_index()
+        series = []
+        for key in sorted(index.series(min_members)):
+            date_range = index.date_range(key)
+            latest = index.latest(key)
+            series.append({
+                'key': key,
+                'count': len(index.members(key)),
+                'first_month': month_label(date_range[0]) if date_range else None,
+                'last_month': month_label(date_range[1]) if date_range else None,
+                'latest': {'id': latest['id'], 'filename': latest['filename']} if latest else None,
+                'gaps': index.gaps(key)
+            })
+        
+        return with_cache_headers(jsonify({
+            'success': True,
+            'stale': analyzer.catalog_stale,
+            'series': series
+        }), etag)
+    except Exception as e:
+        logger.error(f"Error listing file series: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/add_category', methods=['POST'])
 def add_category():
@@ -688,11 +1044,10 @@ def delete_category():
         if category in categories:
             # Move files to uncategorized
             if category != "Uncategorized":
-                categories.remove(category)
-                for file_id, cat in file_categories.items():
-                    if cat == category:
-                        file_categories[file_id] = 'Uncategorized'
-                save_categories(file_categories)
+                key = f"delete_category:{request.headers.get('Idempotency-Key') or uuid.uuid4().hex}"
+                task = task_queue.enqueue('reassign_category', {'category': category, 'target': 'Uncategorized'}, key)
+                # Usually done at once; if not, the page shows it once the queue gets to it
+                task_queue.wait(task['id'], CATEGORY_TASK_WAIT_SECONDS)
                 
         return redirect(url_for('index'))
     except Exception as e:
@@ -701,105 +1056,129 @@ def delete_category():
 
 @app.route('/upload_file', methods=['POST'])
 def upload_file():
-    """Handle file upload."""
+    """Handle file upload; several files may be sent under the same 'file' field."""
     is_api_request = request.headers.get('Accept') == 'application/json'
     logger.info(f"Received file upload request (API: {is_api_request})")
     
-    if 'file' not in request.files:
+    files = [f for f in request.files.getlist('file') if f.filename]
+    if not files:
         logger.warning("No file in request")
         if is_api_request:
             return jsonify({'error': 'No file selected'}), 400
         flash('No file selected', 'warning')
         return redirect(url_for('index'))
         
-    file = request.files['file']
-    if file.filename == '':
-        logger.warning("Empty filename")
-        if is_api_request:
-            return jsonify({'error': 'No file selected'}), 400
-        flash('No file selected', 'warning')
-        return redirect(url_for('index'))
-        
-    if not allowed_file(file.filename):
-        logger.warning(f"File type not allowed: {file.filename}")
+    rejected = [f.filename for f in files if not allowed_file(f.filename)]
+    if rejected:
+        logger.warning(f"File type not allowed: {', '.join(rejected)}")
         if is_api_request:
             return jsonify({'error': 'File type not allowed'}), 400
         flash('File type not allowed', 'warning')
         return redirect(url_for('index'))
         
+    file_paths = []
     try:
-        # Save file locally first
-        filename = secure_filename(file.filename)
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        logger.info(f"Saving file locally: {file_path}")
-        file.save(file_path)
+        # Save files locally first
+        for file in files:
+            file_path = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(file.filename))
+            logger.info(f"Saving file locally: {file_path}")
+            file.save(file_path)
+            file_paths.append(file_path)
         
-        # Upload to OpenAI Assistant
+        # Upload to OpenAI; all files go into the vector store in one batch
+        uploads = []
         if analyzer:
-            logger.info("Uploading to OpenAI Assistant...")
-            file_info = analyzer.upload_file(file_path)
-            if not file_info:
+            logger.info(f"Uploading {len(file_paths)} files to OpenAI Assistant...")
+            uploaded = []
+            for file_path, file_info in zip(file_paths, analyzer.upload_files(file_paths)):
+                if not file_info:
+                    continue
+                uploaded.append((file_path, file_info))
+                uploads.append({
+                    'file_id': file_info.id,
+                    'filename': file_info.filename,  # Use the filename from OpenAI
+                    'created_at': datetime.fromtimestamp(file_info.created_at).strftime("%Y-%m-%d %H:%M:%S")
+                })
+                logger.info(f"File uploaded to OpenAI: {file_info.id}")
+            if not uploads:
                 logger.error("Failed to get file info from OpenAI")
                 raise Exception("Failed to upload file to OpenAI Assistant")
-                
-            # Get file metadata from OpenAI response
-            file_id = file_info.id
-            created_at = datetime.fromtimestamp(file_info.created_at).strftime("%Y-%m-%d %H:%M:%S")
-            filename = file_info.filename  # Use the filename from OpenAI
-            logger.info(f"File uploaded to OpenAI: {file_id}")
-            
-            if not is_api_request:
-                flash(f'"{filename}" has been successfully added to the knowledge base', 'success')
+            ingestion_tracker.track([upload['file_id'] for upload in uploads])
+            # Parsing for previews and search happens in the pipeline's processes, not on this request thread
+            for file_path, file_info in uploaded:
+                local_copy = f"{file_path}.{uuid.uuid4().hex}.parse"
+                os.replace(file_path, local_copy)
+                preview_pipeline.schedule_local({
+                    'id': file_info.id,
+                    'filename': file_info.filename,
+                    'bytes': os.path.getsize(local_copy),
+                    'created_at': file_info.created_at
+                }, local_copy)
         else:
-            # In limited mode, generate a fake file ID
-            file_id = str(len(os.listdir(app.config['UPLOAD_FOLDER'])))
-            created_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            logger.warning("Operating in limited mode - file not uploaded to OpenAI")
-            if not is_api_request:
-                flash('File uploaded in limited mode (not added to knowledge base)', 'info')
+            # In limited mode, generate fake file IDs
+            for file_path in file_paths:
+                uploads.append({
+                    'file_id': str(len(os.listdir(app.config['UPLOAD_FOLDER']))),
+                    'filename': os.path.basename(file_path),
+                    'created_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                })
+            logger.warning("Operating in limited mode - files not uploaded to OpenAI")
         
-        # Categorize the file
-        logger.info("Categorizing file...")
-        categories, file_categories = load_categories()
-        category = categorize_file(filename, None)  # We're not using content for now
-        if category not in categories:
-            categories.append(category)
-        file_categories[file_id] = category
-        save_categories(file_categories)
-        logger.info(f"File categorized as: {category}")
-        
-        # Delete local file since it's now in OpenAI
-        if os.path.exists(file_path):
-            logger.info("Cleaning up local file...")
-            os.remove(file_path)
+        # Categorize the files with a single write to the category store
+        logger.info("Categorizing files...")
+        with categories_lock:
+            categories, file_categories = load_categories()
+            assigned = categorizer.categorize_batch([(upload['filename'], None) for upload in uploads])  # We're not using content for now
+            for upload, category in zip(uploads, assigned):
+                upload['category'] = category
+                file_categories[upload['file_id']] = upload['category']
+                logger.info(f"File {upload['filename']} categorized as: {upload['category']}")
+            save_categories(file_categories)
+        catalog_version.bump("upload")
+        
+        failed = len(file_paths) - len(uploads)
+        if not is_api_request:
+            if not analyzer:
+                flash('File uploaded in limited mode (not added to knowledge base)', 'info')
+            elif len(uploads) == 1:
+                flash(f'"{uploads[0]["filename"]}" has been successfully added to the knowledge base', 'success')
+            else:
+                flash(f'{len(uploads)} files have been successfully added to the knowledge base', 'success')
+            if failed:
+                flash(f'{failed} files could not be uploaded', 'danger')
         
         if is_api_request:
-            response_data = {
-                'success': True,
-                'file_id': file_id,
-                'filename': filename,
-                'category': category,
-                'created_at': created_at
-            }
-            logger.info(f"API Response: {json.dumps(response_data)}")
+            if len(files) == 1:
+                response_data = {'success': True, **uploads[0]}
+            else:
+                response_data = {'success': failed == 0, 'files': uploads, 'failed': failed}
+            logger.debug("API Response: %s", response_data)
             return jsonify(response_data)
-        return redirect(url_for('index', category=category))
+        return redirect(url_for('index', category=uploads[-1]['category']))
         
+    except CircuitOpenError as e:
+        logger.warning(f"Refused upload while OpenAI is unavailable: {str(e)}")
+        if is_api_request:
+            return jsonify({'error': str(e)}), 503
+        flash(str(e), 'warning')
+        return redirect(url_for('index'))
     except Exception as e:
-        # Clean up local file if it exists
-        if os.path.exists(file_path):
-            logger.info("Cleaning up local file after error...")
-            os.remove(file_path)
         error_msg = str(e)
         logger.error(f"Error uploading file: {error_msg}", exc_info=True)
         if is_api_request:
             return jsonify({'error': error_msg}), 500
         flash(f'Failed to upload file: {error_msg}', 'danger')
         return redirect(url_for('index'))
+    finally:
+        # Local copies are no longer needed once they are in OpenAI
+        for file_path in file_paths:
+            if os.path.exists(file_path):
+                logger.info("Cleaning up local file...")
+                os.remove(file_path)
 
 @app.route('/delete_file/<file_id>', methods=['POST'])
 def delete_file(file_id):
-    """Delete a file from both OpenAI Assistant and categories."""
+    """Queue a file's deletion from OpenAI and the category store, answering right away."""
     is_api_request = request.headers.get('Accept') == 'application/json'
     
     try:
@@ -813,68 +1192,176 @@ def delete_file(file_id):
             flash('File not found', 'warning')
             return redirect(url_for('index'))
         
-        # Delete from OpenAI Assistant
-        if analyzer:
-            success = analyzer.delete_file(file_id)
-            if not success:
-                raise Exception("Failed to delete file from OpenAI Assistant")
-        
-        # Remove from categories
-        category = file_categories.pop(file_id)
-        save_categories(file_categories)
+        # The deletion is persisted and run in the background; repeating the request reuses the same task
+        task = task_queue.enqueue('delete_file', {'file_id': file_id}, f"delete_file:{file_id}")
+        category = file_categories[file_id]
+        catalog_version.bump("delete queued")
         
         if is_api_request:
             return jsonify({
                 'success': True,
-                'message': f'File deleted successfully'
-            })
+                'task_id': task['id'],
+                'status': task['status'],
+                'message': 'File is being deleted'
+            }), 202
             
-        flash(f'File has been deleted', 'success')
+        flash('File is being deleted', 'success')
         return redirect(url_for('index', category=category))
         
     except Exception as e:
         error_msg = str(e)
-        print(f"Error deleting file: {error_msg}")
+        logger.error(f"Error queueing deletion of {file_id}: {error_msg}", exc_info=True)
         if is_api_request:
             return jsonify({'error': error_msg}), 500
         flash(f'Failed to delete file: {error_msg}', 'danger')
         return redirect(url_for('index'))
 
+# OpenAI file content never changes, so browsers may reuse a download for a while
+FILE_CONTENT_CACHE_CONTROL = 'private, max-age=3600'
+
+def stream_chunks(first, chunks):
+    """Yield an already fetched first chunk, then the rest, closing the source when the client goes away."""
+    try:
+        yield first
+        yield from chunks
+    finally:
+        chunks.close()
+
+@app.route('/files/<file_id>/content')
+def file_content(file_id):
+    """Serve a document's content, from the local cache when possible.
+    
+    Cached files are sent from disk with Range support. On a miss the
+    content is streamed from OpenAI in chunks and written to the cache as
+    it passes through; a Range request on a miss first downloads the file
+    into the cache and then serves the range from disk.
+    """
+    try:
+        if not analyzer or analyzer.limited_mode:
+            return jsonify({'error': 'OpenAI is not configured'}), 503
+        file_info = next((f for f in analyzer.get_file_list() if f['id'] == file_id), None)
+        if file_info is None:
+            return jsonify({'error': 'File not found'}), 404
+        
+        if request.if_none_match.contains(file_id):
+            return app.response_class(status=304)
+        
+        filename = file_info['filename']
+        cacheable = file_cache.cacheable(file_info.get('bytes'))
+        path = file_cache.lookup(file_id)
+        if path is None and cacheable and request.range:
+            path = file_cache.store(file_id, analyzer.stream_file_content(file_id, CHUNK_SIZE))
+        if path is not None:
+            try:
+                response = send_file(path, download_name=filename, conditional=True, etag=file_id,
+                                     last_modified=file_info.get('created_at'))
+                response.headers['Cache-Control'] = FILE_CONTENT_CACHE_CONTROL
+                return response
+            except FileNotFoundError:
+                # Evicted between the lookup and the open; fetch it again
+                logger.info(f"Cached content of {file_id} was evicted while being served")
+        
+        chunks = analyzer.stream_file_content(file_id, CHUNK_SIZE)
+        if cacheable:
+            chunks = file_cache.fill(file_id, chunks)
+        # Fetch the first chunk now so an OpenAI error becomes an error response, not a truncated download
+        first = next(chunks, b'')
+        
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        response = app.response_class(stream_chunks(first, chunks), mimetype=mimetype)
+        # Like send_file, give non-ASCII names both a plain fallback and an RFC 5987 form
+        response.headers.set('Content-Disposition', 'inline', **{
+            'filename': filename.encode('ascii', 'ignore').decode('ascii'),
+            'filename*': f"UTF-8''{quote(filename, safe='')}"
+        })
+        if file_info.get('bytes'):
+            response.content_length = file_info['bytes']
+        if cacheable:
+            # Later requests are served from the cache, which supports ranges
+            response.headers['Accept-Ranges'] = 'bytes'
+        response.set_etag(file_id)
+        response.headers['Cache-Control'] = FILE_CONTENT_CACHE_CONTROL
+        return response
+    except CircuitOpenError as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        logger.error(f"Error serving content of {file_id}: {str(e)}")
+        return jsonify({'error': f'Could not retrieve file content: {str(e)}'}), 502
+
 @app.route('/debug/files')
 def debug_files():
     try:
+        revalidate_catalog()
+        etag = catalog_version.etag('debug_files', analyzer.catalog_stale)
+        if is_not_modified(etag):
+            return not_modified_response(etag)
+        
         files = analyzer.get_file_list()
-        return jsonify({
+        return with_cache_headers(jsonify({
             'files': [{
                 'filename': f['filename'],
                 'id': f['id'],
                 'created_at': f.get('created_at')
             } for f in files]
-        })
+        }), etag)
     except Exception as e:
         return jsonify({'error': str(e)})
 
 @app.route('/static/<path:filename>')
 def serve_static(filename):
-    return send_from_directory('static', filename)
+    return static_response(request, filename)
 
-@app.route('/search_files', methods=['POST'])
+@app.route('/search_files', methods=['GET', 'POST'])
 def search_files():
-    """Search for files by filename."""
+    """Search for files by filename, or by document content with mode=content."""
     try:
-        data = request.get_json()
-        query = data.get('query', '').lower()
+        if request.method == 'GET':
+            query = request.args.get('query', '').lower()
+            mode = request.args.get('mode', 'filename')
+        else:
+            data = request.get_json()
+            query = data.get('query', '').lower()
+            mode = data.get('mode', 'filename')
         
         if not query:
             return jsonify({'success': False, 'error': 'No search query provided'}), 400
             
         if not analyzer:
             return jsonify({'success': False, 'error': 'Search is not available'}), 500
+        
+        revalidate_catalog()
+        etag = catalog_version.etag(
+            'search_files', query, mode, analyzer.catalog_stale,
+            text_index.revision() if mode == 'content' else None
+        )
+        if is_not_modified(etag):
+            return not_modified_response(etag)
             
         # Get all files and their categories
         all_files = analyzer.get_file_list()
         _, file_categories = load_categories()
         
+        if mode == 'content':
+            # Ranked by the local BM25 index; no OpenAI calls
+            files_by_id = {file['id']: file for file in all_files}
+            results = []
+            for file_id, score, snippet in text_index.search(query):
+                file = files_by_id.get(file_id)
+                if not file:
+                    continue
+                results.append({
+                    'id': file_id,
+                    'filename': file.get('filename'),
+                    'category': get_file_category(file, file_categories),
+                    'created_at': file.get('created_at'),
+                    'score': round(score, 4),
+                    'snippet': snippet
+                })
+            return with_cache_headers(jsonify({
+                'success': True,
+                'results': results
+            }), etag)
+        
         # Search through files
         results = []
         for file in all_files:
@@ -896,10 +1383,10 @@ def search_files():
             x['filename'].lower()           # Alphabetical within each group
         ), reverse=True)
         
-        return jsonify({
+        return with_cache_headers(jsonify({
             'success': True,
             'results': results
-        })
+        }), etag)
         
     except Exception as e:
         return jsonify({
@@ -909,7 +1396,12 @@ def search_files():
 
 @app.route('/health')
 def health_check():
-    return jsonify({"status": "ok", "message": "BWE Assistant is running"}), 200
+    return jsonify({
+        "status": "ok",
+        "message": "BWE Assistant is running",
+        "openai_circuit": analyzer.breaker.state,
+        "catalog_stale": analyzer.catalog_stale
+    }), 200
 
 # Error handler for 404
 @app.errorhandler(404)
@@ -921,6 +1413,3 @@ def not_found_error(error):
 def internal_error(error):
     return render_template('index.html', error="Internal server error"), 500
 
-if __name__ == '__main__':
-    port = int(os.environ.get('PORT', 5002))
-    app.run(host='0.0.0.0', port=port)
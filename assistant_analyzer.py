@@ -4,10 +4,16 @@ import json
 from collections import defaultdict
 import re
 import logging
-from openai import OpenAI
+import openai
+from openai_client import create_client
+from circuit_breaker import CircuitBreaker, CircuitOpenError
 from dotenv import load_dotenv
+from functools import lru_cache
+from gap_engine import GapEngine, month_index, month_label, expand_ranges
 import calendar
 import time
+import gzip
+import threading
 
 # Configure logging
 logging.basicConfig(
@@ -16,10 +22,89 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@lru_cache(maxsize=16384)
+def extract_date_from_filename(filename):
+    """Extract date information from filename."""
+    # Look for year-month pattern (e.g., 2023-06, June 2023, 06-2023)
+    patterns = [
+        r'(\d{4})[_-](\d{2})',  # 2023-06
+        r'(\d{2})[_-](\d{4})',  # 06-2023
+        r'(January|February|March|April|May|June|July|August|September|October|November|December)\s*(\d{4})',  # June 2023
+        r'(\d{4})\s*(January|February|March|April|May|June|July|August|September|October|November|December)'   # 2023 June
+    ]
+    
+    for pattern in patterns:
+        match = re.search(pattern, filename, re.IGNORECASE)
+        if match:
+            groups = match.groups()
+            if groups[0].isdigit():
+                year = int(groups[0])
+                month = int(groups[1]) if groups[1].isdigit() else list(calendar.month_name).index(groups[1].capitalize())
+            else:
+                month = list(calendar.month_name).index(groups[0].capitalize())
+                year = int(groups[1])
+            return datetime(year, month, 1)
+    return None
+
+# Bump when the snapshot layout changes so old snapshots are ignored
+SNAPSHOT_FORMAT = 1
+
+# Delta syncs fetch only new files; full sweeps relist everything to find deletions
+CATALOG_SYNC_SECONDS = int(os.getenv('CATALOG_SYNC_SECONDS', 30))
+CATALOG_FULL_SYNC_SECONDS = int(os.getenv('CATALOG_FULL_SYNC_SECONDS', 3600))
+LIST_PAGE_SIZE = 100
+
+# How long a worker without a catalog waits for the elected refresher to publish one
+SHARED_CATALOG_WAIT_SECONDS = int(os.getenv('SHARED_CATALOG_WAIT_SECONDS', 30))
+REFRESH_LEASE = 'catalog-refresh'
+
+# The file batches API accepts at most this many file IDs per batch
+VECTOR_STORE_BATCH_SIZE = 500
+
+# Shown to users whose request was refused because OpenAI's circuit is open
+OPENAI_UNAVAILABLE_MESSAGE = "OpenAI is not responding. Please try again once it is back."
+
+class RefreshLeaseLost(Exception):
+    """Another worker took over the catalog refresh lease while this one was still listing."""
+
+def is_outage(error):
+    """Whether an OpenAI error means the service is unavailable rather than the request being wrong."""
+    if isinstance(error, RefreshLeaseLost):
+        return False
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    # Connection errors and timeouts are outages; malformed arguments are not
+    return not isinstance(error, (ValueError, LookupError))
+
 class AssistantAnalyzer:
-    def __init__(self, api_key, assistant_id, vector_store_id=None):
+    def __init__(self, api_key, assistant_id, vector_store_id=None, snapshot_path=None, categories_file=None, shared_cache=None):
         """Initialize the AssistantAnalyzer."""
         self.limited_mode = False
+        self.gap_engine = GapEngine()
+        
+        # In-memory catalog, seeded from the on-disk snapshot until the first refresh
+        self.snapshot_path = snapshot_path
+        self.categories_file = categories_file
+        self._catalog = None
+        self._catalog_lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._catalog_listeners = []
+        self._refresh_thread = None
+        self._watermark = None
+        self._last_sync_at = 0
+        self._last_full_sync_at = 0
+        self.catalog_stale = False
+        self.catalog_updated_at = None
+        
+        # Listings, uploads, deletions and downloads go through one breaker, so during an OpenAI
+        # outage the last good catalog is served and everything else is refused at once
+        self.breaker = CircuitBreaker('openai', is_failure=is_outage, open_message=OPENAI_UNAVAILABLE_MESSAGE)
+        
+        # Host-wide catalog shared with the other workers (see shared_cache.SharedCatalog)
+        self.shared_cache = shared_cache
+        self._shared_version = 0
+        self._assistant_configured = False
+        
         try:
             if not api_key or not assistant_id:
                 logger.warning("Missing required OpenAI configuration, running in limited mode")
@@ -27,7 +112,7 @@ class AssistantAnalyzer:
                 return
                 
             logger.info("Initializing OpenAI client...")
-            self.client = OpenAI(
+            self.client = create_client(
                 api_key=api_key,
                 default_headers={"OpenAI-Beta": "assistants=v2"}
             )
@@ -36,6 +121,10 @@ class AssistantAnalyzer:
             self.vector_store_id = vector_store_id
             logger.info(f"Using Vector Store ID: {vector_store_id}")
             
+            # With a shared or snapshot catalog we can serve immediately; the refresh will surface connection errors
+            if self._adopt_shared_catalog() or self.load_snapshot():
+                return
+            
             # Test connection
             self.client.models.list()
             logger.info("Successfully connected to OpenAI API")
@@ -45,51 +134,45 @@ class AssistantAnalyzer:
             self.limited_mode = True
             
     def _configure_assistant(self):
-        """Configure the assistant with the latest file list."""
-        if self.limited_mode:
+        """Make sure the assistant's file_search tool uses the configured vector store."""
+        if self.limited_mode or self._assistant_configured:
             return
 
         try:
-            # Get current file list
-            files = self.get_file_list()
-            logger.info(f"Retrieved {len(files)} total files from OpenAI")
-            
             # Get current assistant configuration
             assistant = self.client.beta.assistants.retrieve(self.assistant_id)
-            logger.info(f"Assistant configuration: {assistant}")
+            logger.debug("Assistant configuration: %s", assistant)
             
             # Get current tool resources
             tool_resources = getattr(assistant, 'tool_resources', None)
-            logger.info(f"Current tool resources: {tool_resources}")
+            logger.debug("Current tool resources: %s", tool_resources)
             
             # Get current vector store IDs
             vector_store_ids = []
-            if tool_resources and hasattr(tool_resources, 'file_search'):
-                file_search = tool_resources.file_search
-                if hasattr(file_search, 'vector_store_ids'):
-                    vector_store_ids = file_search.vector_store_ids
+            if tool_resources and getattr(tool_resources, 'file_search', None):
+                vector_store_ids = list(getattr(tool_resources.file_search, 'vector_store_ids', None) or [])
             
-            # Get current file IDs for code interpreter
+            # Keep existing code interpreter files; new uploads go to the vector store instead
             code_interpreter_file_ids = []
-            if tool_resources and hasattr(tool_resources, 'code_interpreter'):
-                code_interpreter = tool_resources.code_interpreter
-                if hasattr(code_interpreter, 'file_ids'):
-                    code_interpreter_file_ids = code_interpreter.file_ids
-            
-            # Update assistant configuration
-            self.client.beta.assistants.update(
-                assistant_id=self.assistant_id,
-                tools=[{"type": "code_interpreter"}, {"type": "file_search"}],
-                tool_resources={
-                    "code_interpreter": {
-                        "file_ids": code_interpreter_file_ids
-                    },
-                    "file_search": {
-                        "vector_store_ids": vector_store_ids
+            if tool_resources and getattr(tool_resources, 'code_interpreter', None):
+                code_interpreter_file_ids = list(getattr(tool_resources.code_interpreter, 'file_ids', None) or [])
+            
+            if self.vector_store_id and self.vector_store_id not in vector_store_ids:
+                vector_store_ids.append(self.vector_store_id)
+                self.client.beta.assistants.update(
+                    assistant_id=self.assistant_id,
+                    tools=[{"type": "code_interpreter"}, {"type": "file_search"}],
+                    tool_resources={
+                        "code_interpreter": {
+                            "file_ids": code_interpreter_file_ids
+                        },
+                        "file_search": {
+                            "vector_store_ids": vector_store_ids
+                        }
                     }
-                }
-            )
-            logger.info("Successfully updated assistant configuration")
+                )
+                logger.info(f"Attached vector store {self.vector_store_id} to assistant {self.assistant_id}")
+            self._assistant_configured = True
             
         except Exception as e:
             logger.error(f"Error configuring assistant: {str(e)}", exc_info=True)
@@ -97,92 +180,423 @@ class AssistantAnalyzer:
 
     def extract_date_from_filename(self, filename):
         """Extract date information from filename."""
-        # Look for year-month pattern (e.g., 2023-06, June 2023, 06-2023)
-        patterns = [
-            r'(\d{4})[_-](\d{2})',  # 2023-06
-            r'(\d{2})[_-](\d{4})',  # 06-2023
-            r'(January|February|March|April|May|June|July|August|September|October|November|December)\s*(\d{4})',  # June 2023
-            r'(\d{4})\s*(January|February|March|April|May|June|July|August|September|October|November|December)'   # 2023 June
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, filename, re.IGNORECASE)
-            if match:
-                groups = match.groups()
-                if groups[0].isdigit():
-                    year = int(groups[0])
-                    month = int(groups[1]) if groups[1].isdigit() else list(calendar.month_name).index(groups[1].capitalize())
-                else:
-                    month = list(calendar.month_name).index(groups[0].capitalize())
-                    year = int(groups[1])
-                return datetime(year, month, 1)
-        return None
+        return extract_date_from_filename(filename)
 
     def find_gaps_in_sequence(self, files_by_prefix):
         """Find gaps in chronological sequences of files."""
         gaps = []
         for prefix, files in files_by_prefix.items():
-            dates = []
+            indices = []
             for file in files:
                 date = self.extract_date_from_filename(file['filename'])
                 if date:
-                    dates.append(date)
-            
-            if len(dates) > 1:
-                dates.sort()
-                current = dates[0]
-                while current <= dates[-1]:
-                    if current not in dates:
-                        gaps.append({
-                            'prefix': prefix,
-                            'missing_date': current.strftime('%B %Y')
-                        })
-                    current = datetime(
-                        current.year + (current.month // 12),
-                        ((current.month % 12) + 1),
-                        1
-                    )
+                    indices.append(month_index(date.year, date.month))
+            
+            if len(indices) > 1:
+                for index in expand_ranges(self.gap_engine.find_gaps(('prefix', prefix), indices)):
+                    gaps.append({
+                        'prefix': prefix,
+                        'missing_date': month_label(index)
+                    })
         return gaps
         
+    def load_snapshot(self):
+        """Seed the catalog from the on-disk snapshot, marking it stale until refreshed."""
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return False
+            
+        try:
+            with gzip.open(self.snapshot_path, 'rt', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            if snapshot.get('format') != SNAPSHOT_FORMAT:
+                logger.warning(f"Ignoring catalog snapshot with unknown format {snapshot.get('format')}")
+                return False
+                
+            files = [{
+                'filename': filename,
+                'purpose': 'assistants',
+                'created_at': created_at,
+                'bytes': size,
+                'id': file_id
+            } for file_id, filename, created_at, size in snapshot['files']]
+            
+            # A fresh container may have no category store yet; restore it from the snapshot
+            if self.categories_file and not os.path.exists(self.categories_file) and 'categories' in snapshot:
+                with open(self.categories_file, 'w') as f:
+                    json.dump({
+                        'categories': snapshot['categories'],
+                        'file_categories': snapshot.get('file_categories', {})
+                    }, f, indent=4)
+                logger.info(f"Restored {self.categories_file} from catalog snapshot")
+            
+            with self._catalog_lock:
+                self._catalog = files
+                self.catalog_stale = True
+                self.catalog_updated_at = snapshot.get('saved_at')
+                self._watermark = tuple(snapshot['watermark']) if snapshot.get('watermark') else None
+            logger.info(f"Loaded {len(files)} files from catalog snapshot saved at {snapshot.get('saved_at')}")
+            return True
+        except Exception as e:
+            logger.error(f"Error loading catalog snapshot: {str(e)}")
+            return False
+    
+    def save_snapshot(self, files):
+        """Write a compact snapshot of the catalog and category mapping to disk."""
+        if not self.snapshot_path:
+            return
+            
+        try:
+            snapshot = {
+                'format': SNAPSHOT_FORMAT,
+                'saved_at': time.time(),
+                'watermark': self._watermark,
+                'files': [[f['id'], f['filename'], f['created_at'], f['bytes']] for f in files]
+            }
+            if self.categories_file and os.path.exists(self.categories_file):
+                with open(self.categories_file, 'r') as f:
+                    data = json.load(f)
+                snapshot['categories'] = data.get('categories', [])
+                snapshot['file_categories'] = data.get('file_categories', {})
+            
+            # Write to a temporary file first so a crash never leaves a truncated snapshot
+            tmp_path = f"{self.snapshot_path}.{os.getpid()}.tmp"
+            with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+                json.dump(snapshot, f, separators=(',', ':'))
+            os.replace(tmp_path, self.snapshot_path)
+            logger.info(f"Saved catalog snapshot with {len(files)} files")
+        except Exception as e:
+            logger.error(f"Error saving catalog snapshot: {str(e)}")
+    
+    def _adopt_shared_catalog(self):
+        """Load the shared catalog if another worker published a newer version; True if adopted."""
+        if not self.shared_cache:
+            return False
+        
+        try:
+            if self.shared_cache.version() == self._shared_version:
+                return False
+            shared = self.shared_cache.read()
+        except Exception as e:
+            logger.error(f"Error reading shared catalog: {str(e)}")
+            return False
+        if shared is None:
+            return False
+        
+        with self._catalog_lock:
+            initial_load = self._catalog is None
+            previous = {f['id']: f for f in (self._catalog or [])}
+            current_ids = {f['id'] for f in shared['files']}
+            added = [f for f in shared['files'] if f['id'] not in previous]
+            removed = [f for file_id, f in previous.items() if file_id not in current_ids]
+            self._catalog = shared['files']
+            self._shared_version = shared['version']
+            self._watermark = tuple(shared['watermark']) if shared['watermark'] else None
+            self._last_sync_at = shared['last_sync_at']
+            self._last_full_sync_at = shared['last_full_sync_at']
+            self.catalog_stale = False
+            self.catalog_updated_at = shared['last_sync_at']
+        
+        logger.debug("Adopted shared catalog version %s", shared['version'])
+        if not initial_load:
+            # The worker that synced already told the host-wide listeners
+            for file in added:
+                self._emit('added', file, adopted=True)
+            for file in removed:
+                self._emit('removed', file, adopted=True)
+        return True
+    
+    def _publish_shared_catalog(self, added, removed_ids, files, full_sync):
+        """Share this worker's catalog changes with the other workers."""
+        if not self.shared_cache:
+            return
+        
+        try:
+            with self._catalog_lock:
+                watermark = self._watermark
+                last_sync_at = self._last_sync_at
+                last_full_sync_at = self._last_full_sync_at
+            version = self.shared_cache.publish(
+                added, removed_ids, watermark, last_sync_at, last_full_sync_at,
+                replace=files if full_sync else None
+            )
+            with self._catalog_lock:
+                self._shared_version = version
+        except Exception as e:
+            logger.error(f"Error publishing shared catalog: {str(e)}")
+    
+    def _acquire_refresh_lease(self):
+        """Become the worker that talks to OpenAI for this host; always True without a shared cache."""
+        if not self.shared_cache:
+            return True
+        try:
+            return self.shared_cache.acquire_lease(REFRESH_LEASE)
+        except Exception as e:
+            # Without coordination every worker refreshing is better than none
+            logger.error(f"Error acquiring catalog refresh lease: {str(e)}")
+            return True
+    
+    def _release_refresh_lease(self):
+        if not self.shared_cache:
+            return
+        try:
+            self.shared_cache.release_lease(REFRESH_LEASE)
+        except Exception as e:
+            logger.error(f"Error releasing catalog refresh lease: {str(e)}")
+    
+    def _serve_last_known_catalog(self):
+        """Fall back to the catalog we already have, marked stale so nothing destructive trusts it."""
+        with self._catalog_lock:
+            if self._catalog is None:
+                return []
+            self.catalog_stale = True
+            return list(self._catalog)
+    
+    @property
+    def openai_unavailable(self):
+        """Whether catalog calls to OpenAI are currently being refused by the circuit breaker."""
+        return not self.breaker.available()
+    
+    def _wait_for_shared_catalog(self):
+        """Serve the catalog while another worker refreshes it, waiting for its first publish if needed."""
+        deadline = time.time() + SHARED_CATALOG_WAIT_SECONDS
+        while True:
+            self._adopt_shared_catalog()
+            with self._catalog_lock:
+                if self._catalog is not None:
+                    return list(self._catalog)
+            if time.time() > deadline:
+                logger.warning("Timed out waiting for the shared catalog")
+                return []
+            time.sleep(0.25)
+    
+    def _categories_changed_since_snapshot(self):
+        """Check whether the category store was written after the last snapshot."""
+        try:
+            return os.path.getmtime(self.categories_file) > os.path.getmtime(self.snapshot_path)
+        except (TypeError, OSError):
+            return bool(self.snapshot_path)
+    
+    def _start_background_refresh(self):
+        """Refresh the catalog in a background thread unless one is already running."""
+        with self._catalog_lock:
+            if self._refresh_thread and self._refresh_thread.is_alive():
+                return
+            self._refresh_thread = threading.Thread(target=self.refresh_catalog, name='catalog-refresh', daemon=True)
+            self._refresh_thread.start()
+    
+    def add_catalog_listener(self, callback, per_process=False):
+        """Register callback(event, file) for 'added' and 'removed' catalog events.
+        
+        The initial load of an empty catalog is not reported; listeners should
+        seed themselves from get_file_list() and then apply events.
+        
+        Each change is reported once per host, in the worker that synced it,
+        which suits listeners that update shared files. Listeners that keep
+        state in this process's memory pass per_process=True to also hear
+        about changes adopted from other workers through the shared catalog.
+        """
+        self._catalog_listeners.append((callback, per_process))
+    
+    def _emit(self, event, file, adopted=False):
+        """Notify catalog listeners, isolating them from each other's failures."""
+        for callback, per_process in self._catalog_listeners:
+            if adopted and not per_process:
+                continue
+            try:
+                callback(event, file)
+            except Exception as e:
+                logger.error(f"Error in catalog listener for {event} {file.get('id')}: {str(e)}")
+    
+    @staticmethod
+    def _file_record(file):
+        """Convert an OpenAI file object into the catalog's dict form."""
+        return {
+            'filename': file.filename,
+            'purpose': file.purpose,
+            'created_at': file.created_at,
+            'bytes': file.bytes,
+            'id': file.id
+        }
+    
+    def _list_files(self, **params):
+        """Yield assistant files from OpenAI, following the list cursor page by page.
+        
+        The refresh lease is renewed between pages so a long listing does not
+        outlive it; RefreshLeaseLost is raised if another worker took it over.
+        """
+        params = {'purpose': 'assistants', 'limit': LIST_PAGE_SIZE, **params}
+        while True:
+            page = self.client.files.list(**params)
+            data = page.data or []
+            for file in data:
+                yield file
+            has_more = getattr(page, 'has_more', None)
+            if not data or has_more is False or (has_more is None and len(data) < params['limit']):
+                return
+            if not self._acquire_refresh_lease():
+                raise RefreshLeaseLost("Another worker took over the catalog refresh")
+            params['after'] = data[-1].id
+    
+    def _apply_changes(self, added, removed_ids, full_sync, listed=None):
+        """Merge changes into the catalog, then emit events and persist the snapshot.
+        
+        listed is what an OpenAI listing returned; only a listing counts as a
+        sync and moves the delta-sync watermark. A file this process uploaded
+        is merged without it, since files other workers uploaded just before
+        may not have been listed yet and would be skipped by the next delta.
+        """
+        with self._catalog_lock:
+            initial_load = self._catalog is None
+            catalog = {f['id']: f for f in (self._catalog or [])}
+            removed = [catalog.pop(file_id) for file_id in removed_ids if file_id in catalog]
+            added = [f for f in added if f['id'] not in catalog]
+            for file in added:
+                catalog[file['id']] = file
+            files = sorted(catalog.values(), key=lambda x: x['created_at'], reverse=True)
+            self._catalog = files
+            self.catalog_updated_at = time.time()
+            if listed is not None:
+                self.catalog_stale = False
+                self._last_sync_at = self.catalog_updated_at
+                if full_sync:
+                    self._last_full_sync_at = self._last_sync_at
+                newest = max(((f['created_at'], f['id']) for f in listed), default=None)
+                if full_sync or self._watermark is None:
+                    self._watermark = newest
+                elif newest:
+                    self._watermark = max(self._watermark, newest)
+        
+        if not initial_load:
+            for file in added:
+                self._emit('added', file)
+            for file in removed:
+                self._emit('removed', file)
+        if added or removed or full_sync:
+            self._publish_shared_catalog(added, [f['id'] for f in removed], files, full_sync)
+        if added or removed or self._categories_changed_since_snapshot():
+            self.save_snapshot(files)
+        return list(files)
+    
     def get_file_list(self):
-        """Get list of files from the vector store."""
+        """Get list of files from the local catalog, syncing with OpenAI when it is due."""
         if self.limited_mode:
             logger.warning("Running in limited mode - no files will be returned")
             return []
-            
+        
+        self._adopt_shared_catalog()
+        with self._catalog_lock:
+            catalog = self._catalog
+            stale = self.catalog_stale
+            now = time.time()
+            full_sync_due = now - self._last_full_sync_at > CATALOG_FULL_SYNC_SECONDS
+            sync_due = now - self._last_sync_at > CATALOG_SYNC_SECONDS
+        
+        if catalog is None:
+            return self.refresh_catalog()
+        if stale or full_sync_due:
+            # While OpenAI is failing this also retries it, off the request path
+            # Serve what we have and let a full sweep (which also finds deletions) run behind it
+            self._start_background_refresh()
+            return list(catalog)
+        if sync_due:
+            return self.sync_catalog()
+        return list(catalog)
+    
+    def sync_catalog(self):
+        """Fetch only files created after the watermark and add them to the catalog."""
+        if self.limited_mode:
+            return []
+        
+        with self._catalog_lock:
+            watermark = self._watermark
+        if watermark is None:
+            return self.refresh_catalog()
+        if not self.breaker.available():
+            return self._serve_last_known_catalog()
+        
         try:
-            # Get assistant configuration first
-            logger.info(f"Retrieving assistant {self.assistant_id}")
-            assistant = self.client.beta.assistants.retrieve(self.assistant_id)
-            
-            # Get all files to get their metadata
-            logger.info("Retrieving file list from OpenAI")
-            files = self.client.files.list()
-            files_by_id = {f.id: f for f in files.data}
-            logger.info(f"Retrieved {len(files.data)} total files from OpenAI")
-            
-            # Get files attached to the assistant
-            assistant_files = []
-            for file_id in files_by_id:
-                if files_by_id[file_id].purpose == "assistants":
-                    file = files_by_id[file_id]
-                    assistant_files.append({
-                        'filename': file.filename,
-                        'purpose': file.purpose,
-                        'created_at': file.created_at,
-                        'bytes': file.bytes,
-                        'id': file.id
-                    })
-            
-            # Sort files chronologically
-            assistant_files.sort(key=lambda x: x['created_at'], reverse=True)
-            
-            logger.info(f"Found {len(assistant_files)} files associated with assistant")
-            return assistant_files
+            with self._sync_lock:
+                if not self._acquire_refresh_lease():
+                    return self._wait_for_shared_catalog()
+                try:
+                    # Another worker may have synced since we last looked
+                    self._adopt_shared_catalog()
+                    with self._catalog_lock:
+                        watermark = self._watermark or watermark
+                    added = self.breaker.call(
+                        lambda: [self._file_record(f) for f in self._list_files(order='asc', after=watermark[1])]
+                    )
+                    if added:
+                        logger.info(f"Delta sync found {len(added)} new files")
+                    return self._apply_changes(added, [], full_sync=False, listed=added)
+                finally:
+                    self._release_refresh_lease()
+        except CircuitOpenError:
+            return self._serve_last_known_catalog()
+        except RefreshLeaseLost as e:
+            logger.warning(f"Delta sync abandoned: {str(e)}")
+            return self._wait_for_shared_catalog()
+        except Exception as e:
+            # The watermark file may have been deleted, which invalidates the cursor
+            logger.warning(f"Delta sync failed, falling back to a full sweep: {str(e)}")
+            return self.refresh_catalog()
+    
+    def refresh_catalog(self):
+        """List every file from OpenAI, replacing the cached catalog and detecting deletions.
+        
+        If OpenAI fails, or its circuit is open, the last good catalog is
+        returned and marked stale instead.
+        """
+        if self.limited_mode:
+            return []
+        if not self.breaker.available():
+            return self._serve_last_known_catalog()
             
+        try:
+            with self._sync_lock:
+                if not self._acquire_refresh_lease():
+                    return self._wait_for_shared_catalog()
+                try:
+                    # Read the known IDs first so uploads recorded during the listing are not treated as deleted
+                    self._adopt_shared_catalog()
+                    with self._catalog_lock:
+                        previous_ids = {f['id'] for f in (self._catalog or [])}
+                    
+                    logger.info("Retrieving file list from OpenAI")
+                    files = self.breaker.call(lambda: [self._file_record(f) for f in self._list_files()])
+                    logger.info(f"Found {len(files)} files associated with assistant")
+                    
+                    current_ids = {f['id'] for f in files}
+                    added = [f for f in files if f['id'] not in previous_ids]
+                    removed_ids = previous_ids - current_ids
+                    if removed_ids:
+                        logger.info(f"Full sweep found {len(removed_ids)} deleted files")
+                    return self._apply_changes(added, removed_ids, full_sync=True, listed=files)
+                finally:
+                    self._release_refresh_lease()
+            
+        except CircuitOpenError:
+            return self._serve_last_known_catalog()
+        except RefreshLeaseLost as e:
+            logger.warning(f"Full sweep abandoned: {str(e)}")
+            return self._wait_for_shared_catalog()
         except Exception as e:
             logger.error(f"Error retrieving vector store files: {str(e)}", exc_info=True)
-            return []
+            return self._serve_last_known_catalog()
+    
+    def record_uploaded_file(self, file):
+        """Add a file this process just uploaded without waiting for the next sync."""
+        with self._catalog_lock:
+            if self._catalog is None:
+                return
+        self._apply_changes([self._file_record(file)], [], full_sync=False)
+    
+    def record_deleted_file(self, file_id):
+        """Drop a file this process just deleted without waiting for the next full sweep."""
+        with self._catalog_lock:
+            if self._catalog is None:
+                return
+        self._apply_changes([], [file_id], full_sync=False)
 
     def get_file_content(self, file_info):
         """Get the content of a file."""
@@ -193,69 +607,88 @@ class AssistantAnalyzer:
             logger.error(f"Error getting file content: {str(e)}")
             return ""
 
+    def stream_file_content(self, file_id, chunk_size=64 * 1024):
+        """Yield the raw content of a file from OpenAI in chunks, without holding it in memory.
+        
+        Raises CircuitOpenError on the first chunk while OpenAI is unavailable.
+        """
+        download = self.client.files.with_streaming_response.content(file_id)
+        # Opening the download is the call that fails during an outage; the body follows once it answered
+        response = self.breaker.call(download.__enter__)
+        try:
+            for chunk in response.iter_bytes(chunk_size):
+                yield chunk
+        finally:
+            download.__exit__(None, None, None)
+
     def upload_file(self, file_path):
         """Upload a file to the assistant."""
         if self.limited_mode:
             logger.warning("Cannot upload file in limited mode")
             return None
-            
-        try:
-            # Upload file
-            logger.info(f"Attempting to upload file: {file_path}")
-            with open(file_path, 'rb') as file:
-                logger.info("File opened successfully, creating OpenAI file...")
-                uploaded_file = self.client.files.create(
-                    file=file,
-                    purpose='assistants'
-                )
+        return self.upload_files([file_path])[0]
+
+    def upload_files(self, file_paths, wait=False):
+        """Upload files and add them to the vector store in as few file batches as possible.
+        
+        Returns the OpenAI file objects in the order given, with None for files
+        that failed to upload. Raises CircuitOpenError without uploading
+        anything while OpenAI is unavailable; if the circuit opens part way
+        through, the remaining files are not attempted.
+        """
+        if self.limited_mode:
+            logger.warning("Cannot upload files in limited mode")
+            return [None] * len(file_paths)
+        if not self.breaker.available():
+            raise CircuitOpenError(OPENAI_UNAVAILABLE_MESSAGE)
+        
+        uploaded = []
+        for file_path in file_paths:
+            try:
+                logger.info(f"Attempting to upload file: {file_path}")
+                with open(file_path, 'rb') as file:
+                    uploaded_file = self.breaker.call(self.client.files.create, file=file, purpose='assistants')
                 logger.info(f"File created in OpenAI with ID: {uploaded_file.id}")
-            
-            # Add file to assistant
-            if uploaded_file:
-                logger.info(f"Adding file {uploaded_file.id} to assistant {self.assistant_id}...")
-                
-                # Get current assistant configuration
-                assistant = self.client.beta.assistants.retrieve(self.assistant_id)
-                logger.info(f"Assistant configuration: {assistant}")
-                
-                # Get current tool resources
-                tool_resources = getattr(assistant, 'tool_resources', None)
-                logger.info(f"Current tool resources: {tool_resources}")
-                
-                # Get current files from code_interpreter
-                current_files = []
-                if tool_resources and hasattr(tool_resources, 'code_interpreter'):
-                    code_interpreter = tool_resources.code_interpreter
-                    if hasattr(code_interpreter, 'file_ids'):
-                        current_files = code_interpreter.file_ids
-                
-                logger.info(f"Current files: {current_files}")
-                
-                # Add new file to list if not already present
-                if uploaded_file.id not in current_files:
-                    current_files.append(uploaded_file.id)
-                
-                # Update assistant with new file list
-                logger.info("Updating assistant with new configuration...")
-                updated_assistant = self.client.beta.assistants.update(
-                    assistant_id=self.assistant_id,
-                    tools=[{"type": "code_interpreter"}, {"type": "file_search"}],
-                    tool_resources={
-                        "code_interpreter": {
-                            "file_ids": current_files
-                        }
-                    }
-                )
-                logger.info(f"Updated assistant configuration: {updated_assistant}")
-                
-                # Update assistant configuration
-                self._configure_assistant()
-                return uploaded_file
-            return None
-            
-        except Exception as e:
-            logger.error(f"Error uploading file: {str(e)}", exc_info=True)
-            return None
+                uploaded.append(uploaded_file)
+            except CircuitOpenError:
+                logger.warning(f"Not uploading {file_path}: OpenAI is unavailable")
+                uploaded.append(None)
+            except Exception as e:
+                logger.error(f"Error uploading file {file_path}: {str(e)}", exc_info=True)
+                uploaded.append(None)
+        
+        file_ids = [f.id for f in uploaded if f]
+        if file_ids:
+            try:
+                self.breaker.call(self.attach_to_vector_store, file_ids, wait=wait)
+            except Exception as e:
+                # The files exist in OpenAI even if indexing could not be started
+                logger.error(f"Error adding files to vector store: {str(e)}", exc_info=True)
+            for uploaded_file in uploaded:
+                if uploaded_file:
+                    self.record_uploaded_file(uploaded_file)
+        return uploaded
+
+    def attach_to_vector_store(self, file_ids, wait=False):
+        """Add files to the vector store using file batches, polling each batch at most once per interval."""
+        if not self.vector_store_id:
+            logger.warning("No vector store configured; uploaded files will not be searchable")
+            return []
+        
+        self._configure_assistant()
+        file_batches = self.client.beta.vector_stores.file_batches
+        batches = []
+        for start in range(0, len(file_ids), VECTOR_STORE_BATCH_SIZE):
+            chunk = file_ids[start:start + VECTOR_STORE_BATCH_SIZE]
+            batch = file_batches.create(vector_store_id=self.vector_store_id, file_ids=chunk)
+            logger.info(f"Created vector store file batch {batch.id} with {len(chunk)} files")
+            batches.append(batch)
+        
+        if wait:
+            batches = [file_batches.poll(batch.id, vector_store_id=self.vector_store_id) for batch in batches]
+            for batch in batches:
+                logger.info(f"Vector store file batch {batch.id} finished as {batch.status}: {batch.file_counts}")
+        return batches
 
     def delete_file(self, file_id):
         """Delete a file from OpenAI."""
@@ -266,13 +699,29 @@ class AssistantAnalyzer:
                 file_id = file_id['id']
             elif hasattr(file_id, 'id'):
                 file_id = file_id.id
-            self.client.files.delete(file_id=file_id)
-            logger.info(f"Successfully deleted file {file_id}")
             
-            # Update assistant configuration
-            self._configure_assistant()
+            # Remove it from the vector store first so it stops appearing in file_search results
+            if self.vector_store_id:
+                try:
+                    self.breaker.call(self.client.beta.vector_stores.files.delete, file_id,
+                                      vector_store_id=self.vector_store_id)
+                except CircuitOpenError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Could not remove file {file_id} from vector store: {str(e)}")
+            
+            try:
+                self.breaker.call(self.client.files.delete, file_id=file_id)
+                logger.info(f"Successfully deleted file {file_id}")
+            except openai.NotFoundError:
+                # A retried deletion whose first attempt already went through
+                logger.info(f"File {file_id} was already deleted")
+            self.record_deleted_file(file_id)
             
             return True
+        except CircuitOpenError:
+            logger.warning(f"Not deleting file {file_id}: OpenAI is unavailable")
+            return False
         except Exception as e:
             logger.error(f"Error deleting file: {str(e)}", exc_info=True)
             return False
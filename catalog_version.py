@@ -0,0 +1,120 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+class CatalogVersion:
+    """Monotonic catalog version counter shared by all worker processes.
+
+    The counter lives in a small JSON file so every gunicorn worker on the host
+    sees the same value. It is bumped whenever the catalog or the category
+    mapping changes, and responses derive their ETag and Last-Modified headers
+    from it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._cached_mtime = None
+        self._version = 0
+        self._updated_at = time.time()
+        self._verified_at = 0
+        self._verified_revision = None
+        # Seed the file so every worker derives Last-Modified from the same timestamp before the first bump
+        try:
+            self._update(lambda data: None if data else {'version': 0, 'updated_at': self._updated_at})
+        except (ValueError, OSError) as e:
+            logger.error(f"Error seeding catalog version: {str(e)}")
+
+    def _read(self):
+        """Read the counter from disk, reusing the cached value if the file is unchanged."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return self._version, self._updated_at
+        if mtime != self._cached_mtime:
+            try:
+                with open(self.path, 'r') as f:
+                    data = json.load(f)
+                self._version = int(data.get('version', 0))
+                self._updated_at = float(data.get('updated_at', time.time()))
+                self._cached_mtime = mtime
+            except (ValueError, OSError) as e:
+                logger.error(f"Error reading catalog version: {str(e)}")
+        return self._version, self._updated_at
+
+    def current(self):
+        """Return the current catalog version number."""
+        with self._lock:
+            return self._read()[0]
+
+    def last_modified(self):
+        """Return when the catalog last changed as an aware UTC datetime."""
+        with self._lock:
+            updated_at = self._read()[1]
+        return datetime.fromtimestamp(int(updated_at), tz=timezone.utc)
+
+    def _update(self, apply):
+        """Apply a change to the stored counter, holding a cross-process lock.
+
+        `apply` gets the stored data ({} if there is none) and returns the data
+        to write, or None to leave the file alone. The file is replaced rather
+        than rewritten, so readers never see a partial counter.
+        """
+        with self._lock, open(f"{self.path}.lock", 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(self.path, 'r') as f:
+                        data = json.load(f)
+                except FileNotFoundError:
+                    data = {}
+                data = apply(data)
+                if data is not None:
+                    tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                    with open(tmp_path, 'w') as f:
+                        json.dump(data, f)
+                    os.replace(tmp_path, self.path)
+                    self._version = data['version']
+                    self._updated_at = data['updated_at']
+                    self._cached_mtime = None
+                return data
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def bump(self, reason):
+        """Increment the catalog version and return the new value."""
+        data = self._update(lambda data: {'version': int(data.get('version', 0)) + 1, 'updated_at': time.time()})
+        logger.info(f"Catalog version bumped to {data['version']} ({reason})")
+        return data['version']
+
+    def etag(self, *parts):
+        """Build an ETag value for the current version and the request-specific parts."""
+        key = '\x1f'.join('' if part is None else str(part) for part in parts)
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+        return f"v{self.current()}-{digest}"
+
+    def mark_verified(self, revision=None):
+        """Record that this process has just reconciled the catalog with OpenAI, as of `revision`."""
+        self._verified_at = time.monotonic()
+        self._verified_revision = revision
+
+    def verified_at(self, revision):
+        """Check whether this process's last reconciliation was of the catalog as of `revision`."""
+        return bool(self._verified_at) and self._verified_revision == revision
+
+    def verified_within(self, seconds):
+        """Check whether this process reconciled the catalog in the last `seconds`."""
+        return self._verified_at and time.monotonic() - self._verified_at < seconds
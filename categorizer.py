@@ -0,0 +1,454 @@
+import os
+import re
+import json
+import atexit
+import time
+import hashlib
+import logging
+import threading
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATEGORY = "General Documents"
+
+# A keyword in the filename says more about a document than the same word somewhere in its text
+FILENAME_WEIGHT = 2.0
+CONTENT_WEIGHT = 1.0
+
+# Multi-word phrases like 'balance sheet' are more specific than single words
+PHRASE_WEIGHT = 1.5
+
+# How often the rules file is checked for edits
+RULES_CHECK_SECONDS = float(os.getenv('CATEGORIZATION_RULES_CHECK_SECONDS', 5))
+
+# Oldest cached results are dropped beyond this many documents
+MAX_CACHED_RESULTS = int(os.getenv('CATEGORIZATION_CACHE_SIZE', 50000))
+
+# New results are saved together this long after the first of them, rather than one write per miss
+CACHE_SAVE_SECONDS = float(os.getenv('CATEGORIZATION_CACHE_SAVE_SECONDS', 5))
+
+# Index entry for cached documents that matched no keyword and were placed by fallback rules
+NO_KEYWORDS = ''
+
+class Categorizer:
+    """Scores documents against every category at once with a keyword weight matrix.
+
+    Each keyword gets a row in a keyword-by-category matrix. A keyword shared
+    by several categories splits its weight between them, so 'inspection'
+    counts for less than 'hvac'. Scoring a batch builds a document-by-keyword
+    matrix of filename and content hits and multiplies it by the weights in
+    one NumPy product. With a dozen categories the matrix is small enough to
+    keep dense even though most of it is zero.
+
+    Categorizers are built from a rules dict, normally loaded from
+    categorization_rules.json; see from_rules.
+    """
+
+    def __init__(self, keywords, fallback_rules=(), default=DEFAULT_CATEGORY, extra_categories=(), version=None):
+        self.fallback_rules = [tuple(rule) for rule in fallback_rules]
+        self.default = default
+        self.version = version
+        self.categories = list(keywords)
+        self.rules = {
+            'version': version,
+            'default_category': default,
+            'extra_categories': list(extra_categories),
+            'categories': {category: list(words) for category, words in keywords.items()},
+            'fallback_rules': [list(rule) for rule in self.fallback_rules],
+        }
+        self.ruleset_hash = hashlib.sha256(json.dumps(
+            dict(self.rules, weights=[FILENAME_WEIGHT, CONTENT_WEIGHT, PHRASE_WEIGHT]), sort_keys=True
+        ).encode()).hexdigest()[:16]
+        # Every category a document can end up in, in the order the category store lists them
+        self.category_names = sorted(set(self.categories) | {default} | set(extra_categories))
+
+        self.keywords = sorted({keyword.lower() for words in keywords.values() for keyword in words})
+        keyword_slots = {keyword: slot for slot, keyword in enumerate(self.keywords)}
+        self.weights = np.zeros((len(self.keywords), len(self.categories)), dtype=np.float32)
+        for column, category in enumerate(self.categories):
+            for keyword in keywords[category]:
+                self.weights[keyword_slots[keyword.lower()], column] = 1.0
+        shared_by = self.weights.sum(axis=1, keepdims=True)
+        specificity = np.array([[PHRASE_WEIGHT if ' ' in keyword else 1.0] for keyword in self.keywords], dtype=np.float32)
+        self.weights *= specificity / np.maximum(shared_by, 1.0)
+
+        self._filename_pattern = self._content_pattern = None
+        if self.keywords:
+            # The lookahead reports a match at every position, so overlapping keywords are all found;
+            # keywords that start another keyword ('building' in 'building envelope') are credited alongside it
+            alternation = '|'.join(re.escape(keyword) for keyword in sorted(self.keywords, key=len, reverse=True))
+            self._filename_pattern = re.compile(f'(?=({alternation}))')
+            # Content is long prose, so only match at the start of a word ('pet' but not 'competent')
+            self._content_pattern = re.compile(f'(?<![a-z])(?=({alternation}))')
+        self._implied = {
+            keyword: [keyword_slots[other] for other in self.keywords if keyword.startswith(other)]
+            for keyword in self.keywords
+        }
+
+    @classmethod
+    def from_rules(cls, rules):
+        """Compile a rules dict as stored in categorization_rules.json."""
+        if not isinstance(rules.get('categories'), dict):
+            raise ValueError("Categorization rules need a 'categories' mapping")
+        return cls(
+            rules['categories'],
+            fallback_rules=rules.get('fallback_rules', []),
+            default=rules.get('default_category', DEFAULT_CATEGORY),
+            extra_categories=rules.get('extra_categories', []),
+            version=rules.get('version')
+        )
+
+    def _hits(self, pattern, text):
+        if pattern is None:
+            return []
+        slots = set()
+        for match in pattern.finditer(text):
+            slots.update(self._implied[match.group(1)])
+        return list(slots)
+
+    def _fallback(self, filename):
+        filename = filename.lower()
+        for pattern, category in self.fallback_rules:
+            if pattern in filename:
+                return category
+        return None
+
+    def score_batch(self, documents, top=3, with_keywords=False):
+        """Rank categories for (filename, content) pairs; content may be None.
+
+        Returns one list per document of up to `top` (category, confidence)
+        pairs, best first, where confidence is the category's share of the
+        document's total score. Documents without any keyword hit get their
+        fallback category with confidence 0, or the default category. With
+        with_keywords, each item is a (ranking, matched keywords) pair.
+        """
+        if not documents:
+            return []
+        hits = np.zeros((len(documents), len(self.keywords)), dtype=np.float32)
+        for row, (filename, content) in enumerate(documents):
+            hits[row, self._hits(self._filename_pattern, (filename or '').lower())] += FILENAME_WEIGHT
+            if content:
+                hits[row, self._hits(self._content_pattern, content.lower())] += CONTENT_WEIGHT
+
+        scores = hits @ self.weights
+        totals = scores.sum(axis=1)
+        # Stable sort on the negated scores keeps declaration order for ties
+        order = np.argsort(-scores, axis=1, kind='stable')[:, :top]
+
+        results = []
+        for row, (filename, content) in enumerate(documents):
+            if totals[row] <= 0:
+                ranked = [(self._fallback(filename or '') or self.default, 0.0)]
+            else:
+                ranked = [
+                    (self.categories[column], float(scores[row, column] / totals[row]))
+                    for column in order[row] if scores[row, column] > 0
+                ]
+            if with_keywords:
+                ranked = (ranked, [self.keywords[slot] for slot in np.flatnonzero(hits[row])])
+            results.append(ranked)
+        return results
+
+    def categorize_batch(self, documents):
+        """Return the best category for each (filename, content) pair."""
+        return [ranked[0][0] for ranked in self.score_batch(documents, top=1)]
+
+    def categorize(self, filename, content=None):
+        return self.categorize_batch([(filename, content)])[0]
+
+    def changed_keywords(self, other):
+        """Keywords whose weights differ between two rulesets, or None if every result may change.
+
+        Includes keywords that exist in only one of them, and NO_KEYWORDS when
+        the fallback rules or default category differ.
+        """
+        if self.categories != other.categories:
+            # Category order decides ties, so reordering can move any document
+            return None
+        mine = self._keyword_weights()
+        theirs = other._keyword_weights()
+        changed = {keyword for keyword in set(mine) | set(theirs) if mine.get(keyword) != theirs.get(keyword)}
+        if self.fallback_rules != other.fallback_rules or self.default != other.default:
+            changed.add(NO_KEYWORDS)
+        return changed
+
+    def _keyword_weights(self):
+        return {
+            keyword: tuple(float(weight) for weight in self.weights[slot])
+            for slot, keyword in enumerate(self.keywords)
+        }
+
+def load_rules(path):
+    """Read and compile a categorization rules file."""
+    with open(path, 'r') as f:
+        return Categorizer.from_rules(json.load(f))
+
+class CategorizationRules:
+    """Keeps a compiled categorizer in step with its rules file.
+
+    The file's modification time is checked at most every check_interval
+    seconds and the rules are recompiled when it changes, so edits apply
+    without a restart. A file that fails to load leaves the previous rules
+    in place.
+    """
+
+    def __init__(self, path, check_interval=RULES_CHECK_SECONDS):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._checked_at = 0
+        self._loaded_mtime = None
+        self._categorizer = Categorizer({})
+        self.current(force=True)
+
+    def current(self, force=False):
+        """Return the categorizer for the latest rules, reloading them if the file changed."""
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._checked_at < self.check_interval:
+                return self._categorizer
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+                if mtime != self._loaded_mtime:
+                    self._categorizer = load_rules(self.path)
+                    self._loaded_mtime = mtime
+                    logger.info(f"Loaded categorization rules version {self._categorizer.version} from {self.path}")
+            except Exception as e:
+                logger.error(f"Error loading categorization rules: {str(e)}")
+            return self._categorizer
+
+    @property
+    def category_names(self):
+        return self.current().category_names
+
+def document_key(filename, content=None):
+    """Cache key for a document: its filename, plus a hash of its content when there is any."""
+    if not content:
+        return filename
+    return f"{filename}\0{hashlib.sha256(content.encode('utf-8', errors='replace')).hexdigest()}"
+
+class CategorizationCache:
+    """Remembers categorizer results so unchanged documents are never scored twice.
+
+    Results are stored with the keywords each document matched, and an index
+    from keyword to documents is kept alongside. When the rules change, only
+    documents that matched a changed keyword, or whose filename contains a
+    newly added one, are scored again; every other result carries over.
+    The cache is saved as JSON next to the category store together with the
+    rules it was computed under, and reloaded by other workers when the file
+    changes. Results are used at once but saved in batches, at most every
+    save_delay seconds, and the file is written without holding the lock
+    that scoring needs. It offers the same scoring methods as Categorizer.
+    """
+
+    def __init__(self, rules, path, max_entries=MAX_CACHED_RESULTS, save_delay=CACHE_SAVE_SECONDS):
+        self.rules = rules
+        self.path = path
+        self.max_entries = max_entries
+        self.save_delay = save_delay
+        self._lock = threading.RLock()
+        self._loaded_mtime = None
+        self._basis = None
+        self._results = {}
+        self._matched = {}
+        self._by_keyword = {}
+        # key -> (ruleset hash, ranked, keywords) for results not saved yet
+        self._unsaved = {}
+        self._save_timer = None
+        with self._lock:
+            self._reload_if_changed()
+        atexit.register(self.flush)
+
+    def _put(self, key, ranked, keywords):
+        self._drop(key)
+        self._results[key] = ranked
+        self._matched[key] = keywords
+        for keyword in keywords or [NO_KEYWORDS]:
+            self._by_keyword.setdefault(keyword, set()).add(key)
+
+    def _drop(self, key):
+        if self._results.pop(key, None) is None:
+            return
+        for keyword in self._matched.pop(key) or [NO_KEYWORDS]:
+            keys = self._by_keyword.get(keyword)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_keyword[keyword]
+
+    def _reload_if_changed(self):
+        """Load results from disk if another process has saved newer ones."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._loaded_mtime:
+            return
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            basis = Categorizer.from_rules(data['rules'])
+            self._results, self._matched, self._by_keyword = {}, {}, {}
+            for key, ranked in data['results'].items():
+                self._put(key, [tuple(pair) for pair in ranked], data['keywords'].get(key, []))
+            self._basis = basis
+            self._loaded_mtime = mtime
+            # Results waiting to be saved stay usable
+            for key, (ruleset, ranked, keywords) in self._unsaved.items():
+                if ruleset == basis.ruleset_hash:
+                    self._put(key, ranked, keywords)
+        except Exception as e:
+            logger.error(f"Error loading categorization cache: {str(e)}")
+
+    def _rebase(self, categorizer):
+        """Bring cached results up to date with new rules, rescoring only the documents they affect."""
+        changed = self._basis.changed_keywords(categorizer)
+        if changed is None:
+            affected = set(self._results)
+        else:
+            affected = set()
+            for keyword in changed:
+                affected |= self._by_keyword.get(keyword, set())
+            added = [keyword for keyword in changed if keyword and keyword not in self._basis.keywords]
+            if added:
+                # New keywords have no index entries yet, so look for them in the cached filenames
+                pattern = re.compile('|'.join(re.escape(keyword) for keyword in added))
+                affected |= {key for key in self._results if '\0' in key or pattern.search(key.lower())}
+
+        # Content is not kept, so affected results that depended on it are dropped and rescored on demand
+        filenames = [key for key in affected if '\0' not in key]
+        for key in affected:
+            self._drop(key)
+        scored = categorizer.score_batch([(key, None) for key in filenames], top=len(categorizer.categories), with_keywords=True)
+        for key, (ranked, keywords) in zip(filenames, scored):
+            self._put(key, ranked, keywords)
+        logger.info(
+            f"Categorization rules version {self._basis.version} -> {categorizer.version}: "
+            f"rescored {len(filenames)} of {len(self._results)} cached documents"
+        )
+        self._basis = categorizer
+        return True
+
+    def _snapshot(self):
+        """Trim the cache to max_entries and return what to save; call with the lock held."""
+        for key in list(self._results)[:max(0, len(self._results) - self.max_entries)]:
+            self._drop(key)
+        return {
+            'ruleset': self._basis.ruleset_hash,
+            'rules': self._basis.rules,
+            'results': dict(self._results),
+            'keywords': dict(self._matched)
+        }
+
+    def _write(self, data):
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+        mtime = os.stat(self.path).st_mtime_ns
+        with self._lock:
+            self._loaded_mtime = mtime
+
+    def _update(self, apply):
+        """Apply a change on top of the latest saved cache and save it, holding a cross-process lock.
+
+        The lock that scoring needs is only held while the change is applied,
+        not while the file is written.
+        """
+        with open(f"{self.path}.lock", 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                with self._lock:
+                    self._reload_if_changed()
+                    data = self._snapshot() if apply() else None
+                if data is not None:
+                    self._write(data)
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _schedule_save(self):
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(self.save_delay, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def flush(self):
+        """Save the results scored since the last save, merged into the latest saved cache."""
+        with self._lock:
+            unsaved, self._unsaved = self._unsaved, {}
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+        if not unsaved:
+            return
+
+        def apply():
+            # Results scored under other rules than the saved cache's are dropped
+            kept = [(key, ranked, keywords) for key, (ruleset, ranked, keywords) in unsaved.items()
+                    if ruleset == self._basis.ruleset_hash]
+            for key, ranked, keywords in kept:
+                self._put(key, ranked, keywords)
+            return bool(kept)
+        try:
+            self._update(apply)
+        except Exception as e:
+            logger.error(f"Error saving categorization cache: {str(e)}")
+
+    def _current_rules(self):
+        """Return the categorizer to score with, rebasing the cache if the rules changed."""
+        categorizer = self.rules.current()
+        if self._basis is None:
+            self._basis = categorizer
+        if self._basis.ruleset_hash == categorizer.ruleset_hash:
+            return categorizer
+        if (self._basis.version or 0) > (categorizer.version or 0):
+            # Another worker already moved the cache to newer rules; catch up rather than rolling it back
+            categorizer = self.rules.current(force=True)
+        if self._basis.ruleset_hash != categorizer.ruleset_hash:
+            self._update(lambda: self._basis.ruleset_hash != categorizer.ruleset_hash and self._rebase(categorizer))
+        return categorizer
+
+    def score_batch(self, documents, top=3):
+        """Same as Categorizer.score_batch, scoring only documents that are not cached."""
+        keys = [document_key(filename, content) for filename, content in documents]
+        with self._lock:
+            self._reload_if_changed()
+            try:
+                categorizer = self._current_rules()
+            except Exception as e:
+                logger.error(f"Error updating categorization cache: {str(e)}")
+                categorizer = self._basis
+            found = {key: self._results[key] for key in keys if key in self._results}
+            missing = {}
+            for key, document in zip(keys, documents):
+                if key not in found:
+                    missing.setdefault(key, document)
+            if missing:
+                # Keep every positive category so any later `top` can be answered from the cache
+                scored = categorizer.score_batch(list(missing.values()), top=len(categorizer.categories), with_keywords=True)
+                # Results scored under other rules than the cache's are returned but not kept
+                if self._basis.ruleset_hash == categorizer.ruleset_hash:
+                    for key, (ranked, keywords) in zip(missing, scored):
+                        self._put(key, ranked, keywords)
+                        self._unsaved[key] = (categorizer.ruleset_hash, ranked, keywords)
+                    self._schedule_save()
+                found.update((key, ranked) for key, (ranked, keywords) in zip(missing, scored))
+            return [found[key][:top] for key in keys]
+
+    def categorize_batch(self, documents):
+        return [ranked[0][0] for ranked in self.score_batch(documents, top=1)]
+
+    def categorize(self, filename, content=None):
+        return self.categorize_batch([(filename, content)])[0]
+
+    def __len__(self):
+        return len(self._results)
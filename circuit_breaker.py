@@ -0,0 +1,99 @@
+import os
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Consecutive failures that open the circuit, and how long it stays open before a trial call
+FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', 3))
+RESET_SECONDS = float(os.getenv('CIRCUIT_RESET_SECONDS', 30))
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a service whose circuit is open."""
+
+class CircuitBreaker:
+    """Stops calling a failing service for a while so callers can fall back at once.
+
+    After failure_threshold consecutive failures the circuit opens and calls
+    are refused with CircuitOpenError. Once reset_seconds have passed a
+    single trial call is let through: success closes the circuit, failure
+    opens it again for another reset_seconds.
+
+    is_failure(error) decides which exceptions count against the service;
+    others (a bad request, say) show it is answering and count as success.
+    open_message, if given, is the text of the CircuitOpenError callers get.
+    """
+
+    def __init__(self, name, failure_threshold=FAILURE_THRESHOLD, reset_seconds=RESET_SECONDS, is_failure=None,
+                 open_message=None):
+        self.name = name
+        self.is_failure = is_failure or (lambda error: True)
+        self.open_message = open_message or f"{name} is unavailable (circuit open)"
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0
+        self.last_error = None
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def available(self):
+        """Whether a call would be attempted right now; does not claim the half-open trial."""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            return self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_seconds
+
+    def _allow(self):
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                # Only the caller that claims the trial gets through; others keep failing fast
+                self._state = HALF_OPEN
+                logger.info(f"Circuit {self.name} half-open, trying one call")
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info(f"Circuit {self.name} closed")
+            self._state = CLOSED
+            self._failures = 0
+            self.last_error = None
+
+    def record_failure(self, error=None):
+        with self._lock:
+            self._failures += 1
+            self.last_error = str(error) if error else None
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    logger.warning(f"Circuit {self.name} opened after {self._failures} failures: {self.last_error}")
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+
+    def call(self, func, *args, **kwargs):
+        """Call func through the breaker, raising CircuitOpenError while the circuit is open."""
+        if not self._allow():
+            raise CircuitOpenError(self.open_message)
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            if self.is_failure(e):
+                self.record_failure(e)
+            else:
+                self.record_success()
+            raise
+        self.record_success()
+        return result
@@ -0,0 +1,218 @@
+import os
+import json
+import heapq
+import logging
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+# Records held in memory at once while sorting; larger inputs are spilled to sorted temp files
+SORT_CHUNK_SIZE = int(os.getenv('CONSISTENCY_SORT_CHUNK_SIZE', 100000))
+
+# Characters read from the category store per chunk
+READ_CHUNK_CHARS = 1 << 16
+
+class JsonStream:
+    """Reads JSON values one at a time from a file without loading the whole document."""
+
+    def __init__(self, f, chunk_chars=None):
+        self.f = f
+        self.chunk_chars = chunk_chars or READ_CHUNK_CHARS
+        self.decoder = json.JSONDecoder()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        chunk = self.f.read(self.chunk_chars)
+        if not chunk:
+            self.eof = True
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+
+    def peek(self):
+        """Return the next non-whitespace character, or '' at the end of the file."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buf) or self.eof:
+                return self.buf[self.pos:self.pos + 1]
+            self._fill()
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at offset {self.pos} of the category store")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # A value ending exactly at the buffer edge may be a truncated number; read on to be sure
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+    def object_items(self):
+        """Yield the keys of the object starting at the current position.
+
+        The caller reads each key's value (with value() or another
+        object_items()) before asking for the next key.
+        """
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key
+            if self.peek() == ',':
+                self.pos += 1
+                continue
+            self.expect('}')
+            return
+
+def iter_store(path, field):
+    """Yield (key, value) pairs of a top-level object field of a JSON file, one pair at a time."""
+    with open(path, 'r') as f:
+        stream = JsonStream(f)
+        for key in stream.object_items():
+            if key != field:
+                stream.value()
+                continue
+            for item_key in stream.object_items():
+                yield item_key, stream.value()
+
+def read_store_field(path, field, default=None):
+    """Return one small top-level field of a JSON file, skipping over the others item by item."""
+    with open(path, 'r') as f:
+        stream = JsonStream(f)
+        for key in stream.object_items():
+            if key == field:
+                return stream.value()
+            if stream.peek() == '{':
+                for item_key in stream.object_items():
+                    stream.value()
+            else:
+                stream.value()
+    return default
+
+def _spill(records):
+    run = tempfile.TemporaryFile('w+', encoding='utf-8')
+    for record in records:
+        run.write(json.dumps(record))
+        run.write('\n')
+    run.seek(0)
+    return run
+
+def _read_run(run):
+    for line in run:
+        yield tuple(json.loads(line))
+
+def external_sort(records, chunk_size=SORT_CHUNK_SIZE):
+    """Yield (key, value) records in key order, holding at most chunk_size of them in memory.
+
+    Inputs that fit in one chunk are sorted in memory; larger ones are written
+    out as sorted runs and merged back with heapq.merge.
+    """
+    runs = []
+    chunk = []
+    try:
+        for record in records:
+            chunk.append(tuple(record))
+            if len(chunk) >= chunk_size:
+                runs.append(_spill(sorted(chunk)))
+                chunk = []
+        if not runs:
+            yield from sorted(chunk)
+            return
+        if chunk:
+            runs.append(_spill(sorted(chunk)))
+            chunk = []
+        yield from heapq.merge(*[_read_run(run) for run in runs])
+    finally:
+        for run in runs:
+            run.close()
+
+def merge_join(left, right):
+    """Join two key-sorted (key, value) streams with unique keys.
+
+    Yields (key, left value, right value); the side a key is missing from is None.
+    """
+    missing = object()
+    left, right = iter(left), iter(right)
+    left_item = next(left, missing)
+    right_item = next(right, missing)
+    while left_item is not missing or right_item is not missing:
+        if right_item is missing or (left_item is not missing and left_item[0] < right_item[0]):
+            yield left_item[0], left_item[1], None
+            left_item = next(left, missing)
+        elif left_item is missing or right_item[0] < left_item[0]:
+            yield right_item[0], None, right_item[1]
+            right_item = next(right, missing)
+        else:
+            yield left_item[0], left_item[1], right_item[1]
+            left_item = next(left, missing)
+            right_item = next(right, missing)
+
+def check_consistency(openai_files, categories_file, diff, chunk_size=SORT_CHUNK_SIZE):
+    """Compare OpenAI files with the category store and write each difference to diff as a JSON line.
+
+    openai_files yields (file_id, filename) in any order. Both sides are
+    sorted externally and merge-joined, so memory stays bounded however
+    large the catalog is. Returns the counts and the IDs of category
+    entries whose file no longer exists.
+    """
+    summary = {'openai_files': 0, 'categorized_files': 0, 'missing_from_openai': 0, 'missing_from_categories': 0}
+    stale_ids = []
+    store = iter_store(categories_file, 'file_categories') if os.path.exists(categories_file) else iter(())
+    joined = merge_join(external_sort(openai_files, chunk_size), external_sort(store, chunk_size))
+    for file_id, filename, category in joined:
+        if filename is not None:
+            summary['openai_files'] += 1
+        if category is not None:
+            summary['categorized_files'] += 1
+        if filename is None:
+            summary['missing_from_openai'] += 1
+            stale_ids.append(file_id)
+            record = {'op': 'missing_from_openai', 'id': file_id, 'category': category}
+        elif category is None:
+            summary['missing_from_categories'] += 1
+            record = {'op': 'missing_from_categories', 'id': file_id, 'filename': filename}
+        else:
+            continue
+        diff.write(json.dumps(record))
+        diff.write('\n')
+    return summary, stale_ids
+
+def remove_stale_entries(categories_file, stale_ids):
+    """Rewrite the category store without the given file IDs, keeping the declared category list."""
+    stale_ids = set(stale_ids)
+    if not stale_ids:
+        return 0
+    categories = read_store_field(categories_file, 'categories', [])
+    removed = 0
+    tmp_path = f"{categories_file}.{os.getpid()}.tmp"
+    # Same layout json.dump(indent=4) produces, written one entry at a time
+    with open(tmp_path, 'w') as f:
+        f.write('{\n    "categories": ')
+        f.write(json.dumps(categories, indent=4).replace('\n', '\n    '))
+        f.write(',\n    "file_categories": {')
+        separator = '\n'
+        for file_id, category in iter_store(categories_file, 'file_categories'):
+            if file_id in stale_ids:
+                removed += 1
+                continue
+            f.write(f'{separator}        {json.dumps(file_id)}: {json.dumps(category)}')
+            separator = ',\n'
+        f.write('\n    }\n}' if separator != '\n' else '}\n}')
+    os.replace(tmp_path, categories_file)
+    logger.info(f"Removed {removed} stale entries from {categories_file}")
+    return removed
@@ -15,7 +15,7 @@ source venv/bin/activate
 pip install -r requirements.txt
 
 # Start the application
-python3 app.py &
+python3 dev_server.py &
 
 # Wait for the app to start
 sleep 2
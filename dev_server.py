@@ -0,0 +1,14 @@
+import os
+
+# Development server: python dev_server.py
+# Kept apart from app.py because spawned worker processes (see preview_pipeline.py)
+# re-import the main module, and importing app.py sets up the whole application.
+
+def main():
+    from app import app, task_queue
+    task_queue.start()
+    port = int(os.environ.get('PORT', 5002))
+    app.run(host='0.0.0.0', port=port)
+
+if __name__ == '__main__':
+    main()
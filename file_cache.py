@@ -0,0 +1,138 @@
+import os
+import re
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Total size of cached document content; least recently served files are evicted beyond it
+MAX_CACHE_BYTES = int(os.getenv('FILE_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+
+# Download pieces are passed on (and written to disk) in chunks of this size
+CHUNK_SIZE = 64 * 1024
+
+# Partial downloads left behind by a killed worker are removed after this long
+STALE_TMP_SECONDS = 3600
+
+SAFE_FILE_ID = re.compile(r'^[A-Za-z0-9_-]+$')
+
+class FileCache:
+    """Size-bounded LRU cache of OpenAI file content on local disk.
+
+    Each file is stored under its file ID. OpenAI file content never
+    changes, so entries are only removed by eviction or deletion. The
+    modification time of an entry is its last use: serving an entry
+    touches it, and eviction removes the oldest entries until the cache
+    fits in max_bytes. The directory is the only state, so every worker
+    process on the host shares the same cache.
+    """
+
+    def __init__(self, directory, max_bytes=MAX_CACHE_BYTES):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, file_id):
+        if not SAFE_FILE_ID.match(file_id):
+            raise ValueError(f"Invalid file ID {file_id!r}")
+        return os.path.join(self.directory, file_id)
+
+    def cacheable(self, size):
+        """Whether a file of this size fits in the cache at all."""
+        return size is not None and size <= self.max_bytes
+
+    def lookup(self, file_id):
+        """Return the path of a cached file and mark it recently used, or None on a miss."""
+        path = self.path(file_id)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def fill(self, file_id, chunks):
+        """Pass chunks through while writing them to the cache.
+
+        The entry only appears once every chunk has been written, so a
+        download interrupted by an error or a closed connection leaves
+        nothing behind.
+        """
+        path = self.path(file_id)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        complete = False
+        try:
+            with open(tmp_path, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    yield chunk
+            os.replace(tmp_path, path)
+            complete = True
+            logger.info(f"Cached content of {file_id} ({os.path.getsize(path)} bytes)")
+        finally:
+            if not complete:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+        self.evict()
+
+    def store(self, file_id, chunks):
+        """Download chunks into the cache without serving them; returns the cached path."""
+        for chunk in self.fill(file_id, chunks):
+            pass
+        return self.path(file_id)
+
+    def remove(self, file_id):
+        try:
+            os.remove(self.path(file_id))
+        except (FileNotFoundError, ValueError):
+            pass
+
+    def on_catalog_change(self, event, file):
+        """Catalog listener that drops deleted files from the cache."""
+        if event == 'removed':
+            self.remove(file['id'])
+
+    def _entries(self):
+        now = time.time()
+        entries = []
+        for entry in os.scandir(self.directory):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            if entry.name.endswith('.tmp'):
+                if now - stat.st_mtime > STALE_TMP_SECONDS:
+                    self._remove_path(entry.path)
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    @staticmethod
+    def _remove_path(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes."""
+        with self._lock:
+            try:
+                entries = self._entries()
+            except Exception as e:
+                logger.error(f"Error scanning file cache: {str(e)}")
+                return
+            total = sum(size for mtime, size, path in entries)
+            for mtime, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                # Readers that already opened the file keep streaming it after the unlink
+                self._remove_path(path)
+                total -= size
+                logger.info(f"Evicted {os.path.basename(path)} from file cache")
+
+    def size(self):
+        return sum(size for mtime, size, path in self._entries())
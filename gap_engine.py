@@ -0,0 +1,137 @@
+import calendar
+import threading
+from datetime import datetime
+
+# Results for this many series are kept before the least recently used are dropped
+MAX_CACHED_SERIES = 4096
+
+def month_index(year, month):
+    """Number months consecutively so adjacent months differ by one."""
+    return year * 12 + (month - 1)
+
+def month_label(index):
+    """Format a month index the way gap reports show it, e.g. 'March 2024'."""
+    return f"{calendar.month_name[index % 12 + 1]} {index // 12}"
+
+def current_month_index():
+    now = datetime.now()
+    return month_index(now.year, now.month)
+
+def build_bitmap(indices):
+    """Pack month indices into an int with bit i set for month base + i."""
+    indices = set(indices)
+    if not indices:
+        return 0, None
+    base = min(indices)
+    bitmap = 0
+    for index in indices:
+        bitmap |= 1 << (index - base)
+    return bitmap, base
+
+def missing_ranges(bitmap, base, start, end):
+    """Return (first, last) month index pairs for every run of months absent from the bitmap.
+
+    Works on whole runs of missing months with bit operations rather than
+    stepping through the calendar one month at a time.
+    """
+    if base is None or end < start:
+        return []
+
+    # Align the bitmap so bit 0 is the start month, then flip it within the window
+    if start >= base:
+        window = bitmap >> (start - base)
+    else:
+        window = bitmap << (base - start)
+    width = end - start + 1
+    missing = ~window & ((1 << width) - 1)
+
+    ranges = []
+    while missing:
+        offset = (missing & -missing).bit_length() - 1
+        shifted = missing >> offset
+        # Length of the run of ones starting at offset
+        run = (~shifted & (shifted + 1)).bit_length() - 1
+        ranges.append((start + offset, start + offset + run - 1))
+        missing &= ~(((1 << run) - 1) << offset)
+    return ranges
+
+def expand_ranges(ranges):
+    """List every month index covered by the given ranges."""
+    return [index for first, last in ranges for index in range(first, last + 1)]
+
+class GapEngine:
+    """Gap detection for any number of dated series, cached per series.
+
+    A series is identified by a caller-chosen key (a category name, a filename
+    prefix, ...). Results are reused until the set of months in the series or
+    the requested window changes. Callers that pass a revision (a catalog
+    version, say) get cached results for it without rebuilding the bitmap.
+    """
+
+    def __init__(self, max_series=MAX_CACHED_SERIES):
+        self.max_series = max_series
+        self._lock = threading.Lock()
+        self._results = {}
+
+    def cached(self, key, revision):
+        """Return the ranges last computed for a series at this revision, or None.
+
+        Callers that can name the revision of their data check this before
+        working out the series' months at all.
+        """
+        if revision is None:
+            return None
+        with self._lock:
+            cached = self._results.pop(key, None)
+            if cached is None:
+                return None
+            self._results[key] = cached
+            return cached[2] if cached[0] == revision else None
+
+    def find_gaps(self, key, indices, start=None, end=None, revision=None):
+        """Return missing month ranges for a series between start and end (inclusive).
+
+        start defaults to the earliest month in the series and end to the latest.
+        A result cached for the same revision is returned without looking at indices.
+        """
+        ranges = self.cached(key, revision)
+        if ranges is not None:
+            return ranges
+
+        bitmap, base = build_bitmap(indices)
+        if base is None:
+            signature = None
+        else:
+            last = base + bitmap.bit_length() - 1
+            start = base if start is None else start
+            end = last if end is None else end
+            signature = (bitmap, base, start, end)
+        with self._lock:
+            cached = self._results.pop(key, None)
+            if cached and cached[1] == signature:
+                self._results[key] = (revision, signature, cached[2])
+                return cached[2]
+
+        ranges = missing_ranges(bitmap, base, start, end) if signature else []
+        with self._lock:
+            self._results[key] = (revision, signature, ranges)
+            while len(self._results) > self.max_series:
+                self._results.pop(next(iter(self._results)))
+        return ranges
+
+    def cached_months(self, key, revision):
+        """Like cached, but as a list of 'Month YYYY' labels."""
+        ranges = self.cached(key, revision)
+        return None if ranges is None else [month_label(index) for index in expand_ranges(ranges)]
+
+    def missing_months(self, key, indices, start=None, end=None, revision=None):
+        """Like find_gaps, but as a list of 'Month YYYY' labels."""
+        return [month_label(index) for index in expand_ranges(self.find_gaps(key, indices, start, end, revision))]
+
+    def invalidate(self, key=None):
+        """Forget cached results for one series, or for all of them."""
+        with self._lock:
+            if key is None:
+                self._results.clear()
+            else:
+                self._results.pop(key, None)
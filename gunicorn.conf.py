@@ -0,0 +1,59 @@
+import os
+import multiprocessing
+
+# Gunicorn settings for production; every value can be overridden from the environment
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+
+# Load the app once in the master so the analyzer, compiled regexes and caches are
+# shared copy-on-write by the workers instead of being rebuilt in each of them
+preload_app = True
+
+# Requests mostly wait on OpenAI, so threads keep one slow upload from blocking everyone else
+worker_class = 'gthread'
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+
+# Uploads and assistant runs can take minutes; give them room before a worker is killed
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 300))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 60))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers periodically, staggered so they do not all restart at once
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+# Heartbeat files on a disk-backed /tmp can stall workers inside containers
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG') or None
+errorlog = '-'
+loglevel = os.getenv('LOG_LEVEL', 'info').lower()
+
+def when_ready(server):
+    """Collect the workers' log records in the master, the only process that writes and rotates app.log."""
+    from logging_config import start_log_collector
+    start_log_collector()
+
+def on_exit(server):
+    from logging_config import stop_listener, stop_log_collector
+    stop_log_collector()
+    stop_listener()
+
+def post_fork(server, worker):
+    """Restart the log writer thread, which does not survive the fork from the preloaded master.
+
+    In a worker the thread forwards records to the master's collector. The task queue workers are started here too, so queued deletions resume as soon as a worker boots.
+    """
+    from logging_config import restart_listener
+    restart_listener()
+    from app import task_queue
+    task_queue.start()
+
+def worker_exit(server, worker):
+    """Flush queued log records before the worker goes away; unfinished tasks are resumed by another worker."""
+    from app import task_queue
+    task_queue.stop()
+    from logging_config import stop_listener
+    stop_listener()
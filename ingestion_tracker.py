@@ -0,0 +1,172 @@
+import os
+import time
+import logging
+import threading
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# Polling starts fast after an upload and slows down while nothing changes
+INGESTION_POLL_MIN_SECONDS = float(os.getenv('INGESTION_POLL_MIN_SECONDS', 2))
+INGESTION_POLL_MAX_SECONDS = float(os.getenv('INGESTION_POLL_MAX_SECONDS', 60))
+
+# Files still missing from the vector store listing after this long are reported as failed
+INGESTION_TIMEOUT_SECONDS = int(os.getenv('INGESTION_TIMEOUT_SECONDS', 3600))
+
+LIST_PAGE_SIZE = 100
+TRACKER_LEASE = 'ingestion-tracker'
+FINISHED_STATUSES = {'completed', 'failed', 'cancelled'}
+
+class MemoryIngestionStore:
+    """In-process ingestion status store, used when there is no shared catalog."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._statuses = {}
+        self._revision = 0
+
+    def set_ingestion_status(self, updates):
+        if not updates:
+            return
+        now = time.time()
+        with self._lock:
+            for file_id, (status, error) in updates.items():
+                self._statuses[file_id] = (status, error, now)
+            self._revision += 1
+
+    def ingestion_statuses(self, file_ids):
+        with self._lock:
+            return {file_id: self._statuses[file_id] for file_id in file_ids if file_id in self._statuses}
+
+    def pending_ingestion(self):
+        with self._lock:
+            return {file_id: updated_at for file_id, (status, error, updated_at) in self._statuses.items()
+                    if status == 'in_progress'}
+
+    def ingestion_counts(self):
+        with self._lock:
+            return dict(Counter(status for status, error, updated_at in self._statuses.values()))
+
+    def ingestion_revision(self):
+        return self._revision
+
+    def acquire_lease(self, name):
+        return True
+
+    def release_lease(self, name):
+        pass
+
+class IngestionTracker:
+    """Follows vector store indexing of uploaded files in a background thread.
+
+    Each tick makes one paged listing of the vector store's files, newest
+    first, and stops paging as soon as every pending file has been seen. With
+    a shared store only the worker holding the tracker lease polls, and any
+    worker can answer status queries.
+    """
+
+    def __init__(self, analyzer, store=None):
+        self.analyzer = analyzer
+        self.store = store or MemoryIngestionStore()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._wake = threading.Event()
+
+    @property
+    def enabled(self):
+        return bool(self.analyzer and not self.analyzer.limited_mode and self.analyzer.vector_store_id)
+
+    def track(self, file_ids):
+        """Start following newly uploaded files."""
+        if not self.enabled or not file_ids:
+            return
+        self.store.set_ingestion_status({file_id: ('in_progress', None) for file_id in file_ids})
+        self._wake.set()
+        self._ensure_running()
+
+    def statuses(self, file_ids):
+        """Return {file_id: {'status', 'error'}} for the tracked files among file_ids."""
+        statuses = self.store.ingestion_statuses(file_ids)
+        if any(status == 'in_progress' for status, error, updated_at in statuses.values()):
+            # Resume polling if the worker that was tracking these files has gone away
+            self._ensure_running()
+        return {file_id: {'status': status, 'error': error} for file_id, (status, error, updated_at) in statuses.items()}
+
+    def summary(self):
+        """Number of tracked files per status."""
+        return self.store.ingestion_counts()
+
+    def revision(self):
+        """Changes whenever any tracked status changes; used in response ETags."""
+        return self.store.ingestion_revision()
+
+    def _ensure_running(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='ingestion-tracker', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        interval = INGESTION_POLL_MIN_SECONDS
+        while True:
+            # Decide to exit under the lock so a concurrent track() either is seen here or starts a new thread
+            with self._lock:
+                if not self.store.pending_ingestion():
+                    self._thread = None
+                    break
+            self._wake.clear()
+            changed = 0
+            try:
+                if self.store.acquire_lease(TRACKER_LEASE):
+                    changed = self.poll_once()
+            except Exception as e:
+                logger.error(f"Error polling vector store ingestion: {str(e)}")
+
+            # New uploads reset the backoff; otherwise wait longer each time nothing finished
+            interval = INGESTION_POLL_MIN_SECONDS if changed else min(interval * 2, INGESTION_POLL_MAX_SECONDS)
+            if self._wake.wait(interval):
+                interval = INGESTION_POLL_MIN_SECONDS
+        self.store.release_lease(TRACKER_LEASE)
+
+    def _list_vector_store_files(self):
+        """Yield the vector store's files newest first, one page at a time."""
+        vector_store_files = self.analyzer.client.beta.vector_stores.files
+        params = {'limit': LIST_PAGE_SIZE, 'order': 'desc'}
+        while True:
+            page = vector_store_files.list(self.analyzer.vector_store_id, **params)
+            data = page.data or []
+            for vector_store_file in data:
+                yield vector_store_file
+            has_more = getattr(page, 'has_more', None)
+            if not data or has_more is False or (has_more is None and len(data) < LIST_PAGE_SIZE):
+                return
+            params['after'] = data[-1].id
+
+    def poll_once(self):
+        """Check every pending file with one paged listing; return how many finished."""
+        pending = self.store.pending_ingestion()
+        if not pending:
+            return 0
+
+        updates = {}
+        seen = set()
+        for vector_store_file in self._list_vector_store_files():
+            if vector_store_file.id not in pending:
+                continue
+            seen.add(vector_store_file.id)
+            if vector_store_file.status in FINISHED_STATUSES:
+                last_error = getattr(vector_store_file, 'last_error', None)
+                updates[vector_store_file.id] = (vector_store_file.status, getattr(last_error, 'message', None))
+            if len(seen) == len(pending):
+                break
+
+        now = time.time()
+        for file_id, tracked_at in pending.items():
+            if file_id not in seen and now - tracked_at > INGESTION_TIMEOUT_SECONDS:
+                updates[file_id] = ('failed', 'File never appeared in the vector store')
+
+        if updates:
+            self.store.set_ingestion_status(updates)
+            logger.info(f"Vector store ingestion: {len(updates)} finished, {len(pending) - len(updates)} still pending")
+        return len(updates)
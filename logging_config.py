@@ -0,0 +1,200 @@
+import os
+import time
+import queue
+import pickle
+import shutil
+import struct
+import atexit
+import logging
+import tempfile
+import threading
+import socketserver
+from collections import OrderedDict
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, SocketHandler
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Rotation keeps app.log from growing without bound
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))
+
+# Each distinct DEBUG message template may be emitted this many times per window
+DEBUG_LOG_BURST = int(os.getenv('DEBUG_LOG_BURST', 20))
+DEBUG_LOG_WINDOW_SECONDS = float(os.getenv('DEBUG_LOG_WINDOW_SECONDS', 60))
+
+# Templates tracked at once; the least recently seen are forgotten beyond this
+DEBUG_LOG_MAX_TEMPLATES = 1000
+
+_listener = None
+_queue_handler = None
+_handlers = []
+
+# Set in the gunicorn master; forked workers send their records there instead of opening app.log
+_collector = None
+_collector_path = None
+_collector_pid = None
+
+class DebugRateLimitFilter(logging.Filter):
+    """Drop repeated DEBUG records once a message template exceeds its burst budget.
+
+    Records are grouped by logger name and unformatted message, so per-file
+    messages logged with %-style arguments share one budget. When a window
+    closes, the next record of that template reports how many were dropped.
+    Templates whose window has closed with nothing suppressed are forgotten
+    once per window, and at most max_templates are tracked, so messages
+    formatted before logging cannot grow the table without bound.
+    """
+
+    def __init__(self, burst=DEBUG_LOG_BURST, window=DEBUG_LOG_WINDOW_SECONDS, max_templates=DEBUG_LOG_MAX_TEMPLATES):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.max_templates = max_templates
+        self._lock = threading.Lock()
+        self._windows = OrderedDict()
+        self._next_prune = time.monotonic() + window
+
+    def _prune(self, now):
+        self._next_prune = now + self.window
+        expired = [key for key, (started, count, dropped) in self._windows.items()
+                   if now - started >= self.window and not dropped]
+        for key in expired:
+            del self._windows[key]
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG:
+            return True
+
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_prune:
+                self._prune(now)
+            started, count, dropped = self._windows.pop(key, (now, 0, 0))
+            if now - started >= self.window:
+                if dropped:
+                    record.msg = f"{record.msg} [{dropped} similar messages suppressed]"
+                started, count, dropped = now, 0, 0
+            if len(self._windows) >= self.max_templates:
+                self._windows.popitem(last=False)
+            if count >= self.burst:
+                self._windows[key] = (started, count, dropped + 1)
+                return False
+            self._windows[key] = (started, count + 1, dropped)
+        return True
+
+def configure_logging(log_file=None, level=None):
+    """Send all log records through a queue to a background writer thread.
+
+    Request threads only enqueue records; the listener thread does the file and
+    console I/O. Any handlers installed earlier (for example by basicConfig in
+    an imported module) are replaced.
+    """
+    global _listener, _queue_handler, _handlers
+
+    log_file = log_file or os.getenv('LOG_FILE', 'app.log')
+    level = level or os.getenv('LOG_LEVEL', 'INFO')
+
+    if _forwarding():
+        # A worker of a server whose master collects the logs (app not preloaded)
+        _handlers = [SocketHandler(_collector_path, None)]
+    else:
+        formatter = logging.Formatter(LOG_FORMAT)
+        file_handler = RotatingFileHandler(log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT)
+        stream_handler = logging.StreamHandler()
+        for handler in (file_handler, stream_handler):
+            handler.setFormatter(formatter)
+        _handlers = [file_handler, stream_handler]
+
+    stop_listener()
+    log_queue = queue.SimpleQueue()
+    _queue_handler = QueueHandler(log_queue)
+    _queue_handler.addFilter(DebugRateLimitFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(level)
+
+    _listener = QueueListener(log_queue, *_handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_listener)
+    return _listener
+
+def restart_listener():
+    """Start a fresh writer thread in a worker process forked after configuration.
+
+    Threads do not survive fork, so a preloaded app must call this in each
+    worker or its records would sit in the queue forever. When the master
+    runs a collector, the worker's thread forwards records to it rather
+    than writing app.log itself.
+    """
+    global _listener, _handlers
+    if _queue_handler is None:
+        return
+    if _forwarding():
+        _handlers = [SocketHandler(_collector_path, None)]
+    log_queue = queue.SimpleQueue()
+    _queue_handler.queue = log_queue
+    _listener = QueueListener(log_queue, *_handlers, respect_handler_level=True)
+    _listener.start()
+
+def stop_listener():
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+    _listener = None
+
+def _forwarding():
+    return _collector_path is not None and os.getpid() != _collector_pid
+
+class _RecordReceiver(socketserver.StreamRequestHandler):
+    """Reads the length-prefixed pickled records a SocketHandler sends."""
+
+    def handle(self):
+        while True:
+            header = self.rfile.read(4)
+            if len(header) < 4:
+                return
+            length = struct.unpack('>L', header)[0]
+            data = self.rfile.read(length)
+            if len(data) < length:
+                return
+            record = logging.makeLogRecord(pickle.loads(data))
+            # Straight to the writer: the worker already applied its level and rate limit
+            _queue_handler.queue.put(record)
+
+def start_log_collector():
+    """Make this process the only writer of the log file for the workers it forks.
+
+    Called in the gunicorn master before workers start. Each worker opening
+    its own RotatingFileHandler on app.log would rotate it on its own count
+    and lose records; instead workers send records over a Unix socket and
+    the master's writer thread formats, writes and rotates them all. The
+    socket lives in a private directory, since it accepts pickled records.
+    """
+    global _collector, _collector_path, _collector_pid
+    if _collector is not None:
+        return _collector_path
+    if _queue_handler is None:
+        configure_logging()
+    path = os.path.join(tempfile.mkdtemp(prefix='app-log-'), 'collector.sock')
+    _collector = socketserver.ThreadingUnixStreamServer(path, _RecordReceiver)
+    _collector.daemon_threads = True
+    threading.Thread(target=_collector.serve_forever, name='log-collector', daemon=True).start()
+    _collector_path = path
+    _collector_pid = os.getpid()
+    atexit.register(stop_log_collector)
+    return path
+
+def stop_log_collector():
+    """Stop accepting records from workers; only the process that started the collector does anything."""
+    global _collector, _collector_path, _collector_pid
+    if _collector is None or os.getpid() != _collector_pid:
+        return
+    _collector.shutdown()
+    _collector.server_close()
+    shutil.rmtree(os.path.dirname(_collector_path), ignore_errors=True)
+    _collector = _collector_path = _collector_pid = None
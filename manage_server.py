@@ -81,7 +81,7 @@ class ServerManager:
             try:
                 if proc.info['name'] and 'python' in proc.info['name'].lower():
                     cmdline = proc.info['cmdline']
-                    if cmdline and any('app.py' in arg for arg in cmdline):
+                    if cmdline and any(arg.endswith(('app.py', 'dev_server.py')) for arg in cmdline):
                         python_processes.append(proc)
             except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
                 continue
@@ -236,7 +236,7 @@ class ServerManager:
 
             # Start Flask app in a separate process
             env = os.environ.copy()
-            server_script = str(self.base_dir / 'app.py')
+            server_script = str(self.base_dir / 'dev_server.py')
             
             # Start the Flask app with output redirection
             with open(os.devnull, 'w') as devnull:
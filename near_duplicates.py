@@ -0,0 +1,327 @@
+import os
+import re
+import zlib
+import sqlite3
+import logging
+import threading
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 16 bands of 8 rows make pairs above roughly 0.7 similarity likely to share a bucket
+NUM_PERMUTATIONS = 128
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+
+# Bump when shingling or the hash family changes so old signatures are rebuilt
+INDEX_FORMAT = 1
+
+# Change log entries kept; a worker further behind than this reloads every signature
+CHANGE_LOG_KEEP = 10000
+
+# Signatures saved before the move to SQLite are imported once from this file next to the database
+LEGACY_SUFFIX = '.npz'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS signatures (
+    file_id TEXT PRIMARY KEY,
+    signature BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    file_id TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value
+);
+"""
+
+# Estimated Jaccard similarity at which two documents count as near duplicates
+SIMILARITY_THRESHOLD = float(os.getenv('NEAR_DUPLICATE_THRESHOLD', 0.8))
+
+SHINGLE_SIZE = 5
+MERSENNE_PRIME = (1 << 31) - 1
+WORD_PATTERN = re.compile(r'[a-z0-9]+')
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Hash every run of `size` consecutive words to a 32-bit integer."""
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < size:
+        return np.array([zlib.crc32(' '.join(words).encode())] if words else [], dtype=np.uint64)
+    return np.unique(np.fromiter(
+        (zlib.crc32(' '.join(words[i:i + size]).encode()) for i in range(len(words) - size + 1)),
+        dtype=np.uint64
+    ))
+
+class MinHasher:
+    """Computes MinHash signatures with a fixed family of universal hash functions."""
+
+    def __init__(self, num_permutations=NUM_PERMUTATIONS, seed=1):
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, MERSENNE_PRIME, size=num_permutations).astype(np.uint64)
+        self.b = rng.randint(0, MERSENNE_PRIME, size=num_permutations).astype(np.uint64)
+
+    def signature(self, hashes, chunk_size=4096):
+        """Return the signature of a set of shingle hashes, or None if it is empty."""
+        if not len(hashes):
+            return None
+        signature = np.full(len(self.a), MERSENNE_PRIME, dtype=np.uint64)
+        # a < 2^31 and hashes < 2^32, so products stay within 64 bits
+        for start in range(0, len(hashes), chunk_size):
+            chunk = hashes[start:start + chunk_size]
+            values = (np.outer(self.a, chunk) + self.b[:, None]) % MERSENNE_PRIME
+            signature = np.minimum(signature, values.min(axis=1))
+        return signature.astype(np.uint32)
+
+class NearDuplicateIndex:
+    """Finds near-duplicate documents with MinHash signatures and LSH banding.
+
+    Each signature is split into bands; documents sharing any band land in
+    the same bucket and become candidate pairs, so finding matches for a new
+    document costs about the size of its buckets rather than the corpus.
+    Candidates are confirmed by comparing full signatures. Signatures are
+    stored in SQLite shared by every worker on the host; each write also
+    appends the file ID to a change log, so other workers bucket only the
+    signatures that changed since they last looked.
+    """
+
+    def __init__(self, path, threshold=SIMILARITY_THRESHOLD):
+        if path.endswith(LEGACY_SUFFIX):
+            # Settings written for the NumPy signature file keep working
+            path = path[:-len(LEGACY_SUFFIX)] + '.sqlite3'
+        self.path = path
+        self.threshold = threshold
+        self.hasher = MinHasher()
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._seq = None
+        self._reset()
+        self._migrate()
+        self._reload_if_changed()
+
+    def _reset(self):
+        self._signatures = {}
+        self._buckets = {}
+        self._matches = {}
+
+    def _bands(self, signature):
+        return [(band, signature[band * LSH_ROWS:(band + 1) * LSH_ROWS].tobytes()) for band in range(LSH_BANDS)]
+
+    def _add(self, file_id, signature):
+        self._remove(file_id)
+        candidates = set()
+        for key in self._bands(signature):
+            bucket = self._buckets.setdefault(key, set())
+            candidates |= bucket
+            bucket.add(file_id)
+
+        self._signatures[file_id] = signature
+        self._matches[file_id] = {}
+        for other in candidates:
+            similarity = float(np.mean(signature == self._signatures[other]))
+            if similarity >= self.threshold:
+                self._matches[file_id][other] = similarity
+                self._matches[other][file_id] = similarity
+        return self._matches[file_id]
+
+    def _remove(self, file_id):
+        signature = self._signatures.pop(file_id, None)
+        if signature is None:
+            return False
+        for key in self._bands(signature):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(file_id)
+                if not bucket:
+                    del self._buckets[key]
+        for other in self._matches.pop(file_id, {}):
+            self._matches[other].pop(file_id, None)
+        return True
+
+    def _connect(self):
+        """Return this thread's connection, reopening it after a fork."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _migrate(self):
+        """Create the tables, clearing signatures made with another format or importing the old NumPy file."""
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'format'").fetchone()
+            if row and row[0] == INDEX_FORMAT:
+                conn.execute('COMMIT')
+                return
+            if row:
+                logger.warning(f"Rebuilding near-duplicate index with unknown format {row[0]}")
+            # Readers that loaded the old signatures see they are behind the log and load everything again
+            latest = conn.execute('SELECT COALESCE(MAX(seq), 0) FROM changes').fetchone()[0]
+            conn.execute('DELETE FROM signatures')
+            conn.execute('DELETE FROM changes')
+            conn.executemany('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', [
+                ('format', INDEX_FORMAT),
+                ('compacted_through', max(latest, self._meta(conn).get('compacted_through', 0)))
+            ])
+            legacy_path = re.sub(r'\.sqlite3$', '', self.path) + LEGACY_SUFFIX
+            if row is None and os.path.exists(legacy_path):
+                self._import_legacy(conn, legacy_path)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    @staticmethod
+    def _meta(conn):
+        return dict(conn.execute('SELECT key, value FROM meta').fetchall())
+
+    @staticmethod
+    def _import_legacy(conn, legacy_path):
+        try:
+            with np.load(legacy_path, allow_pickle=False) as data:
+                file_ids = data['file_ids'].tolist()
+                signatures = data['signatures']
+        except Exception as e:
+            logger.error(f"Error importing near-duplicate signatures from {legacy_path}: {str(e)}")
+            return
+        conn.executemany('INSERT OR REPLACE INTO signatures (file_id, signature) VALUES (?, ?)', [
+            (file_id, signature.astype(np.uint32).tobytes()) for file_id, signature in zip(file_ids, signatures)
+        ])
+        logger.info(f"Imported {len(file_ids)} near-duplicate signatures from {legacy_path}; it is no longer used")
+
+    def _reload_if_changed(self):
+        """Bring the buckets up to date with signatures other processes have written.
+
+        Only signatures changed since the last load are read and re-bucketed.
+        A reader that has fallen behind the compacted part of the change log
+        loads everything.
+        """
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN')
+            try:
+                compacted = self._meta(conn).get('compacted_through', 0)
+                latest = max(compacted, conn.execute('SELECT COALESCE(MAX(seq), 0) FROM changes').fetchone()[0])
+                if latest == self._seq:
+                    return
+                if self._seq is None or self._seq < compacted or self._seq > latest:
+                    self._reset()
+                    for file_id, signature in conn.execute('SELECT file_id, signature FROM signatures'):
+                        self._add(file_id, np.frombuffer(signature, dtype=np.uint32))
+                    logger.info(f"Loaded near-duplicate signatures for {len(self._signatures)} documents")
+                else:
+                    changed = [file_id for file_id, in conn.execute(
+                        'SELECT file_id FROM changes WHERE seq > ? GROUP BY file_id ORDER BY MAX(seq)', (self._seq,)
+                    )]
+                    for file_id in changed:
+                        row = conn.execute('SELECT signature FROM signatures WHERE file_id = ?', (file_id,)).fetchone()
+                        if row is None:
+                            self._remove(file_id)
+                        else:
+                            self._add(file_id, np.frombuffer(row[0], dtype=np.uint32))
+                self._seq = latest
+            finally:
+                conn.execute('COMMIT')
+        except Exception as e:
+            logger.error(f"Error loading near-duplicate index: {str(e)}")
+
+    def _update(self, added=(), removed=()):
+        """Write signatures and removals with their change log entries in one transaction, then load them."""
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany('INSERT OR REPLACE INTO signatures (file_id, signature) VALUES (?, ?)', [
+                (file_id, signature.tobytes()) for file_id, signature in added
+            ])
+            changed = [file_id for file_id, signature in added] + [
+                file_id for file_id in removed
+                if conn.execute('DELETE FROM signatures WHERE file_id = ?', (file_id,)).rowcount
+            ]
+            if changed:
+                conn.executemany('INSERT INTO changes (file_id) VALUES (?)', [(file_id,) for file_id in changed])
+                cutoff = conn.execute('SELECT MAX(seq) FROM changes').fetchone()[0] - CHANGE_LOG_KEEP
+                if conn.execute('DELETE FROM changes WHERE seq <= ?', (cutoff,)).rowcount:
+                    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('compacted_through', ?)", (cutoff,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        with self._lock:
+            self._reload_if_changed()
+
+    def add_documents(self, documents):
+        """Add (file_id, text) pairs and return {file_id: {match_id: similarity}} for those with matches."""
+        signatures = [(file_id, self.hasher.signature(shingles(text))) for file_id, text in documents]
+        signatures = [(file_id, signature) for file_id, signature in signatures if signature is not None]
+        if not signatures:
+            return {}
+        self._update(added=signatures)
+        with self._lock:
+            matches = {
+                file_id: dict(self._matches[file_id])
+                for file_id, signature in signatures if self._matches.get(file_id)
+            }
+        for file_id, found in matches.items():
+            logger.info(f"File {file_id} is a near duplicate of {', '.join(found)}")
+        return matches
+
+    def remove_document(self, file_id):
+        self._update(removed=[file_id])
+
+    def on_catalog_change(self, event, file):
+        """Catalog listener that forgets deleted files.
+
+        Another worker may have added the signature after this one last
+        loaded, so the removal goes to the shared store unconditionally.
+        """
+        if event == 'removed':
+            self.remove_document(file['id'])
+
+    def __contains__(self, file_id):
+        return file_id in self._signatures
+
+    def revision(self):
+        with self._lock:
+            self._reload_if_changed()
+            return self._seq
+
+    def clusters(self):
+        """Group near-duplicate documents with union-find.
+
+        Returns a list of {'files': [...], 'pairs': [(a, b, similarity), ...]},
+        largest clusters first.
+        """
+        with self._lock:
+            self._reload_if_changed()
+            parent = {}
+
+            def find(file_id):
+                parent.setdefault(file_id, file_id)
+                while parent[file_id] != file_id:
+                    parent[file_id] = parent[parent[file_id]]
+                    file_id = parent[file_id]
+                return file_id
+
+            pairs = []
+            for file_id, matches in self._matches.items():
+                for other, similarity in matches.items():
+                    if file_id < other:
+                        pairs.append((file_id, other, similarity))
+                        parent[find(file_id)] = find(other)
+
+            groups = {}
+            for file_id in parent:
+                groups.setdefault(find(file_id), {'files': [], 'pairs': []})['files'].append(file_id)
+            for file_id, other, similarity in pairs:
+                groups[find(file_id)]['pairs'].append((file_id, other, round(similarity, 3)))
+        clusters = sorted(groups.values(), key=lambda group: (-len(group['files']), group['files']))
+        for cluster in clusters:
+            cluster['files'].sort()
+        return clusters
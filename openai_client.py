@@ -0,0 +1,253 @@
+import os
+import re
+import time
+import random
+import logging
+import threading
+import httpx
+from openai import OpenAI, DefaultHttpxClient, DEFAULT_CONNECTION_LIMITS
+
+logger = logging.getLogger(__name__)
+
+# Request rate assumed for an endpoint class until OpenAI reports the real limit
+DEFAULT_REQUESTS_PER_MINUTE = float(os.getenv('OPENAI_DEFAULT_RPM', 500))
+
+# Concurrent requests per endpoint class; adjusted between 1 and the maximum as quota allows
+INITIAL_CONCURRENCY = int(os.getenv('OPENAI_INITIAL_CONCURRENCY', 4))
+MAX_CONCURRENCY = int(os.getenv('OPENAI_MAX_CONCURRENCY', 16))
+
+# Concurrency shrinks below this share of remaining quota and grows above the high mark
+LOW_QUOTA_FRACTION = 0.1
+HIGH_QUOTA_FRACTION = 0.5
+
+MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', 5))
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 30
+
+# Throttled requests are never processed, so any method can be retried; server errors only when idempotent
+RETRY_ANY_METHOD = {429}
+RETRY_IDEMPOTENT = {500, 502, 503, 504}
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'DELETE'}
+
+# Endpoint classes share a bucket; OpenAI limits assistants, files and vector stores separately
+ENDPOINT_CLASSES = [
+    ('vector_stores', re.compile(r'^/v1/vector_stores')),
+    ('files', re.compile(r'^/v1/files')),
+    ('assistants', re.compile(r'^/v1/(assistants|threads)')),
+]
+
+DURATION_PART = re.compile(r'([\d.]+)(ms|s|m|h)')
+DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+def parse_reset(value):
+    """Parse OpenAI reset durations such as '1s', '6m0s' or '20ms' into seconds."""
+    if not value:
+        return None
+    parts = DURATION_PART.findall(value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(amount) * DURATION_UNITS[unit] for amount, unit in parts)
+
+def endpoint_class(path):
+    for name, pattern in ENDPOINT_CLASSES:
+        if pattern.match(path):
+            return name
+    return 'other'
+
+class TokenBucket:
+    """Blocks callers so requests leave at no more than `rate` per second on average."""
+
+    def __init__(self, rate):
+        self._lock = threading.Lock()
+        self.rate = rate
+        self.capacity = max(1.0, rate)
+        self.tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._paused_until = 0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self._paused_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def update(self, limit, remaining, reset_seconds):
+        """Follow the quota OpenAI reports: limit per minute, requests left and time until reset."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if limit:
+                self.rate = limit / 60.0
+                self.capacity = max(1.0, self.rate)
+            if remaining is not None:
+                self.tokens = min(self.tokens, remaining)
+                if remaining <= 0 and reset_seconds:
+                    self._paused_until = max(self._paused_until, now + reset_seconds)
+
+    def pause(self, seconds):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+class AdaptiveLimiter:
+    """Concurrency limit that halves when throttled and creeps back up while quota is plentiful."""
+
+    def __init__(self, initial=INITIAL_CONCURRENCY, maximum=MAX_CONCURRENCY):
+        self._condition = threading.Condition()
+        self.maximum = maximum
+        self.limit = max(1, min(initial, maximum))
+        self.active = 0
+
+    def acquire(self):
+        with self._condition:
+            while self.active >= self.limit:
+                self._condition.wait()
+            self.active += 1
+
+    def release(self):
+        with self._condition:
+            self.active -= 1
+            self._condition.notify()
+
+    def adjust(self, remaining_fraction=None, throttled=False):
+        with self._condition:
+            previous = self.limit
+            if throttled:
+                self.limit = max(1, self.limit // 2)
+            elif remaining_fraction is not None and remaining_fraction < LOW_QUOTA_FRACTION:
+                self.limit = max(1, self.limit - 1)
+            elif remaining_fraction is None or remaining_fraction > HIGH_QUOTA_FRACTION:
+                self.limit = min(self.maximum, self.limit + 1)
+            if self.limit > previous:
+                self._condition.notify_all()
+        if self.limit != previous:
+            logger.debug("OpenAI concurrency limit %s -> %s", previous, self.limit)
+
+class EndpointState:
+    def __init__(self):
+        self.bucket = TokenBucket(DEFAULT_REQUESTS_PER_MINUTE / 60.0)
+        self.limiter = AdaptiveLimiter()
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """httpx transport that paces, limits and retries OpenAI requests.
+
+    Every request waits for a token from its endpoint class's bucket and a
+    slot under that class's concurrency limit. The x-ratelimit headers of
+    each response retune the bucket and the limit. Throttled and transient
+    failures are retried with jittered exponential backoff, never sooner
+    than OpenAI's retry-after or reset time.
+    """
+
+    def __init__(self, transport=None, max_retries=MAX_RETRIES):
+        self.transport = transport or httpx.HTTPTransport(limits=DEFAULT_CONNECTION_LIMITS)
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self._states = {}
+
+    def state(self, name):
+        with self._lock:
+            if name not in self._states:
+                self._states[name] = EndpointState()
+            return self._states[name]
+
+    def _should_retry(self, request, status_code, attempt):
+        if attempt >= self.max_retries:
+            return False
+        return status_code in RETRY_ANY_METHOD or (status_code in RETRY_IDEMPOTENT and request.method in IDEMPOTENT_METHODS)
+
+    @staticmethod
+    def _backoff(attempt, response=None):
+        """Full-jitter exponential backoff, stretched to whatever wait the server asked for."""
+        delay = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+        server_delay = None
+        if response is not None:
+            headers = response.headers
+            if 'retry-after-ms' in headers:
+                server_delay = parse_reset(f"{headers['retry-after-ms']}ms")
+            elif 'retry-after' in headers:
+                server_delay = parse_reset(headers['retry-after'])
+            elif response.status_code == 429:
+                server_delay = parse_reset(headers.get('x-ratelimit-reset-requests'))
+        return max(delay, min(server_delay or 0, BACKOFF_MAX_SECONDS * 4))
+
+    def _observe(self, state, response):
+        headers = response.headers
+        try:
+            limit = float(headers['x-ratelimit-limit-requests']) if 'x-ratelimit-limit-requests' in headers else None
+            remaining = float(headers['x-ratelimit-remaining-requests']) if 'x-ratelimit-remaining-requests' in headers else None
+        except ValueError:
+            limit = remaining = None
+        reset_seconds = parse_reset(headers.get('x-ratelimit-reset-requests'))
+        state.bucket.update(limit, remaining, reset_seconds)
+        throttled = response.status_code == 429
+        fraction = remaining / limit if limit and remaining is not None else None
+        state.limiter.adjust(fraction, throttled)
+
+    def handle_request(self, request):
+        state = self.state(endpoint_class(request.url.path))
+        # Buffer the body so a retry can send it again
+        request.read()
+        attempt = 0
+        while True:
+            state.bucket.acquire()
+            state.limiter.acquire()
+            try:
+                try:
+                    response = self.transport.handle_request(request)
+                except httpx.TransportError as e:
+                    if attempt >= self.max_retries or request.method not in IDEMPOTENT_METHODS:
+                        raise
+                    logger.warning(f"OpenAI {request.method} {request.url.path} failed ({str(e)}); retrying")
+                    response = None
+                if response is not None:
+                    self._observe(state, response)
+            finally:
+                state.limiter.release()
+
+            if response is not None and not self._should_retry(request, response.status_code, attempt):
+                return response
+            delay = self._backoff(attempt, response)
+            if response is not None:
+                logger.warning(f"OpenAI {request.method} {request.url.path} returned {response.status_code}; retrying in {delay:.1f}s")
+                if response.status_code == 429:
+                    state.bucket.pause(delay)
+                response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def close(self):
+        self.transport.close()
+
+# Shared by every client in the process so all callers draw on the same quota
+_transport = None
+_transport_lock = threading.Lock()
+
+def shared_transport():
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = RateLimitedTransport()
+        return _transport
+
+def create_client(api_key=None, **kwargs):
+    """Build an OpenAI client whose requests go through the process-wide rate-limited transport.
+
+    Retries happen in the transport, so the SDK's own retry loop is turned off.
+    """
+    return OpenAI(
+        api_key=api_key,
+        http_client=DefaultHttpxClient(transport=shared_transport()),
+        max_retries=0,
+        **kwargs
+    )
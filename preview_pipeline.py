@@ -0,0 +1,462 @@
+import os
+import re
+import sys
+import json
+import time
+import signal
+import zipfile
+import logging
+import tempfile
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines
+    fcntl = None
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+try:
+    import docx
+except ImportError:
+    docx = None
+
+from text_extraction import PLAIN_TEXT_EXTENSIONS, MAX_TEXT_CHARS
+
+logger = logging.getLogger(__name__)
+
+# Bump when extraction changes so existing previews are regenerated
+PREVIEW_FORMAT = 1
+
+# Parsing runs in this many worker processes, away from the request threads and their GIL
+PREVIEW_WORKERS = int(os.getenv('PREVIEW_WORKERS', 2))
+
+# Characters of first-page text kept for display
+PREVIEW_CHARS = int(os.getenv('PREVIEW_CHARS', 600))
+
+# A parse taking longer than this is abandoned with an error preview and its process killed
+PREVIEW_TIMEOUT_SECONDS = int(os.getenv('PREVIEW_TIMEOUT_SECONDS', 120))
+
+# A worker claims a file for this long, so other workers do not parse it at the same time
+PREVIEW_LEASE_SECONDS = 300
+
+# Finished previews are saved in batches of this size during a large backfill
+PREVIEW_SAVE_BATCH = 50
+
+DOCX_PAGES = re.compile(r'<Pages>(\d+)</Pages>')
+
+def _clip(text):
+    return ' '.join(text.split())[:PREVIEW_CHARS]
+
+def _pdf_preview(path):
+    if not PdfReader:
+        return '', None, None, ''
+    reader = PdfReader(path)
+    first_page = ''
+    words = 0
+    parts = []
+    size = 0
+    for number, page in enumerate(reader.pages):
+        text = page.extract_text() or ''
+        if number == 0:
+            first_page = text
+        words += len(text.split())
+        if size < MAX_TEXT_CHARS:
+            parts.append(text)
+            size += len(text)
+    return first_page, len(reader.pages), words, '\n'.join(parts)
+
+def _docx_pages(path):
+    """Page count Word saved in the document properties; DOCX has no pages of its own."""
+    try:
+        with zipfile.ZipFile(path) as archive:
+            match = DOCX_PAGES.search(archive.read('docProps/app.xml').decode('utf-8', errors='replace'))
+        return int(match.group(1)) if match else None
+    except KeyError:
+        return None
+
+def _docx_preview(path):
+    if not docx:
+        return '', None, None, ''
+    text = '\n'.join(paragraph.text for paragraph in docx.Document(path).paragraphs)
+    return text, _docx_pages(path), len(text.split()), text
+
+def extract_preview(path, filename, with_text=False):
+    """Parse a document on disk into its first-page text, page count and word count.
+
+    Runs in a worker process. Counts are None when the format does not
+    have them (pages of a text file) or cannot be parsed here. with_text
+    adds the document's text, as text_extraction would give it, under 'text'.
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    try:
+        if ext == '.pdf':
+            first_page, pages, words, text = _pdf_preview(path)
+        elif ext == '.docx':
+            first_page, pages, words, text = _docx_preview(path)
+        elif ext in PLAIN_TEXT_EXTENSIONS:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                text = f.read()
+            first_page, pages, words = text, None, len(text.split())
+        else:
+            first_page, pages, words, text = '', None, None, ''
+        preview = {'first_page': _clip(first_page), 'pages': pages, 'words': words}
+    except Exception as e:
+        preview, text = {'first_page': '', 'pages': None, 'words': None, 'error': str(e)}, ''
+    if with_text:
+        preview['text'] = text[:MAX_TEXT_CHARS]
+    return preview
+
+def _report_pid(queue):
+    """Pool initializer: tell the pipeline which process this is, so a stuck one can be killed."""
+    queue.put(os.getpid())
+
+def preview_signature(file):
+    """Identifies the version of a file a preview was made from."""
+    return [PREVIEW_FORMAT, file['filename'], file.get('bytes'), file.get('created_at')]
+
+class PreviewStore:
+    """Previews by file ID in a JSON file shared by all worker processes."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._loaded_mtime = None
+        self._previews = {}
+
+    def _reload_if_changed(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._loaded_mtime:
+            return
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            self._previews = data['previews'] if data.get('format') == PREVIEW_FORMAT else {}
+            self._loaded_mtime = mtime
+        except Exception as e:
+            logger.error(f"Error loading previews: {str(e)}")
+
+    def _save(self):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'format': PREVIEW_FORMAT, 'previews': self._previews}, f, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+        self._loaded_mtime = os.stat(self.path).st_mtime_ns
+
+    def _update(self, apply):
+        """Apply a change on top of the latest saved previews and save them, holding a cross-process lock."""
+        with self._lock, open(f"{self.path}.lock", 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._reload_if_changed()
+                if apply():
+                    self._save()
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def get_many(self, file_ids):
+        """Return {file_id: preview} for the files among file_ids that have one."""
+        with self._lock:
+            self._reload_if_changed()
+            return {file_id: self._previews[file_id] for file_id in file_ids if file_id in self._previews}
+
+    def get(self, file_id):
+        return self.get_many([file_id]).get(file_id)
+
+    def outdated(self, files):
+        """Return the files whose preview is missing or was made from a different version."""
+        with self._lock:
+            self._reload_if_changed()
+            return [f for f in files if self._previews.get(f['id'], {}).get('signature') != preview_signature(f)]
+
+    def put(self, previews):
+        """Save {file_id: preview} in one write."""
+        if previews:
+            self._update(lambda: self._previews.update(previews) or True)
+
+    def remove(self, file_id):
+        self._update(lambda: self._previews.pop(file_id, None) is not None)
+
+    def revision(self):
+        """Changes whenever previews are saved; used in response ETags."""
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+class PreviewPipeline:
+    """Generates previews of new and changed files in the background.
+
+    A coordinator thread downloads each queued file and hands it to a
+    process pool for parsing, so requests only ever read finished previews
+    from the store. With a shared lease store each file is parsed by
+    whichever worker claims it first. on_text, if given, is called with
+    (file_id, filename, text) tuples for the parsed files, for indexing.
+    """
+
+    def __init__(self, store, fetch, workers=PREVIEW_WORKERS, leases=None, on_text=None):
+        self.store = store
+        # fetch(file) returns (path, is_temporary) for the file's content on local disk, or None
+        self.fetch = fetch
+        self.workers = workers
+        self.leases = leases
+        self.on_text = on_text
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._local_paths = {}
+        self._thread = None
+        self._executor = None
+        self._pid_queue = None
+        self._pids = set()
+
+    def schedule(self, files):
+        """Queue the files whose preview is missing or outdated; cheap enough to call from a request."""
+        outdated = self.store.outdated(files)
+        if not outdated:
+            return 0
+        with self._lock:
+            for file in outdated:
+                self._pending[file['id']] = file
+            if not (self._thread and self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._run, name='preview-pipeline', daemon=True)
+                self._thread.start()
+        return len(outdated)
+
+    def schedule_local(self, file, path):
+        """Queue a file whose content is already on local disk, such as a fresh upload.
+
+        The pipeline owns path from here on and removes it once it is parsed
+        or turns out not to be needed.
+        """
+        with self._lock:
+            self._local_paths[file['id']] = path
+        if not self.schedule([file]):
+            self._remove_path(self._take_local(file['id']))
+
+    def _take_local(self, file_id):
+        with self._lock:
+            return self._local_paths.pop(file_id, None)
+
+    @staticmethod
+    def _remove_path(path):
+        if path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def on_catalog_change(self, event, file):
+        """Catalog listener that previews new files and forgets deleted ones."""
+        if event == 'added':
+            self.schedule([file])
+        elif event == 'removed':
+            self.store.remove(file['id'])
+
+    def _pool(self):
+        if self._executor is None:
+            # Spawned rather than forked: forking a threaded server process can copy held locks
+            context = multiprocessing.get_context('spawn')
+            # Each pool gets its own queue: a worker killed while writing could leave a shared one locked
+            self._pid_queue = context.SimpleQueue()
+            self._executor = ProcessPoolExecutor(
+                self.workers, mp_context=context, initializer=_report_pid, initargs=(self._pid_queue,)
+            )
+        return self._executor
+
+    def _submit(self, file, path):
+        return self._pool().submit(extract_preview, path, file['filename'], self.on_text is not None) if path else None
+
+    def _worker_pids(self):
+        """PIDs of the processes the current pool has started, as they reported them."""
+        while self._pid_queue is not None and not self._pid_queue.empty():
+            self._pids.add(self._pid_queue.get())
+        return self._pids
+
+    def _recycle_pool(self, in_flight):
+        """Kill the worker processes, one of which is stuck, and resubmit the other parses to a new pool."""
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            # A busy worker cannot be stopped through the executor; it is unusable afterwards anyway
+            for pid in self._worker_pids():
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except OSError:
+                    pass
+            executor.shutdown(wait=False, cancel_futures=True)
+            self._pids = set()
+            self._pid_queue = None
+        for index, (file, path, temporary, future) in enumerate(in_flight):
+            in_flight[index] = (file, path, temporary, self._submit(file, path))
+
+    def _claim(self, file_id):
+        if not self.leases:
+            return True
+        try:
+            return self.leases.acquire_lease(f"preview:{file_id}", ttl=PREVIEW_LEASE_SECONDS)
+        except Exception as e:
+            logger.error(f"Error claiming preview of {file_id}: {str(e)}")
+            return True
+
+    def _release(self, file_id):
+        if self.leases:
+            try:
+                self.leases.release_lease(f"preview:{file_id}")
+            except Exception as e:
+                logger.error(f"Error releasing preview of {file_id}: {str(e)}")
+
+    def _next_batch(self):
+        # Decide to exit under the lock so a concurrent schedule() either is seen here or starts a new thread
+        with self._lock:
+            batch = list(self._pending.values())
+            self._pending.clear()
+            if not batch:
+                self._thread = None
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            try:
+                self.process(batch)
+            except Exception as e:
+                logger.error(f"Error generating previews: {str(e)}")
+
+    def _result(self, job, in_flight):
+        """Wait for one parse, replacing the pool if it hangs or its process dies.
+        
+        A parse that does not finish within PREVIEW_TIMEOUT_SECONDS gets an
+        error preview, so it is not retried until the file changes. A dead
+        process breaks the whole pool without saying which parse killed it,
+        so this one is tried once more before it is given up on.
+        """
+        file, path, temporary, future = job
+        if future is None:
+            return {'first_page': '', 'pages': None, 'words': None}
+        for attempt in range(2):
+            try:
+                return future.result(PREVIEW_TIMEOUT_SECONDS)
+            except FutureTimeout:
+                self._recycle_pool(in_flight)
+                return {'first_page': '', 'pages': None, 'words': None,
+                        'error': f"Timed out after {PREVIEW_TIMEOUT_SECONDS}s"}
+            except BrokenProcessPool:
+                self._recycle_pool(in_flight)
+                future = self._submit(file, path)
+        return {'first_page': '', 'pages': None, 'words': None, 'error': "Parser process died"}
+
+    def _finish(self, job, previews, documents, in_flight):
+        """Wait for one parse, record its preview and text and clean up after it."""
+        file, path, temporary, future = job
+        try:
+            preview = self._result(job, in_flight)
+            if preview.get('error'):
+                logger.warning(f"Could not preview {file['filename']}: {preview['error']}")
+            if self.on_text:
+                documents.append((file['id'], file['filename'], preview.pop('text', '')))
+            preview['signature'] = preview_signature(file)
+            preview['generated_at'] = time.time()
+            previews[file['id']] = preview
+        finally:
+            self._discard(job)
+
+    def _discard(self, job):
+        file, path, temporary, future = job
+        if temporary:
+            self._remove_path(path)
+        self._release(file['id'])
+
+    def _save(self, previews, documents):
+        self.store.put(previews)
+        if documents:
+            try:
+                self.on_text(documents)
+            except Exception as e:
+                logger.error(f"Error indexing parsed text: {str(e)}")
+
+    def process(self, files):
+        """Download and parse the given files, saving their previews; returns how many were saved.
+
+        Only a few downloads run ahead of the parsers, so a large backfill
+        neither fills the disk nor has its files evicted from the cache
+        before they are parsed.
+        """
+        previews = {}
+        documents = []
+        saved = 0
+        in_flight = deque()
+        with self._lock:
+            local_paths = {f['id']: self._local_paths.pop(f['id']) for f in files if f['id'] in self._local_paths}
+        try:
+            for file in self.store.outdated(files):
+                local_path = local_paths.pop(file['id'], None)
+                if not self._claim(file['id']):
+                    self._remove_path(local_path)
+                    continue
+                try:
+                    path, temporary = (local_path, True) if local_path else (self.fetch(file) or (None, False))
+                except Exception as e:
+                    logger.warning(f"Could not download {file['filename']} for its preview: {str(e)}")
+                    self._release(file['id'])
+                    continue
+                in_flight.append((file, path, temporary, self._submit(file, path)))
+                if len(in_flight) >= 2 * self.workers:
+                    self._finish(in_flight.popleft(), previews, documents, in_flight)
+                if len(previews) >= PREVIEW_SAVE_BATCH:
+                    self._save(previews, documents)
+                    saved += len(previews)
+                    previews, documents = {}, []
+            while in_flight:
+                self._finish(in_flight.popleft(), previews, documents, in_flight)
+            self._save(previews, documents)
+            saved += len(previews)
+            if saved:
+                logger.info(f"Generated previews for {saved} files")
+            return saved
+        finally:
+            while in_flight:
+                self._discard(in_flight.popleft())
+            # Local copies of files that were already previewed elsewhere
+            for path in local_paths.values():
+                self._remove_path(path)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+def download_to_temp(chunks):
+    """Write downloaded chunks to a temporary file and return its path."""
+    fd, path = tempfile.mkstemp(prefix='preview-')
+    with os.fdopen(fd, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+    return path
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+    from assistant_analyzer import AssistantAnalyzer
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    store = PreviewStore(sys.argv[1] if len(sys.argv) > 1 else os.getenv('PREVIEW_FILE', 'previews.json'))
+    analyzer = AssistantAnalyzer(
+        api_key=os.getenv('OPENAI_API_KEY'),
+        assistant_id=os.getenv('OPENAI_ASSISTANT_ID'),
+        vector_store_id=os.getenv('OPENAI_VECTOR_STORE_ID')
+    )
+    pipeline = PreviewPipeline(store, lambda file: (download_to_temp(analyzer.stream_file_content(file['id'])), True))
+    print(f"Generated {pipeline.process(analyzer.get_file_list())} previews")
+    pipeline.close()
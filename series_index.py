@@ -0,0 +1,182 @@
+import os
+import re
+import itertools
+import threading
+from gap_engine import GapEngine
+
+MONTH_NAMES = (
+    r'jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|jun(?:e)?|jul(?:y)?|aug(?:ust)?|'
+    r'sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?'
+)
+
+# Pieces of a filename that vary between members of the same series
+SERIES_NOISE_PATTERNS = [
+    re.compile(r'\b\d{4}[-_. /]\d{1,2}[-_. /]\d{1,2}\b'),          # 2024-01-15
+    re.compile(r'\b\d{1,2}[-_. /]\d{1,2}[-_. /]\d{2,4}\b'),         # 01-15-2024
+    re.compile(r'\b\d{4}[-_. /]?\d{2}\b'),                          # 2024-01, 202401
+    re.compile(r'\b\d{1,2}[-_. /]\d{4}\b'),                         # 01-2024
+    re.compile(rf'\b(?:{MONTH_NAMES})\b'),                          # January, jan
+    re.compile(r'\bq[1-4]\b'),                                      # Q1
+    re.compile(r'\b(?:19|20)\d{2}\b'),                              # 2024
+    re.compile(r'\b(?:v|ver|version|rev|revision)[-_. ]?\d+(?:\.\d+)*\b'),  # v2, rev 3, version 1.1
+    re.compile(r'\b(?:final|draft|copy|updated|revised|signed)\b'),
+]
+# "(1)" added to repeated downloads; stripped before parentheses become separators
+DOWNLOAD_COPY_SUFFIX = re.compile(r'\(\d+\)')
+SEPARATORS = re.compile(r'[\s\-_.,()\[\]]+')
+
+def series_key(filename):
+    """Normalize a filename to the recurring series it belongs to.
+
+    Dates, version suffixes and separators are removed, so
+    'Budget_Report-2024-01_v2.pdf' and 'budget report Feb 2024.pdf' share the
+    key 'budget report'.
+    """
+    name = os.path.splitext(filename)[0].lower()
+    name = DOWNLOAD_COPY_SUFFIX.sub(' ', name)
+    name = SEPARATORS.sub(' ', name)
+    for pattern in SERIES_NOISE_PATTERNS:
+        name = pattern.sub(' ', name)
+    return ' '.join(name.split())
+
+class SeriesIndex:
+    """Hash-map index from files to series, maintained incrementally.
+
+    month_of(filename) returns a month index (see gap_engine.month_index) or
+    None. Per-series date ranges and latest members are kept up to date on
+    add/remove, so lookups never scan the catalog.
+    """
+
+    def __init__(self, month_of, gap_engine=None):
+        self.month_of = month_of
+        self.gap_engine = gap_engine or GapEngine()
+        self._lock = threading.RLock()
+        self._built = False
+        self._file_series = {}
+        self._files = {}
+        self._members = {}
+        self._ranges = {}
+        self._latest = {}
+        # Changes to a series give it a new revision, so its cached gaps are found without collecting months
+        self._revisions = {}
+        self._changes = itertools.count(1)
+
+    @property
+    def built(self):
+        return self._built
+
+    def build(self, files):
+        """Replace the index contents with the given catalog."""
+        with self._lock:
+            self._file_series.clear()
+            self._files.clear()
+            self._members.clear()
+            self._ranges.clear()
+            self._latest.clear()
+            self._revisions.clear()
+            for file in files:
+                self._add(file)
+            self._built = True
+
+    def add(self, file):
+        """Index a newly uploaded file."""
+        with self._lock:
+            if file['id'] in self._file_series:
+                self._remove(file['id'])
+            self._add(file)
+
+    def remove(self, file_id):
+        """Drop a deleted file from the index."""
+        with self._lock:
+            self._remove(file_id)
+
+    def _sort_key(self, file_id, month):
+        return (month if month is not None else -1, self._files[file_id].get('created_at') or 0)
+
+    def _add(self, file):
+        key = series_key(file['filename'])
+        month = self.month_of(file['filename'])
+        file_id = file['id']
+        self._file_series[file_id] = key
+        self._files[file_id] = file
+        self._members.setdefault(key, {})[file_id] = month
+        self._revisions[key] = next(self._changes)
+
+        if month is not None:
+            first, last = self._ranges.get(key, (month, month))
+            self._ranges[key] = (min(first, month), max(last, month))
+        latest = self._latest.get(key)
+        if latest is None or self._sort_key(file_id, month) > self._sort_key(latest, self._members[key][latest]):
+            self._latest[key] = file_id
+        self.gap_engine.invalidate(('series', key))
+
+    def _remove(self, file_id):
+        key = self._file_series.pop(file_id, None)
+        if key is None:
+            return
+        members = self._members[key]
+        month = members.pop(file_id)
+        self._files.pop(file_id, None)
+        self._revisions[key] = next(self._changes)
+        self.gap_engine.invalidate(('series', key))
+
+        if not members:
+            del self._members[key]
+            self._revisions.pop(key, None)
+            self._ranges.pop(key, None)
+            self._latest.pop(key, None)
+            return
+
+        # Only this series needs its range or latest member recomputed
+        if month is not None and month in self._ranges.get(key, ()):
+            months = [m for m in members.values() if m is not None]
+            if months:
+                self._ranges[key] = (min(months), max(months))
+            else:
+                self._ranges.pop(key, None)
+        if self._latest.get(key) == file_id:
+            self._latest[key] = max(members, key=lambda member: self._sort_key(member, members[member]))
+
+    def series_of(self, file_id):
+        """Series key of a file, or None if it is not indexed."""
+        return self._file_series.get(file_id)
+
+    def members(self, key):
+        """Files belonging to a series."""
+        with self._lock:
+            return [self._files[file_id] for file_id in self._members.get(key, {})]
+
+    def date_range(self, key):
+        """(first, last) month index of a series' dated members, or None."""
+        return self._ranges.get(key)
+
+    def latest(self, key):
+        """Most recent member of a series, by report month and then upload time."""
+        file_id = self._latest.get(key)
+        return self._files.get(file_id) if file_id else None
+
+    def series(self, min_members=2):
+        """Keys of series with at least min_members files."""
+        with self._lock:
+            return [key for key, members in self._members.items() if len(members) >= min_members]
+
+    def gaps(self, key):
+        """Missing months between the first and last dated members of a series."""
+        with self._lock:
+            revision = self._revisions.get(key)
+            cached = self.gap_engine.cached_months(('series', key), revision)
+            if cached is not None:
+                return cached
+            months = [m for m in self._members.get(key, {}).values() if m is not None]
+        if len(months) < 2:
+            return []
+        return self.gap_engine.missing_months(('series', key), months, revision=revision)
+
+    def on_catalog_change(self, event, file):
+        """Catalog listener that keeps the index in step with AssistantAnalyzer syncs."""
+        if not self._built:
+            return
+        if event == 'added':
+            self.add(file)
+        elif event == 'removed':
+            self.remove(file['id'])
@@ -121,7 +121,7 @@ class ServerVerifier:
         
         # Step 3: Start the server
         try:
-            subprocess.Popen([sys.executable, 'app.py'])
+            subprocess.Popen([sys.executable, 'dev_server.py'])
             time.sleep(3)  # Wait for server to start
         except Exception as e:
             logger.error(f"Failed to start server: {str(e)}")
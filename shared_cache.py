@@ -0,0 +1,205 @@
+import os
+import time
+import socket
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# A refresher that dies mid-listing loses its lease after this long; live ones renew it per page
+REFRESH_LEASE_SECONDS = int(os.getenv('CATALOG_REFRESH_LEASE_SECONDS', 120))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    purpose TEXT,
+    created_at INTEGER,
+    bytes INTEGER
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value
+);
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ingestion (
+    file_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    error TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ingestion_status ON ingestion (status);
+"""
+
+class SharedCatalog:
+    """File catalog shared by every worker process on a host through SQLite.
+
+    One worker at a time holds the refresh lease and talks to OpenAI; it
+    publishes what it finds here and bumps the version. Other workers compare
+    the version with the one they last read and reload only when it moved.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.holder = f"{socket.gethostname()}:{os.getpid()}"
+        self._local = threading.local()
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self):
+        """Return this thread's connection, reopening it after a fork."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+            self.holder = f"{socket.gethostname()}:{os.getpid()}"
+        return conn
+
+    def version(self):
+        """Return the catalog version, 0 if nothing has been published yet."""
+        row = self._connect().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return row[0] if row else 0
+
+    def read(self):
+        """Return the published catalog with its version and sync state, or None if empty."""
+        conn = self._connect()
+        conn.execute('BEGIN')
+        try:
+            meta = dict(conn.execute('SELECT key, value FROM meta').fetchall())
+            if not meta.get('version'):
+                return None
+            files = [{
+                'filename': filename,
+                'purpose': purpose,
+                'created_at': created_at,
+                'bytes': size,
+                'id': file_id
+            } for file_id, filename, purpose, created_at, size in conn.execute(
+                'SELECT id, filename, purpose, created_at, bytes FROM files ORDER BY created_at DESC, id DESC'
+            )]
+        finally:
+            conn.execute('COMMIT')
+
+        watermark = None
+        if meta.get('watermark_id'):
+            watermark = (meta['watermark_created_at'], meta['watermark_id'])
+        return {
+            'version': meta['version'],
+            'files': files,
+            'watermark': watermark,
+            'last_sync_at': meta.get('last_sync_at') or 0,
+            'last_full_sync_at': meta.get('last_full_sync_at') or 0
+        }
+
+    def publish(self, added, removed_ids, watermark, last_sync_at, last_full_sync_at, replace=None):
+        """Apply catalog changes in one transaction and return the new version.
+
+        replace, when given, is the complete file list from a full sweep and
+        overwrites whatever was stored.
+        """
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if replace is not None:
+                conn.execute('DELETE FROM files')
+                added = replace
+            conn.executemany('DELETE FROM files WHERE id = ?', [(file_id,) for file_id in removed_ids])
+            conn.executemany(
+                'INSERT OR REPLACE INTO files (id, filename, purpose, created_at, bytes) VALUES (?, ?, ?, ?, ?)',
+                [(f['id'], f['filename'], f.get('purpose'), f.get('created_at'), f.get('bytes')) for f in added]
+            )
+            version = (conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone() or (0,))[0] + 1
+            conn.executemany('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', [
+                ('version', version),
+                ('watermark_created_at', watermark[0] if watermark else None),
+                ('watermark_id', watermark[1] if watermark else None),
+                ('last_sync_at', last_sync_at),
+                ('last_full_sync_at', last_full_sync_at),
+                ('published_by', self.holder)
+            ])
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return version
+
+    def acquire_lease(self, name, ttl=REFRESH_LEASE_SECONDS):
+        """Try to become the holder of a named lease; True if this process now holds it."""
+        conn = self._connect()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT holder, expires_at FROM leases WHERE name = ?', (name,)).fetchone()
+            if row and row[0] != self.holder and row[1] > now:
+                conn.execute('COMMIT')
+                return False
+            conn.execute(
+                'INSERT OR REPLACE INTO leases (name, holder, expires_at) VALUES (?, ?, ?)',
+                (name, self.holder, now + ttl)
+            )
+            conn.execute('COMMIT')
+            return True
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def release_lease(self, name):
+        """Give up a lease held by this process."""
+        self._connect().execute('DELETE FROM leases WHERE name = ? AND holder = ?', (name, self.holder))
+
+    def set_ingestion_status(self, updates):
+        """Record vector store indexing status as {file_id: (status, error)} and bump the ingestion revision."""
+        if not updates:
+            return
+        conn = self._connect()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(
+                'INSERT OR REPLACE INTO ingestion (file_id, status, error, updated_at) VALUES (?, ?, ?, ?)',
+                [(file_id, status, error, now) for file_id, (status, error) in updates.items()]
+            )
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('ingestion_revision', 1) "
+                "ON CONFLICT (key) DO UPDATE SET value = value + 1"
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def ingestion_statuses(self, file_ids):
+        """Return {file_id: (status, error, updated_at)} for the tracked files among file_ids."""
+        file_ids = list(file_ids)
+        statuses = {}
+        conn = self._connect()
+        # Stay well under SQLite's limit on bound parameters
+        for start in range(0, len(file_ids), 500):
+            chunk = file_ids[start:start + 500]
+            rows = conn.execute(
+                f"SELECT file_id, status, error, updated_at FROM ingestion WHERE file_id IN ({','.join('?' * len(chunk))})",
+                chunk
+            )
+            statuses.update({file_id: (status, error, updated_at) for file_id, status, error, updated_at in rows})
+        return statuses
+
+    def pending_ingestion(self):
+        """Return {file_id: tracked_at} for files whose indexing has not finished."""
+        rows = self._connect().execute("SELECT file_id, updated_at FROM ingestion WHERE status = 'in_progress'")
+        return dict(rows.fetchall())
+
+    def ingestion_counts(self):
+        """Return the number of tracked files per status."""
+        return dict(self._connect().execute('SELECT status, COUNT(*) FROM ingestion GROUP BY status').fetchall())
+
+    def ingestion_revision(self):
+        """Counter that moves whenever any ingestion status changes."""
+        row = self._connect().execute("SELECT value FROM meta WHERE key = 'ingestion_revision'").fetchone()
+        return row[0] if row else 0
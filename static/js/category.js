@@ -0,0 +1,38 @@
+function uploadFile() {
+    const formData = new FormData(document.getElementById('uploadForm'));
+    
+    fetch('/upload', {
+        method: 'POST',
+        body: formData
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            location.reload();
+        } else {
+            alert('Error uploading file: ' + data.error);
+        }
+    })
+    .catch(error => {
+        alert('Error uploading file: ' + error);
+    });
+}
+
+function deleteFile(fileId, filename) {
+    if (confirm(`Are you sure you want to delete ${filename}?`)) {
+        fetch(`/delete/${fileId}`, {
+            method: 'POST'
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                location.reload();
+            } else {
+                alert('Error deleting file: ' + data.error);
+            }
+        })
+        .catch(error => {
+            alert('Error deleting file: ' + error);
+        });
+    }
+}
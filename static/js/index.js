@@ -0,0 +1,431 @@
+let draggedFileId = null;
+let draggedFileName = null;
+let currentDragTarget = null;
+
+// Virtualized file list: only the rows in view are in the DOM, and pages are
+// fetched from the server as the user scrolls towards the end of what is loaded.
+const ROW_HEIGHT = 72;
+const OVERSCAN_ROWS = 5;
+const INGESTION_POLL_MS = 5000;
+const INGESTION_LABELS = {
+    in_progress: ['Indexing…', 'bg-warning text-dark'],
+    failed: ['Indexing failed', 'bg-danger'],
+    cancelled: ['Indexing cancelled', 'bg-secondary']
+};
+let ingestionTimer = null;
+const fileList = {
+    viewport: null,
+    spacer: null,
+    category: null,
+    files: [],
+    total: 0,
+    nextCursor: null,
+    loading: false,
+    done: false
+};
+
+function selectCategory(category) {
+    window.location.href = `/category/${encodeURIComponent(category)}`;
+}
+
+function initFileList() {
+    const viewport = document.getElementById('fileList');
+    if (!viewport) return;
+
+    fileList.viewport = viewport;
+    fileList.spacer = viewport.querySelector('.file-list-spacer');
+    fileList.category = viewport.dataset.category;
+    fileList.total = parseInt(viewport.dataset.total, 10) || 0;
+    fileList.spacer.style.height = `${fileList.total * ROW_HEIGHT}px`;
+
+    viewport.addEventListener('scroll', () => window.requestAnimationFrame(renderVisibleRows));
+    viewport.addEventListener('dragstart', handleDragStart);
+    viewport.addEventListener('click', event => {
+        const button = event.target.closest('.delete-file');
+        if (!button) return;
+        const fileItem = button.closest('.file-item');
+        deleteFile(fileItem.dataset.fileId, fileItem.dataset.fileName);
+    });
+
+    loadNextPage();
+}
+
+function loadNextPage() {
+    if (fileList.loading || fileList.done) return;
+    fileList.loading = true;
+
+    const params = new URLSearchParams();
+    if (fileList.nextCursor) params.set('cursor', fileList.nextCursor);
+
+    fetch(`/api/category/${encodeURIComponent(fileList.category)}/files?${params}`)
+    .then(response => {
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        return response.json();
+    })
+    .then(data => {
+        if (!data.success) {
+            throw new Error(data.error || 'Failed to load files');
+        }
+        if (data.gaps && data.gaps.length > 0) {
+            document.getElementById('gapsList').textContent = data.gaps.join(', ');
+            document.getElementById('gapsAlert').style.display = '';
+        }
+        fileList.files.push(...data.files);
+        fileList.total = data.total;
+        fileList.nextCursor = data.next_cursor;
+        fileList.done = !data.next_cursor;
+        fileList.spacer.style.height = `${fileList.total * ROW_HEIGHT}px`;
+        if (fileList.total === 0) {
+            fileList.viewport.style.display = 'none';
+            document.getElementById('fileListEmpty').style.display = '';
+        }
+        renderVisibleRows();
+        scheduleIngestionPoll();
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        showToast(`Error loading files: ${error.message}`, 'error');
+    })
+    .finally(() => {
+        fileList.loading = false;
+    });
+}
+
+function renderVisibleRows() {
+    const viewport = fileList.viewport;
+    const first = Math.max(0, Math.floor(viewport.scrollTop / ROW_HEIGHT) - OVERSCAN_ROWS);
+    const visibleCount = Math.ceil(viewport.clientHeight / ROW_HEIGHT) + 2 * OVERSCAN_ROWS;
+    const last = Math.min(fileList.files.length, first + visibleCount);
+
+    // Fetch the next page before the user reaches the end of the loaded rows
+    if (last + OVERSCAN_ROWS >= fileList.files.length) {
+        loadNextPage();
+    }
+
+    viewport.querySelectorAll('.file-item').forEach(row => row.remove());
+    for (let i = first; i < last; i++) {
+        viewport.appendChild(createFileRow(fileList.files[i], i));
+    }
+}
+
+// Re-check files that are still being indexed until none are left
+function scheduleIngestionPoll() {
+    if (ingestionTimer) return;
+    const pending = fileList.files.filter(file => file.ingestion === 'in_progress');
+    if (pending.length === 0) return;
+
+    ingestionTimer = setTimeout(() => {
+        const params = new URLSearchParams();
+        pending.forEach(file => params.append('file_id', file.id));
+        fetch(`/api/ingestion?${params}`)
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) return;
+            fileList.files.forEach(file => {
+                const status = data.statuses[file.id];
+                if (status) file.ingestion = status.status;
+            });
+            renderVisibleRows();
+        })
+        .catch(error => console.error('Error checking ingestion status:', error))
+        .finally(() => {
+            ingestionTimer = null;
+            scheduleIngestionPoll();
+        });
+    }, INGESTION_POLL_MS);
+}
+
+function createFileRow(file, index) {
+    const row = document.createElement('div');
+    row.className = 'file-item';
+    row.draggable = true;
+    row.dataset.fileId = file.id;
+    row.dataset.fileName = file.filename;
+    row.style.top = `${index * ROW_HEIGHT}px`;
+    row.innerHTML = `
+        <div class="d-flex justify-content-between align-items-center">
+            <div class="file-item-text">
+                <h6 class="mb-1">
+                    <i class="fas fa-file-pdf me-2"></i>
+                    <a class="file-name" target="_blank" rel="noopener" draggable="false"></a>
+                    <span class="badge ms-2 ingestion-status" style="display: none;"></span>
+                </h6>
+                <small class="text-muted">Uploaded: <span class="file-date"></span><span class="file-stats"></span></small>
+            </div>
+            <div class="d-flex align-items-center">
+                <div class="drag-handle me-3">
+                    <i class="fas fa-grip-vertical text-muted"></i>
+                </div>
+                <button class="btn btn-link text-danger p-0 delete-file" title="Delete file">
+                    <i class="fas fa-times"></i>
+                </button>
+            </div>
+        </div>
+    `;
+    const fileLink = row.querySelector('.file-name');
+    fileLink.textContent = file.filename;
+    fileLink.href = `/files/${encodeURIComponent(file.id)}/content`;
+    row.querySelector('.file-date').textContent = file.created_at;
+    if (file.preview) {
+        // Counts fit on the date line so rows keep their fixed height; the text shows on hover
+        const stats = [];
+        if (file.preview.pages) stats.push(`${file.preview.pages} page${file.preview.pages === 1 ? '' : 's'}`);
+        if (file.preview.words) stats.push(`${file.preview.words.toLocaleString()} words`);
+        if (stats.length) row.querySelector('.file-stats').textContent = ` · ${stats.join(' · ')}`;
+        if (file.preview.first_page) row.querySelector('.file-item-text').title = file.preview.first_page;
+    }
+    const label = INGESTION_LABELS[file.ingestion];
+    if (label) {
+        const badge = row.querySelector('.ingestion-status');
+        badge.textContent = label[0];
+        badge.className += ` ${label[1]}`;
+        badge.style.display = '';
+    }
+    return row;
+}
+
+function handleDragStart(event) {
+    const fileItem = event.target.closest('.file-item');
+    if (!fileItem) return;
+    
+    draggedFileId = fileItem.dataset.fileId;
+    draggedFileName = fileItem.dataset.fileName;
+    event.dataTransfer.setData('text/plain', draggedFileId);
+    fileItem.classList.add('dragging');
+}
+
+function handleDragOver(event) {
+    event.preventDefault();
+    const categoryItem = event.target.closest('.category-item');
+    if (categoryItem && categoryItem.dataset.category !== draggedCategory) {
+        // Remove highlight from previous target if different
+        if (currentDragTarget && currentDragTarget !== categoryItem) {
+            currentDragTarget.classList.remove('drag-over');
+        }
+        // Set new target and highlight it
+        currentDragTarget = categoryItem;
+        categoryItem.classList.add('drag-over');
+    }
+}
+
+function handleDragLeave(event) {
+    const categoryItem = event.target.closest('.category-item');
+    const relatedTarget = event.relatedTarget;
+    
+    // Only remove highlight if we're actually leaving the category item
+    if (categoryItem && !categoryItem.contains(relatedTarget)) {
+        categoryItem.classList.remove('drag-over');
+        if (currentDragTarget === categoryItem) {
+            currentDragTarget = null;
+        }
+    }
+}
+
+function handleDrop(event, newCategory) {
+    event.preventDefault();
+    event.stopPropagation();
+    
+    // Clean up any remaining highlights
+    document.querySelectorAll('.category-item').forEach(item => {
+        item.classList.remove('drag-over');
+    });
+    currentDragTarget = null;
+
+    if (!draggedFileId || !newCategory) {
+        showToast('Error: Missing file information', 'error');
+        return;
+    }
+
+    // Show loading state
+    const loadingToast = showToast('Moving file...', 'info');
+    
+    // Send request to update category
+    fetch('/update_category', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            file_id: draggedFileId,
+            new_category: newCategory
+        })
+    })
+    .then(response => {
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        return response.json();
+    })
+    .then(data => {
+        if (data.success) {
+            showToast(`Moved "${draggedFileName}" to ${newCategory}`, 'success');
+            // Give the backend a moment to update
+            setTimeout(() => window.location.reload(), 500);
+        } else {
+            throw new Error(data.error || 'Failed to move file');
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        showToast(`Error moving file: ${error.message}`, 'error');
+    })
+    .finally(() => {
+        draggedFileId = null;
+        draggedFileName = null;
+    });
+}
+
+function deleteFile(fileId, fileName) {
+    if (!confirm(`Are you sure you want to delete "${fileName}"?`)) {
+        return;
+    }
+
+    showToast('Deleting file...', 'info');
+    
+    fetch(`/delete_file/${fileId}`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'Accept': 'application/json'
+        }
+    })
+    .then(response => {
+        if (!response.ok) {
+            return response.json().then(data => {
+                throw new Error(data.error || `HTTP error! status: ${response.status}`);
+            });
+        }
+        return response.json();
+    })
+    .then(data => {
+        if (!data.success) {
+            throw new Error(data.error || 'Unknown error occurred');
+        }
+        showToast(data.message || `"${fileName}" has been deleted`, 'success');
+        setTimeout(() => window.location.reload(), 1000);
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        showToast(error.message || 'Failed to delete file', 'error');
+    });
+}
+
+function showToast(message, type = 'info') {
+    const toast = document.createElement('div');
+    toast.className = `toast position-fixed bottom-0 end-0 m-3 bg-${type === 'error' ? 'danger' : type === 'success' ? 'success' : 'info'} text-white`;
+    toast.setAttribute('role', 'alert');
+    toast.innerHTML = `
+        <div class="toast-body">
+            ${message}
+        </div>
+    `;
+    document.body.appendChild(toast);
+    
+    const bsToast = new bootstrap.Toast(toast, {
+        autohide: true,
+        delay: 3000
+    });
+    bsToast.show();
+    
+    return bsToast;
+}
+
+function escapeHtml(text) {
+    const element = document.createElement('div');
+    element.textContent = text;
+    return element.innerHTML;
+}
+
+function searchFiles() {
+    const searchTerm = document.getElementById('searchInput').value.trim();
+    if (!searchTerm) {
+        showToast('Please enter a search term', 'warning');
+        return;
+    }
+
+    // Show loading state
+    showToast('Searching...', 'info');
+
+    // GET lets the browser revalidate cached results with If-None-Match
+    const mode = document.getElementById('searchContent').checked ? 'content' : 'filename';
+    fetch(`/search_files?${new URLSearchParams({ query: searchTerm, mode: mode })}`)
+    .then(response => {
+        if (!response.ok) {
+            throw new Error('Search failed');
+        }
+        return response.json();
+    })
+    .then(data => {
+        if (data.results.length === 0) {
+            showToast('No files found matching your search', 'info');
+            return;
+        }
+
+        // Create and show modal with results
+        const modalHtml = `
+            <div class="modal fade" id="searchResultsModal" tabindex="-1">
+                <div class="modal-dialog modal-lg">
+                    <div class="modal-content">
+                        <div class="modal-header">
+                            <h5 class="modal-title">Search Results</h5>
+                            <button type="button" class="btn-close" data-bs-dismiss="modal"></button>
+                        </div>
+                        <div class="modal-body">
+                            <div class="list-group">
+                                ${data.results.map(file => `
+                                    <div class="list-group-item">
+                                        <div class="d-flex justify-content-between align-items-center">
+                                            <div>
+                                                <h6 class="mb-1">
+                                                    <i class="fas fa-file me-2"></i>
+                                                    ${file.filename}
+                                                </h6>
+                                                <small class="text-muted">Category: ${file.category}</small>
+                                                ${file.snippet ? `<p class="mb-0 mt-1 small search-snippet">${escapeHtml(file.snippet)}</p>` : ''}
+                                            </div>
+                                            <div>
+                                                <button class="btn btn-sm btn-outline-primary" 
+                                                        onclick="selectCategory('${file.category}')">
+                                                    View Category
+                                                </button>
+                                            </div>
+                                        </div>
+                                    </div>
+                                `).join('')}
+                            </div>
+                        </div>
+                    </div>
+                </div>
+            </div>
+        `;
+
+        // Remove any existing modal
+        const existingModal = document.getElementById('searchResultsModal');
+        if (existingModal) {
+            existingModal.remove();
+        }
+
+        // Add new modal to document
+        document.body.insertAdjacentHTML('beforeend', modalHtml);
+
+        // Show the modal
+        const modal = new bootstrap.Modal(document.getElementById('searchResultsModal'));
+        modal.show();
+    })
+    .catch(error => {
+        console.error('Search error:', error);
+        showToast('Error performing search', 'error');
+    });
+}
+
+document.addEventListener('DOMContentLoaded', initFileList);
+
+// Add event listener for Enter key in search input
+document.getElementById('searchInput').addEventListener('keypress', function(event) {
+    if (event.key === 'Enter') {
+        event.preventDefault();
+        searchFiles();
+    }
+});
@@ -0,0 +1,186 @@
+import os
+import io
+import sys
+import json
+import gzip
+import hashlib
+import logging
+import mimetypes
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+STATIC_FOLDER = 'static'
+BUILD_FOLDER = 'dist'
+MANIFEST_FILE = 'manifest.json'
+
+# Only text formats benefit from precompression
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.svg', '.json', '.txt', '.html', '.map'}
+
+# Images that are resized for display; the logo is shown 40px tall, so 80px covers 2x screens
+IMAGE_VARIANTS = {
+    'images/bwe-logo.jpg': {'height': 80, 'quality': 82}
+}
+
+# Fingerprinted files never change, so browsers may keep them for a year
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+DEFAULT_CACHE_CONTROL = 'public, max-age=300'
+
+def fingerprint(data):
+    """Return a short content hash used to version a file name."""
+    return hashlib.sha256(data).hexdigest()[:12]
+
+def fingerprinted_name(logical_name, data):
+    """Insert the content hash before the extension, e.g. css/app.css -> css/app.<hash>.css."""
+    root, ext = os.path.splitext(logical_name)
+    return f"{root}.{fingerprint(data)}{ext}"
+
+def optimize_image(data, height, quality):
+    """Resize a JPEG to the given height and re-encode it progressively."""
+    if not Image:
+        return data
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            if image.height > height:
+                width = round(image.width * height / image.height)
+                image = image.resize((width, height), Image.LANCZOS)
+            output = io.BytesIO()
+            image.convert('RGB').save(output, format='JPEG', quality=quality, optimize=True, progressive=True)
+        optimized = output.getvalue()
+        return optimized if len(optimized) < len(data) else data
+    except Exception as e:
+        logger.error(f"Error optimizing image: {str(e)}")
+        return data
+
+def write_atomic(path, data):
+    """Write bytes to path without exposing a partially written file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def build_assets(static_folder=STATIC_FOLDER):
+    """Fingerprint, optimize and precompress everything under static/ into static/dist/."""
+    build_folder = os.path.join(static_folder, BUILD_FOLDER)
+    manifest = {}
+
+    for root, dirs, files in os.walk(static_folder):
+        # Never reprocess our own output
+        if os.path.abspath(root).startswith(os.path.abspath(build_folder)):
+            continue
+        for name in files:
+            source_path = os.path.join(root, name)
+            logical_name = os.path.relpath(source_path, static_folder).replace(os.sep, '/')
+            with open(source_path, 'rb') as f:
+                data = f.read()
+
+            if logical_name in IMAGE_VARIANTS:
+                data = optimize_image(data, **IMAGE_VARIANTS[logical_name])
+
+            built_name = fingerprinted_name(logical_name, data)
+            built_path = os.path.join(build_folder, built_name)
+            if not os.path.exists(built_path):
+                write_atomic(built_path, data)
+                if os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+                    write_atomic(f"{built_path}.gz", gzip.compress(data, compresslevel=9, mtime=0))
+                    if brotli:
+                        write_atomic(f"{built_path}.br", brotli.compress(data, quality=11))
+            manifest[logical_name] = f"{BUILD_FOLDER}/{built_name}"
+
+    write_atomic(os.path.join(build_folder, MANIFEST_FILE), json.dumps(manifest, indent=4, sort_keys=True).encode())
+    logger.info(f"Built {len(manifest)} static assets")
+    return manifest
+
+def sources_changed_since(static_folder, timestamp):
+    """Check whether any source asset was modified after the given mtime."""
+    build_folder = os.path.abspath(os.path.join(static_folder, BUILD_FOLDER))
+    for root, dirs, files in os.walk(static_folder):
+        if os.path.abspath(root).startswith(build_folder):
+            continue
+        if any(os.path.getmtime(os.path.join(root, name)) > timestamp for name in files):
+            return True
+    return False
+
+def load_manifest(static_folder=STATIC_FOLDER):
+    """Load the asset manifest, building the assets first if it is missing or outdated."""
+    manifest_path = os.path.join(static_folder, BUILD_FOLDER, MANIFEST_FILE)
+    try:
+        if sources_changed_since(static_folder, os.path.getmtime(manifest_path)):
+            return build_assets(static_folder)
+        with open(manifest_path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return build_assets(static_folder)
+    except Exception as e:
+        logger.error(f"Error loading asset manifest: {str(e)}")
+        return {}
+
+def choose_encoding(accept_encodings, available):
+    """Pick the best content encoding the client accepts from the available ones."""
+    for encoding in ('br', 'gzip'):
+        if encoding in available and accept_encodings[encoding]:
+            return encoding
+    return None
+
+def static_response(request, filename, static_folder=STATIC_FOLDER):
+    """Serve a static file, preferring a precompressed variant and long-lived caching."""
+    from flask import send_from_directory
+
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    available = {
+        encoding for encoding, suffix in (('br', '.br'), ('gzip', '.gz'))
+        if os.path.isfile(os.path.join(static_folder, f"{filename}{suffix}"))
+    }
+    encoding = choose_encoding(request.accept_encodings, available)
+    suffix = {'br': '.br', 'gzip': '.gz'}.get(encoding, '')
+
+    response = send_from_directory(static_folder, f"{filename}{suffix}", mimetype=mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if available:
+        response.vary.add('Accept-Encoding')
+    is_fingerprinted = filename.startswith(f"{BUILD_FOLDER}/")
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if is_fingerprinted else DEFAULT_CACHE_CONTROL
+    return response
+
+def compress_response(request, response, min_size=500):
+    """Compress a dynamic text response in place if the client supports it.
+
+    Streamed and file responses are left alone: reading their body here
+    would buffer the whole download in memory.
+    """
+    if (response.status_code != 200 or response.is_streamed or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in ('text/html', 'application/json')):
+        return response
+
+    data = response.get_data()
+    if len(data) < min_size:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(request.accept_encodings, {'br', 'gzip'} if brotli else {'gzip'})
+    if encoding == 'br':
+        response.set_data(brotli.compress(data, quality=5))
+    elif encoding == 'gzip':
+        response.set_data(gzip.compress(data, compresslevel=6))
+    else:
+        return response
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    static_folder = sys.argv[1] if len(sys.argv) > 1 else STATIC_FOLDER
+    for logical_name, built_name in sorted(build_assets(static_folder).items()):
+        print(f"{logical_name} -> {built_name}")
@@ -0,0 +1,271 @@
+import os
+import json
+import time
+import random
+import socket
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Threads per process that run queued tasks
+TASK_WORKERS = int(os.getenv('TASK_WORKERS', 2))
+
+# Attempts before a task is marked failed; retries back off exponentially up to the maximum delay
+TASK_MAX_ATTEMPTS = int(os.getenv('TASK_MAX_ATTEMPTS', 6))
+RETRY_BASE_SECONDS = 5
+RETRY_MAX_SECONDS = 600
+
+# A claimed task whose process dies is picked up again by any worker after this long
+TASK_LEASE_SECONDS = int(os.getenv('TASK_LEASE_SECONDS', 300))
+
+# Idle workers look for due retries at least this often
+POLL_SECONDS = 5
+
+# Finished tasks are kept this long so a repeated request with the same key is recognized
+KEEP_FINISHED_SECONDS = 7 * 24 * 3600
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    run_after REAL NOT NULL,
+    holder TEXT,
+    lease_until REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_due ON tasks (status, run_after);
+"""
+
+class PermanentTaskError(Exception):
+    """Raised by a handler when retrying cannot help; the task fails at once."""
+
+class TaskQueue:
+    """Durable queue of slow remote mutations, run by worker threads.
+
+    Tasks are rows in SQLite, written before the request returns, so work
+    survives a crash or restart: a task claimed by a process that died is
+    claimed again once its lease runs out. Each task has an idempotency
+    key; enqueueing a key that is already queued, running or done returns
+    the existing task, and handlers must be safe to run twice.
+    """
+
+    def __init__(self, path, workers=TASK_WORKERS, max_attempts=TASK_MAX_ATTEMPTS):
+        self.path = path
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.handlers = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._pid = None
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self):
+        """Return this thread's connection, reopening it after a fork."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @property
+    def holder(self):
+        return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+    def register(self, kind, handler):
+        """Run handler(payload) for tasks of this kind."""
+        self.handlers[kind] = handler
+
+    def enqueue(self, kind, payload, key):
+        """Persist a task and wake the workers; returns the task, existing or new, as a dict.
+
+        A failed task with the same key is queued again from scratch.
+        """
+        conn = self._connect()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT * FROM tasks WHERE idempotency_key = ?', (key,)).fetchone()
+            if row is None:
+                conn.execute(
+                    'INSERT INTO tasks (kind, payload, idempotency_key, status, run_after, created_at, updated_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (kind, json.dumps(payload), key, PENDING, now, now, now)
+                )
+            elif row['status'] == FAILED:
+                conn.execute(
+                    'UPDATE tasks SET kind = ?, payload = ?, status = ?, attempts = 0, run_after = ?, '
+                    'holder = NULL, lease_until = NULL, last_error = NULL, updated_at = ? WHERE id = ?',
+                    (kind, json.dumps(payload), PENDING, now, now, row['id'])
+                )
+            row = conn.execute('SELECT * FROM tasks WHERE idempotency_key = ?', (key,)).fetchone()
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        if row['status'] == PENDING:
+            logger.info(f"Queued {kind} task {row['id']} ({key})")
+            self.start()
+            self._wake.set()
+        return self._task(row)
+
+    @staticmethod
+    def _task(row):
+        task = dict(row)
+        task['payload'] = json.loads(task['payload'])
+        return task
+
+    def get(self, task_id):
+        row = self._connect().execute('SELECT * FROM tasks WHERE id = ?', (task_id,)).fetchone()
+        return self._task(row) if row else None
+
+    def unfinished(self, kind=None):
+        """Queued and running tasks, oldest first."""
+        query = 'SELECT * FROM tasks WHERE status IN (?, ?)'
+        params = [PENDING, RUNNING]
+        if kind:
+            query += ' AND kind = ?'
+            params.append(kind)
+        return [self._task(row) for row in self._connect().execute(query + ' ORDER BY id', params)]
+
+    def counts(self):
+        """Number of tasks per status."""
+        return dict(self._connect().execute('SELECT status, COUNT(*) FROM tasks GROUP BY status').fetchall())
+
+    def wait(self, task_id, timeout):
+        """Wait up to timeout seconds for a task to finish; returns it as last seen."""
+        deadline = time.time() + timeout
+        while True:
+            task = self.get(task_id)
+            if task is None or task['status'] in (DONE, FAILED) or time.time() >= deadline:
+                return task
+            time.sleep(0.05)
+
+    def _claim(self):
+        """Take the oldest due task, including tasks whose previous holder's lease ran out."""
+        conn = self._connect()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT * FROM tasks WHERE (status = ? AND run_after <= ?) OR (status = ? AND lease_until < ?) '
+                'ORDER BY id LIMIT 1',
+                (PENDING, now, RUNNING, now)
+            ).fetchone()
+            if row is not None:
+                if row['status'] == RUNNING:
+                    logger.warning(f"Resuming {row['kind']} task {row['id']} abandoned by {row['holder']}")
+                conn.execute(
+                    'UPDATE tasks SET status = ?, holder = ?, lease_until = ?, attempts = attempts + 1, updated_at = ? '
+                    'WHERE id = ?',
+                    (RUNNING, self.holder, now + TASK_LEASE_SECONDS, now, row['id'])
+                )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return self._task(row) if row else None
+
+    def _finish(self, task, status, error=None, run_after=None):
+        self._connect().execute(
+            'UPDATE tasks SET status = ?, last_error = ?, run_after = COALESCE(?, run_after), holder = NULL, '
+            'lease_until = NULL, updated_at = ? WHERE id = ? AND holder = ?',
+            (status, error, run_after, time.time(), task['id'], self.holder)
+        )
+
+    def _next_due(self):
+        row = self._connect().execute(
+            'SELECT MIN(run_after) FROM tasks WHERE status = ?', (PENDING,)
+        ).fetchone()
+        return row[0]
+
+    def run_once(self):
+        """Run one due task if there is one; returns True if a task was run."""
+        task = self._claim()
+        if task is None:
+            return False
+        attempt = task['attempts'] + 1
+        handler = self.handlers.get(task['kind'])
+        try:
+            if handler is None:
+                raise PermanentTaskError(f"No handler for task kind {task['kind']}")
+            handler(task['payload'])
+        except PermanentTaskError as e:
+            logger.error(f"{task['kind']} task {task['id']} failed: {str(e)}")
+            self._finish(task, FAILED, str(e))
+        except Exception as e:
+            if attempt >= self.max_attempts:
+                logger.error(f"{task['kind']} task {task['id']} failed after {attempt} attempts: {str(e)}")
+                self._finish(task, FAILED, str(e))
+            else:
+                delay = random.uniform(0.5, 1) * min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** (attempt - 1))
+                logger.warning(f"{task['kind']} task {task['id']} attempt {attempt} failed, retrying in {delay:.0f}s: {str(e)}")
+                self._finish(task, PENDING, str(e), run_after=time.time() + delay)
+        else:
+            logger.info(f"{task['kind']} task {task['id']} done")
+            self._finish(task, DONE)
+        return True
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                if self.run_once():
+                    continue
+                next_due = self._next_due()
+            except Exception as e:
+                logger.error(f"Error running queued tasks: {str(e)}")
+                next_due = None
+            timeout = POLL_SECONDS if next_due is None else min(POLL_SECONDS, max(0.05, next_due - time.time()))
+            if self._wake.wait(timeout):
+                self._wake.clear()
+
+    def start(self):
+        """Start the worker threads in this process, picking up whatever was left unfinished."""
+        with self._lock:
+            if self._pid == os.getpid() and any(thread.is_alive() for thread in self._threads):
+                return
+            self._pid = os.getpid()
+            self._stopping.clear()
+            self.purge()
+            self._threads = [
+                threading.Thread(target=self._run, name=f'task-worker-{i}', daemon=True)
+                for i in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def stop(self, timeout=5):
+        """Stop taking new tasks and wait briefly for running ones."""
+        self._stopping.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def purge(self):
+        """Forget finished tasks older than KEEP_FINISHED_SECONDS."""
+        try:
+            self._connect().execute(
+                'DELETE FROM tasks WHERE status IN (?, ?) AND updated_at < ?',
+                (DONE, FAILED, time.time() - KEEP_FINISHED_SECONDS)
+            )
+        except Exception as e:
+            logger.error(f"Error purging finished tasks: {str(e)}")
@@ -0,0 +1,123 @@
+import json
+import threading
+import pytest
+from types import SimpleNamespace
+import admin_cli
+
+class FakeFiles:
+    def __init__(self, files):
+        self.files = files
+        self.list_calls = 0
+        self.deleted = []
+        self._lock = threading.Lock()
+
+    def list(self, limit, after=None, purpose=None):
+        self.list_calls += 1
+        start = 0 if after is None else [f.id for f in self.files].index(after) + 1
+        data = self.files[start:start + limit]
+        return SimpleNamespace(data=data, has_more=start + limit < len(self.files))
+
+    def delete(self, file_id):
+        if file_id == 'file-broken':
+            raise RuntimeError("server error")
+        with self._lock:
+            self.deleted.append(file_id)
+
+class FakeVectorStores:
+    def __init__(self, stores):
+        self.stores = stores
+        self.deleted = []
+
+    def list(self, limit, after=None):
+        return SimpleNamespace(data=self.stores, has_more=False)
+
+    def delete(self, store_id):
+        self.deleted.append(store_id)
+
+def make_client(names):
+    files = [
+        SimpleNamespace(id=f'file-{i:03d}', filename=name, purpose='assistants', created_at=1700000000 + i, bytes=10)
+        for i, name in enumerate(names)
+    ]
+    stores = [SimpleNamespace(id='vs-main', name='BWE Documents'), SimpleNamespace(id='vs-tmp', name=None)]
+    return SimpleNamespace(files=FakeFiles(files), beta=SimpleNamespace(vector_stores=FakeVectorStores(stores)))
+
+def run(capsys, client, tmp_path, *argv):
+    code = admin_cli.main(['--json', '--snapshot', str(tmp_path / 'snapshot.json.gz')] + list(argv), client=client)
+    return code, json.loads(capsys.readouterr().out)
+
+def test_commands_share_one_paginated_snapshot(capsys, tmp_path, monkeypatch):
+    monkeypatch.delenv('OPENAI_ASSISTANT_ID', raising=False)
+    monkeypatch.setattr(admin_cli, 'LIST_PAGE_SIZE', 2)
+    client = make_client(['Budget.pdf', 'Minutes.docx', 'Budget.pdf', 'test_upload.txt', 'Rules'])
+    code, result = run(capsys, client, tmp_path, 'count')
+    assert code == 0
+    assert result == {'total': 4, 'by_extension': {'.docx': 1, '.pdf': 2, 'no extension': 1}}
+    assert client.files.list_calls == 3
+
+    code, result = run(capsys, client, tmp_path, 'state', '--all')
+    assert [f['filename'] for f in result['files']][-1] == 'Rules'
+    assert [s['id'] for s in result['vector_stores']] == ['vs-main', 'vs-tmp']
+    assert client.files.list_calls == 3
+
+    run(capsys, client, tmp_path, '--refresh', 'count')
+    assert client.files.list_calls == 6
+
+def test_cleanup_duplicates_keeps_newest_and_reports_failures(capsys, tmp_path, monkeypatch):
+    monkeypatch.delenv('OPENAI_ASSISTANT_ID', raising=False)
+    client = make_client(['Budget.pdf', 'Budget.pdf', 'Budget.pdf', 'Minutes.pdf'])
+    code, result = run(capsys, client, tmp_path, 'cleanup-duplicates', '--dry-run')
+    assert result['keep'] == {'Budget.pdf': 'file-002'}
+    assert result['planned'] == ['file-001', 'file-000']
+    assert client.files.deleted == []
+
+    code, result = run(capsys, client, tmp_path, 'cleanup-duplicates', '--rate', '100')
+    assert code == 0
+    assert sorted(client.files.deleted) == ['file-000', 'file-001']
+
+    # Deleted files are dropped from the cached snapshot, so no relisting is needed
+    code, result = run(capsys, client, tmp_path, 'count')
+    assert result['total'] == 2
+    assert client.files.list_calls == 1
+
+def test_run_mutations_collects_failures():
+    succeeded, failed = admin_cli.run_mutations(['a', 'b', 'c'], lambda item: 1 / (item != 'b'), workers=3, rate=1000)
+    assert succeeded == ['a', 'c']
+    assert [item for item, error in failed] == ['b']
+
+def test_verify_streams_a_diff_and_keeps_declared_categories(capsys, tmp_path, monkeypatch):
+    monkeypatch.delenv('OPENAI_ASSISTANT_ID', raising=False)
+    client = make_client(['Budget.pdf', 'Minutes.pdf'])
+    categories_file = tmp_path / 'categories.json'
+    categories_file.write_text(json.dumps({
+        'categories': ['Financial Reports', 'Meeting Documents', 'Unused'],
+        'file_categories': {'file-000': 'Financial Reports', 'file-gone': 'Meeting Documents'}
+    }))
+    diff_file = tmp_path / 'diff.jsonl'
+    code, result = run(capsys, client, tmp_path, 'verify', '--categories-file', str(categories_file), '--diff', str(diff_file))
+    assert result['missing_from_openai'] == 1 and result['missing_from_categories'] == 1 and result['removed'] == 1
+    assert [json.loads(line)['id'] for line in diff_file.read_text().splitlines()] == ['file-001', 'file-gone']
+    assert json.loads(categories_file.read_text()) == {
+        'categories': ['Financial Reports', 'Meeting Documents', 'Unused'],
+        'file_categories': {'file-000': 'Financial Reports'}
+    }
+    # Verification streams from OpenAI and never builds a snapshot
+    assert not (tmp_path / 'snapshot.json.gz').exists()
+
+def test_verify_refuses_to_empty_the_store_when_openai_lists_nothing(capsys, tmp_path, monkeypatch):
+    monkeypatch.delenv('OPENAI_ASSISTANT_ID', raising=False)
+    categories_file = tmp_path / 'categories.json'
+    store = {'categories': ['Financial Reports'], 'file_categories': {'file-000': 'Financial Reports'}}
+    categories_file.write_text(json.dumps(store))
+    code, result = run(capsys, make_client([]), tmp_path, 'verify', '--categories-file', str(categories_file),
+                       '--diff', str(tmp_path / 'diff.jsonl'))
+    assert code == 1 and result['refused'] and result['removed'] == 0
+    assert json.loads(categories_file.read_text()) == store
+
+def test_verify_rejects_a_stdout_diff_with_json(capsys, tmp_path):
+    client = make_client(['Budget.pdf'])
+    with pytest.raises(SystemExit) as error:
+        admin_cli.main(['--json', 'verify', '--diff', '-'], client=client)
+    assert error.value.code == 2
+    assert capsys.readouterr().out == ''
+    assert client.files.list_calls == 0
@@ -0,0 +1,280 @@
+import os
+import json
+from types import SimpleNamespace
+import pytest
+from circuit_breaker import OPEN, CLOSED, CircuitOpenError
+import assistant_analyzer
+from assistant_analyzer import AssistantAnalyzer
+from shared_cache import SharedCatalog
+
+class FakeFiles:
+    """Minimal stand-in for client.files backed by a list of file objects."""
+    def __init__(self, files):
+        self.files = files
+        self.list_calls = []
+
+    def list(self, purpose=None, order='desc', after=None, limit=100):
+        self.list_calls.append({'order': order, 'after': after})
+        files = sorted(self.files, key=lambda f: (f.created_at, f.id), reverse=(order == 'desc'))
+        if after:
+            ids = [f.id for f in files]
+            if after not in ids:
+                raise ValueError(f'Unknown cursor {after}')
+            files = files[ids.index(after) + 1:]
+        return SimpleNamespace(data=files[:limit], has_more=len(files) > limit)
+
+    def create(self, file, purpose):
+        uploaded = make_file(len(self.files) + 1000, filename=os.path.basename(file.name))
+        self.files.append(uploaded)
+        return uploaded
+
+class FakeFileBatches:
+    def __init__(self):
+        self.created = []
+
+    def create(self, vector_store_id, file_ids):
+        self.created.append((vector_store_id, list(file_ids)))
+        return SimpleNamespace(id=f'vsfb_{len(self.created)}', status='in_progress', file_counts=None)
+
+class FakeAssistants:
+    def __init__(self):
+        self.updates = []
+
+    def retrieve(self, assistant_id):
+        return SimpleNamespace(tool_resources=None)
+
+    def update(self, **kwargs):
+        self.updates.append(kwargs)
+
+class FakeClient:
+    def __init__(self, files):
+        self.files = FakeFiles(files)
+        self.beta = SimpleNamespace(
+            assistants=FakeAssistants(),
+            vector_stores=SimpleNamespace(file_batches=FakeFileBatches())
+        )
+
+def make_file(i, filename=None):
+    return SimpleNamespace(
+        id=f'file-{i:04d}',
+        filename=filename or f'Report {i}.pdf',
+        purpose='assistants',
+        created_at=1700000000 + i,
+        bytes=2048
+    )
+
+def make_analyzer(client, **kwargs):
+    analyzer = AssistantAnalyzer(api_key=None, assistant_id=None, **kwargs)
+    analyzer.limited_mode = False
+    analyzer.client = client
+    analyzer.assistant_id = 'asst_test'
+    analyzer.vector_store_id = 'vs_test'
+    return analyzer
+
+def test_snapshot_serves_stale_catalog_until_refreshed(tmp_path):
+    snapshot_path = str(tmp_path / 'snapshot.json.gz')
+    categories_file = tmp_path / 'categories.json'
+    categories_file.write_text(json.dumps({'categories': ['General Documents'], 'file_categories': {'file-0001': 'General Documents'}}))
+
+    first = make_analyzer(FakeClient([make_file(1), make_file(2)]), snapshot_path=snapshot_path, categories_file=str(categories_file))
+    assert len(first.get_file_list()) == 2
+
+    # A new worker boots from the snapshot and restores the missing category store
+    categories_file.unlink()
+    client = FakeClient([make_file(1), make_file(2), make_file(3)])
+    second = make_analyzer(client, snapshot_path=snapshot_path, categories_file=str(categories_file))
+    assert second.load_snapshot()
+    assert second.catalog_stale
+    assert json.loads(categories_file.read_text())['file_categories'] == {'file-0001': 'General Documents'}
+
+    assert len(second.get_file_list()) == 2
+    second._refresh_thread.join(timeout=5)
+    assert not second.catalog_stale
+    assert len(second.get_file_list()) == 3
+
+def test_delta_sync_fetches_only_new_files_and_emits_events():
+    client = FakeClient([make_file(i) for i in range(250)])
+    analyzer = make_analyzer(client)
+    events = []
+    analyzer.add_catalog_listener(lambda event, file: events.append((event, file['id'])))
+
+    assert len(analyzer.get_file_list()) == 250
+    assert events == []
+
+    client.files.files.append(make_file(300))
+    client.files.list_calls.clear()
+    files = analyzer.sync_catalog()
+    assert len(files) == 251
+    assert files[0]['id'] == 'file-0300'
+    assert client.files.list_calls == [{'order': 'asc', 'after': 'file-0249'}]
+    assert events == [('added', 'file-0300')]
+
+def test_local_upload_does_not_move_the_delta_sync_watermark():
+    client = FakeClient([make_file(i) for i in range(3)])
+    analyzer = make_analyzer(client)
+    analyzer.get_file_list()
+
+    # Another worker's upload is created first but this worker records its own upload before the next sync
+    client.files.files += [make_file(5), make_file(7)]
+    analyzer.record_uploaded_file(make_file(7))
+    client.files.list_calls.clear()
+    files = analyzer.sync_catalog()
+    assert client.files.list_calls == [{'order': 'asc', 'after': 'file-0002'}]
+    assert [f['id'] for f in files] == ['file-0007', 'file-0005', 'file-0002', 'file-0001', 'file-0000']
+    assert analyzer._watermark == (1700000007, 'file-0007')
+
+def test_full_sweep_detects_deletions():
+    client = FakeClient([make_file(i) for i in range(5)])
+    analyzer = make_analyzer(client)
+    analyzer.get_file_list()
+    events = []
+    analyzer.add_catalog_listener(lambda event, file: events.append((event, file['id'])))
+
+    # Deleting the watermark file breaks the cursor, so delta sync falls back to a full sweep
+    del client.files.files[4]
+    files = analyzer.sync_catalog()
+    assert [f['id'] for f in files] == ['file-0003', 'file-0002', 'file-0001', 'file-0000']
+    assert events == [('removed', 'file-0004')]
+
+def test_outage_serves_last_catalog_and_opens_the_circuit():
+    client = FakeClient([make_file(i) for i in range(3)])
+    analyzer = make_analyzer(client)
+    assert len(analyzer.get_file_list()) == 3
+
+    def unavailable(**kwargs):
+        raise ConnectionError("connection refused")
+    working_list = client.files.list
+    client.files.list = unavailable
+    for attempt in range(analyzer.breaker.failure_threshold):
+        assert len(analyzer.refresh_catalog()) == 3
+    assert analyzer.catalog_stale
+    assert analyzer.breaker.state == OPEN
+    assert analyzer.openai_unavailable
+
+    # While open, no call is made and the stale catalog is served straight away
+    client.files.list = working_list
+    client.files.list_calls.clear()
+    assert len(analyzer.get_file_list()) == 3
+    analyzer._refresh_thread.join(timeout=5)
+    assert client.files.list_calls == []
+
+    # After the reset period the background revalidation closes the circuit again
+    analyzer.breaker.reset_seconds = 0
+    analyzer.get_file_list()
+    analyzer._refresh_thread.join(timeout=5)
+    assert analyzer.breaker.state == CLOSED
+    assert not analyzer.catalog_stale
+
+def test_workers_share_one_refresher_through_shared_cache(tmp_path):
+    path = str(tmp_path / 'catalog.sqlite3')
+    client = FakeClient([make_file(i) for i in range(3)])
+    first = make_analyzer(client, shared_cache=SharedCatalog(path))
+    second = make_analyzer(client, shared_cache=SharedCatalog(path))
+    events = []
+    host_events = []
+    second.add_catalog_listener(lambda event, file: events.append((event, file['id'])), per_process=True)
+    for analyzer in (first, second):
+        analyzer.add_catalog_listener(lambda event, file: host_events.append((event, file['id'])))
+
+    assert len(first.get_file_list()) == 3
+    assert len(second.get_file_list()) == 3
+    assert len(client.files.list_calls) == 1
+
+    # An upload recorded by one worker reaches the other without another listing
+    first.record_uploaded_file(make_file(7))
+    assert [f['id'] for f in second.get_file_list()][0] == 'file-0007'
+    assert events == [('added', 'file-0007')]
+    assert len(client.files.list_calls) == 1
+    # Listeners that update shared state hear about the upload once, from the worker that made it
+    assert host_events == [('added', 'file-0007')]
+
+def test_refresh_is_skipped_while_another_worker_holds_the_lease(tmp_path):
+    path = str(tmp_path / 'catalog.sqlite3')
+    client = FakeClient([make_file(i) for i in range(3)])
+    first = make_analyzer(client, shared_cache=SharedCatalog(path))
+    first.get_file_list()
+
+    other = SharedCatalog(path)
+    other.holder = 'other-host:1'
+    assert other.acquire_lease('catalog-refresh')
+
+    client.files.list_calls.clear()
+    assert len(first.refresh_catalog()) == 3
+    assert client.files.list_calls == []
+
+def test_refresh_renews_the_lease_between_pages(tmp_path, monkeypatch):
+    monkeypatch.setattr(assistant_analyzer, 'LIST_PAGE_SIZE', 2)
+    shared = SharedCatalog(str(tmp_path / 'catalog.sqlite3'))
+    analyzer = make_analyzer(FakeClient([make_file(i) for i in range(5)]), shared_cache=shared)
+    acquired = []
+    acquire_lease = shared.acquire_lease
+    monkeypatch.setattr(shared, 'acquire_lease', lambda name: acquired.append(name) or acquire_lease(name))
+
+    assert len(analyzer.refresh_catalog()) == 5
+    # Once before the listing and once before each of the two later pages
+    assert acquired == ['catalog-refresh'] * 3
+
+def test_refresh_stops_when_another_worker_takes_over_the_lease(tmp_path, monkeypatch):
+    monkeypatch.setattr(assistant_analyzer, 'LIST_PAGE_SIZE', 2)
+    path = str(tmp_path / 'catalog.sqlite3')
+    client = FakeClient([make_file(i) for i in range(5)])
+    first = make_analyzer(client, shared_cache=SharedCatalog(path))
+    first.get_file_list()
+    monkeypatch.setattr(assistant_analyzer, 'SHARED_CATALOG_WAIT_SECONDS', 0)
+
+    other = SharedCatalog(path)
+    other.holder = 'other-host:1'
+    list_files = client.files.list
+    def list_and_lose_lease(**params):
+        # The lease expires during the first page and another worker claims it
+        other._connect().execute('UPDATE leases SET expires_at = 0')
+        assert other.acquire_lease('catalog-refresh')
+        return list_files(**params)
+    monkeypatch.setattr(client.files, 'list', list_and_lose_lease)
+    client.files.files.pop()
+
+    assert len(first.refresh_catalog()) == 5
+    assert len(client.files.list_calls) == 4
+    assert first.breaker.state == CLOSED
+
+def test_upload_files_attaches_all_files_in_one_vector_store_batch(tmp_path):
+    paths = []
+    for name in ('a.pdf', 'b.pdf', 'c.pdf'):
+        path = tmp_path / name
+        path.write_text(name)
+        paths.append(str(path))
+    client = FakeClient([])
+    analyzer = make_analyzer(client)
+    analyzer.get_file_list()
+
+    uploaded = analyzer.upload_files(paths)
+    assert [f.filename for f in uploaded] == ['a.pdf', 'b.pdf', 'c.pdf']
+    assert client.beta.vector_stores.file_batches.created == [('vs_test', [f.id for f in uploaded])]
+    assert client.beta.assistants.updates[0]['tool_resources']['file_search'] == {'vector_store_ids': ['vs_test']}
+    assert client.beta.assistants.updates[0]['tool_resources']['code_interpreter'] == {'file_ids': []}
+    assert len(analyzer.get_file_list()) == 3
+
+def test_open_circuit_refuses_uploads_deletions_and_downloads(tmp_path):
+    path = tmp_path / 'a.pdf'
+    path.write_text('a')
+    client = FakeClient([make_file(1)])
+    analyzer = make_analyzer(client)
+    analyzer.get_file_list()
+    for attempt in range(analyzer.breaker.failure_threshold):
+        analyzer.breaker.record_failure(ConnectionError("connection refused"))
+
+    calls = []
+    client.files.delete = lambda file_id: calls.append(('delete', file_id))
+    client.beta.vector_stores.files = SimpleNamespace(delete=lambda file_id, vector_store_id: calls.append(('detach', file_id)))
+    client.files.with_streaming_response = SimpleNamespace(
+        content=lambda file_id: SimpleNamespace(__enter__=lambda: calls.append(('download', file_id)))
+    )
+
+    with pytest.raises(CircuitOpenError, match='OpenAI is not responding'):
+        analyzer.upload_files([str(path)])
+    assert len(client.files.files) == 1
+    assert analyzer.delete_file('file-0001') is False
+    with pytest.raises(CircuitOpenError):
+        next(analyzer.stream_file_content('file-0001'))
+    assert calls == []
+    assert [f['id'] for f in analyzer.get_file_list()] == ['file-0001']
@@ -0,0 +1,396 @@
+import os
+import io
+import json
+import time
+from types import SimpleNamespace
+import pytest
+import app as app_module
+from assistant_analyzer import OPENAI_UNAVAILABLE_MESSAGE
+from circuit_breaker import CircuitOpenError
+from catalog_version import CatalogVersion
+from series_index import SeriesIndex
+from ingestion_tracker import IngestionTracker
+from text_index import TextIndex
+from near_duplicates import NearDuplicateIndex
+from gap_engine import GapEngine
+from categorizer import CategorizationRules, CategorizationCache
+from file_cache import FileCache
+from preview_pipeline import PreviewStore, PreviewPipeline
+from task_queue import TaskQueue
+
+class FakeAnalyzer:
+    """Stand-in for AssistantAnalyzer that serves a fixed file list."""
+    def __init__(self, files):
+        self.files = files
+        self.catalog_stale = False
+        self.openai_unavailable = False
+        self.limited_mode = False
+        self.vector_store_id = None
+
+    def get_file_list(self):
+        return list(self.files)
+
+    def stream_file_content(self, file_id, chunk_size):
+        self.downloads = getattr(self, 'downloads', 0) + 1
+        data = f'content of {file_id} '.encode() * 100
+        for i in range(0, len(data), chunk_size):
+            yield data[i:i + chunk_size]
+
+    def delete_file(self, file_id):
+        self.files = [f for f in self.files if f['id'] != file_id]
+        return True
+
+    def upload_files(self, file_paths):
+        self.uploaded = list(file_paths)
+        return [SimpleNamespace(id=f'file-new-{i}', filename=os.path.basename(path), created_at=1700000000)
+                for i, path in enumerate(file_paths)]
+
+class FakePreviewPipeline:
+    """Records the files queued for previews instead of parsing them."""
+    def __init__(self):
+        self.scheduled = []
+
+    def schedule(self, files):
+        self.scheduled.extend(f['id'] for f in files)
+
+    def schedule_local(self, file, path):
+        self.schedule([file])
+        os.remove(path)
+
+def make_files(count, prefix='Budget Report'):
+    return [{
+        'id': f'file-{i:04d}',
+        'filename': f'{prefix} {i}.pdf',
+        'purpose': 'assistants',
+        'created_at': 1700000000 + i,
+        'bytes': 1024
+    } for i in range(count)]
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    files = make_files(120)
+    categories_file = tmp_path / 'categories.json'
+    categories_file.write_text(json.dumps({
+        'categories': ['Financial Reports', 'General Documents', 'Uncategorized'],
+        'file_categories': {f['id']: 'Financial Reports' for f in files}
+    }))
+    monkeypatch.setitem(app_module.app.config, 'CATEGORIES_FILE', str(categories_file))
+    fake_analyzer = FakeAnalyzer(files)
+    monkeypatch.setattr(app_module, 'analyzer', fake_analyzer)
+    monkeypatch.setattr(app_module, 'ingestion_tracker', IngestionTracker(fake_analyzer))
+    monkeypatch.setattr(app_module, 'text_index', TextIndex(str(tmp_path / 'text_index.sqlite3')))
+    monkeypatch.setattr(app_module, 'near_duplicate_index', NearDuplicateIndex(str(tmp_path / 'near_duplicates.sqlite3')))
+    monkeypatch.setattr(app_module, 'catalog_version', CatalogVersion(str(tmp_path / 'catalog_version.json')))
+    monkeypatch.setattr(app_module, 'category_listings', {})
+    monkeypatch.setattr(app_module, 'gap_engine', GapEngine())
+    monkeypatch.setattr(app_module, 'file_cache', FileCache(str(tmp_path / 'file_cache')))
+    monkeypatch.setattr(app_module, 'preview_store', PreviewStore(str(tmp_path / 'previews.json')))
+    monkeypatch.setattr(app_module, 'preview_pipeline', FakePreviewPipeline())
+    queue = TaskQueue(str(tmp_path / 'tasks.sqlite3'), workers=0)
+    queue.handlers = dict(app_module.task_queue.handlers)
+    monkeypatch.setattr(app_module, 'task_queue', queue)
+    monkeypatch.setattr(app_module, 'categorizer', CategorizationCache(CategorizationRules('categorization_rules.json'), str(tmp_path / 'categorization_cache.json')))
+    app_module.app.config['TESTING'] = True
+    return app_module.app.test_client()
+
+def test_index_renders_counts_without_file_rows(client):
+    response = client.get('/category/Financial Reports')
+    assert response.status_code == 200
+    html = response.get_data(as_text=True)
+    assert 'data-total="120"' in html
+    assert 'Budget Report 7.pdf' not in html
+
+def test_category_files_are_cursor_paginated(client):
+    seen = []
+    cursor = None
+    while True:
+        query = f'?limit=50&cursor={cursor}' if cursor else '?limit=50'
+        data = client.get(f'/api/category/Financial Reports/files{query}').get_json()
+        assert data['success']
+        assert data['total'] == 120
+        seen.extend(f['id'] for f in data['files'])
+        cursor = data['next_cursor']
+        if not cursor:
+            break
+    assert len(seen) == 120
+    assert len(set(seen)) == 120
+
+def test_category_pages_neither_skip_nor_repeat_files_when_the_catalog_changes(client):
+    first = client.get('/api/category/Financial Reports/files?limit=50').get_json()
+    # Newest first: drop files from the page already sent and add a newer upload before asking for the next one
+    app_module.analyzer.files = [f for f in app_module.analyzer.files if f['id'] not in {'file-0119', 'file-0100'}]
+    app_module.analyzer.files.append(dict(make_files(1)[0], id='file-new', created_at=1800000000))
+    app_module.catalog_version.bump('test')
+
+    seen = [f['id'] for f in first['files']]
+    cursor = first['next_cursor']
+    while cursor:
+        data = client.get(f'/api/category/Financial Reports/files?limit=50&cursor={cursor}').get_json()
+        seen.extend(f['id'] for f in data['files'])
+        cursor = data['next_cursor']
+    assert len(seen) == len(set(seen)) == 120
+    assert seen[-1] == 'file-0000'
+    assert 'file-new' not in seen
+
+def test_category_gaps_are_reused_until_the_catalog_changes(client, monkeypatch):
+    first = client.get('/api/category/Financial Reports/files?limit=10').get_json()
+    calls = []
+    extract = app_module.extract_month_year
+    monkeypatch.setattr(app_module, 'extract_month_year', lambda file: calls.append(file['id']) or extract(file))
+    assert client.get('/api/category/Financial Reports/files?limit=20').get_json()['gaps'] == first['gaps']
+    assert calls == []
+
+    app_module.catalog_version.bump('test')
+    client.get('/api/category/Financial Reports/files?limit=20')
+    assert calls
+
+def test_category_files_rejects_bad_cursor(client):
+    response = client.get('/api/category/Financial Reports/files?cursor=not-a-cursor')
+    assert response.status_code == 400
+
+def test_category_files_unknown_category(client):
+    response = client.get('/api/category/Nope/files')
+    assert response.status_code == 404
+
+def test_conditional_get_returns_304_until_catalog_changes(client):
+    first = client.get('/category/Financial Reports')
+    etag = first.headers['ETag']
+    assert first.headers['Last-Modified']
+
+    cached = client.get('/category/Financial Reports', headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.data == b''
+
+    app_module.catalog_version.bump('test')
+    changed = client.get('/category/Financial Reports', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+
+def test_search_supports_conditional_get(client):
+    first = client.get('/search_files?query=budget report 1')
+    assert first.get_json()['results']
+    cached = client.get('/search_files?query=budget report 1', headers={'If-None-Match': first.headers['ETag']})
+    assert cached.status_code == 304
+
+def test_fingerprinted_assets_are_precompressed_and_immutable(client):
+    built_name = app_module.asset_manifest['css/base.css']
+    response = client.get(f'/static/{built_name}', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'immutable' in response.headers['Cache-Control']
+
+def test_html_responses_are_compressed(client):
+    response = client.get('/category/Financial Reports', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] in ('gzip', 'br')
+    assert response.headers['ETag']
+
+def test_series_endpoint_groups_files_by_normalized_name(client, monkeypatch):
+    app_module.analyzer.files = [
+        {'id': 'a', 'filename': 'Budget Report Jan 2024.pdf', 'created_at': 1},
+        {'id': 'b', 'filename': 'budget_report_2024-03.pdf', 'created_at': 2},
+        {'id': 'c', 'filename': 'Pool Rules.pdf', 'created_at': 3},
+    ]
+    monkeypatch.setattr(app_module, 'series_index', SeriesIndex(month_of=app_module.filename_month_index))
+    data = client.get('/api/series').get_json()
+    assert data['success']
+    assert [s['key'] for s in data['series']] == ['budget report']
+    assert data['series'][0]['latest']['id'] == 'b'
+    assert data['series'][0]['gaps'] == ['February 2024']
+
+def test_bulk_update_categories_reports_per_item_results(client, tmp_path):
+    response = client.post('/update_categories', json={'updates': [
+        {'file_id': 'file-0001', 'category': 'General Documents'},
+        {'file_id': 'file-0002', 'category': 'General Documents'},
+        {'file_id': 'file-0003', 'category': 'Financial Reports'},
+        {'file_id': 'file-9999', 'category': 'General Documents'},
+        {'file_id': 'file-0004', 'category': 'No Such Category'},
+    ]})
+    data = response.get_json()
+    assert not data['success']
+    assert data['changed'] == 2
+    assert data['failed'] == 2
+    assert [r['success'] for r in data['results']] == [True, True, True, False, False]
+    assert data['results'][3]['error'] == 'File not found: file-9999'
+
+    stored = json.loads((tmp_path / 'categories.json').read_text())['file_categories']
+    assert stored['file-0001'] == 'General Documents'
+    assert stored['file-0003'] == 'Financial Reports'
+    assert 'file-9999' not in stored
+
+def test_upload_accepts_several_files_in_one_request(client, tmp_path, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, 'UPLOAD_FOLDER', str(tmp_path / 'uploads'))
+    os.makedirs(tmp_path / 'uploads')
+    pipeline = PreviewPipeline(app_module.preview_store, lambda file: None, workers=1,
+                               on_text=app_module.index_document_text)
+    monkeypatch.setattr(app_module, 'preview_pipeline', pipeline)
+    try:
+        response = client.post('/upload_file', headers={'Accept': 'application/json'}, data={
+            'file': [(io.BytesIO(b'a'), 'Budget 2024-01.pdf'), (io.BytesIO(b'No diving in the shallow end'), 'Pool Rules.txt')]
+        }, content_type='multipart/form-data')
+        data = response.get_json()
+        assert data['success']
+        assert [f['filename'] for f in data['files']] == ['Budget_2024-01.pdf', 'Pool_Rules.txt']
+        assert len(app_module.analyzer.uploaded) == 2
+
+        stored = json.loads((tmp_path / 'categories.json').read_text())['file_categories']
+        assert 'file-new-0' in stored and 'file-new-1' in stored
+
+        # Uploaded text becomes searchable by content once the pipeline has parsed it
+        app_module.analyzer.files.append({'id': 'file-new-1', 'filename': 'Pool_Rules.txt', 'created_at': 1700000000})
+        deadline = time.time() + 30
+        while 'file-new-1' not in app_module.text_index and time.time() < deadline:
+            time.sleep(0.1)
+        results = client.get('/search_files?query=diving&mode=content').get_json()['results']
+        assert [r['id'] for r in results] == ['file-new-1']
+        assert 'No diving' in results[0]['snippet']
+        assert app_module.preview_store.get('file-new-1')['words'] == 6
+        # Local copies are removed once parsed
+        while os.listdir(tmp_path / 'uploads') and time.time() < deadline:
+            time.sleep(0.1)
+        assert os.listdir(tmp_path / 'uploads') == []
+    finally:
+        pipeline.close()
+
+def test_category_files_report_ingestion_status(client):
+    first_id = client.get('/api/category/Financial Reports/files?limit=2').get_json()['files'][0]['id']
+    app_module.ingestion_tracker.store.set_ingestion_status({first_id: ('in_progress', None)})
+    data = client.get('/api/category/Financial Reports/files?limit=2').get_json()
+    assert [f['ingestion'] for f in data['files']] == ['in_progress', None]
+
+    data = client.get(f'/api/ingestion?file_id={first_id}&file_id=file-9999').get_json()
+    assert data['statuses'] == {first_id: {'status': 'in_progress', 'error': None}}
+    assert data['summary'] == {'in_progress': 1}
+
+def test_reconciliation_keeps_mappings_when_openai_returns_nothing(client, monkeypatch):
+    # An outage with no catalog to fall back on yields an empty list, which must not wipe the store
+    monkeypatch.setattr(app_module.analyzer, 'files', [])
+    assert app_module.verify_categories_integrity()
+    all_categories, file_categories = app_module.load_categories()
+    assert len(file_categories) == 120
+
+    # The refused pass counts as done: it is not repeated until the catalog changes
+    calls = []
+    monkeypatch.setattr(app_module, 'verify_categories_integrity', lambda: calls.append(1))
+    monkeypatch.setattr(app_module, 'CATALOG_REVALIDATE_SECONDS', 0)
+    app_module.revalidate_catalog()
+    assert calls == []
+    app_module.catalog_version.bump('test')
+    app_module.revalidate_catalog()
+    assert calls == [1]
+
+def test_file_content_is_streamed_then_served_from_cache_with_ranges(client):
+    expected = b'content of file-0007 ' * 100
+    response = client.get('/files/file-0007/content')
+    assert response.status_code == 200
+    assert response.get_data() == expected
+    assert response.headers['Content-Disposition'].startswith('inline')
+    assert app_module.analyzer.downloads == 1
+
+    response = client.get('/files/file-0007/content', headers={'Range': 'bytes=0-9'})
+    assert response.status_code == 206
+    assert response.get_data() == expected[:10]
+    assert app_module.analyzer.downloads == 1
+
+    assert client.get('/files/file-missing/content').status_code == 404
+
+def test_category_files_include_stored_previews_and_queue_missing_ones(client):
+    app_module.preview_store.put({'file-0118': {
+        'first_page': 'Annual budget', 'pages': 4, 'words': 900, 'signature': [], 'generated_at': 0
+    }})
+    data = client.get('/api/category/Financial Reports/files?limit=5').get_json()
+    previews = {f['id']: f['preview'] for f in data['files']}
+    assert previews['file-0118'] == {'first_page': 'Annual budget', 'pages': 4, 'words': 900}
+    assert previews['file-0119'] is None
+    assert app_module.preview_pipeline.scheduled == [f['id'] for f in data['files']]
+
+def test_file_deletion_is_queued_and_hidden_until_it_runs(client):
+    headers = {'Accept': 'application/json'}
+    response = client.post('/delete_file/file-0003', headers=headers)
+    assert response.status_code == 202
+    task_id = response.get_json()['task_id']
+    # A repeated click reuses the queued task
+    assert client.post('/delete_file/file-0003', headers=headers).get_json()['task_id'] == task_id
+
+    data = client.get('/api/category/Financial Reports/files?limit=200').get_json()
+    assert data['total'] == 119
+    assert client.get('/api/tasks').get_json()['unfinished'][0]['payload'] == {'file_id': 'file-0003'}
+
+    assert app_module.task_queue.run_once()
+    all_categories, file_categories = app_module.load_categories()
+    assert 'file-0003' not in file_categories
+    assert all(f['id'] != 'file-0003' for f in app_module.analyzer.files)
+    assert app_module.task_queue.get(task_id)['status'] == 'done'
+
+def test_category_reassignment_task_can_run_twice(client):
+    payload = {'category': 'Financial Reports', 'target': 'Uncategorized'}
+    app_module.run_category_reassignment(payload)
+    app_module.run_category_reassignment(payload)
+    all_categories, file_categories = app_module.load_categories()
+    assert 'Financial Reports' not in all_categories
+    assert set(file_categories.values()) == {'Uncategorized'}
+
+def test_html_file_content_is_streamed_without_compression(client):
+    app_module.analyzer.files[7]['filename'] = 'Newsletter.html'
+    response = client.get('/files/file-0007/content', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_data() == b'content of file-0007 ' * 100
+
+def test_uploads_and_downloads_fail_fast_while_openai_is_down(client, monkeypatch):
+    def unavailable(*args, **kwargs):
+        raise CircuitOpenError(OPENAI_UNAVAILABLE_MESSAGE)
+    monkeypatch.setattr(app_module.analyzer, 'upload_files', unavailable)
+    monkeypatch.setattr(app_module.analyzer, 'stream_file_content', unavailable)
+
+    response = client.post('/upload_file', headers={'Accept': 'application/json'}, data={
+        'file': [(io.BytesIO(b'a'), 'Budget 2024-01.pdf')]
+    }, content_type='multipart/form-data')
+    assert response.status_code == 503
+    assert response.get_json()['error'] == OPENAI_UNAVAILABLE_MESSAGE
+
+    response = client.get('/files/file-0007/content')
+    assert response.status_code == 503
+    assert response.get_json()['error'] == OPENAI_UNAVAILABLE_MESSAGE
+
+def use_rules(monkeypatch, tmp_path, rules):
+    rules_file = tmp_path / 'categorization_rules.json'
+    rules_file.write_text(json.dumps(rules))
+    categorization_rules = CategorizationRules(str(rules_file), check_interval=0)
+    monkeypatch.setattr(app_module, 'categorization_rules', categorization_rules)
+    monkeypatch.setattr(app_module, 'categorizer', CategorizationCache(categorization_rules, str(tmp_path / 'categorization_cache.json')))
+    return rules_file
+
+def test_rule_changes_move_auto_assigned_files_but_not_user_choices(client, tmp_path, monkeypatch):
+    rules = json.loads(open('categorization_rules.json').read())
+    rules_file = use_rules(monkeypatch, tmp_path, rules)
+    assert app_module.verify_categories_integrity()
+    assert client.post('/update_category', json={'file_id': 'file-0001', 'new_category': 'General Documents'}).get_json()['success']
+    
+    rules['categories']['Financial Reports'].remove('budget')
+    rules['categories']['Building Management'].append('budget')
+    rules_file.write_text(json.dumps(rules))
+    os.utime(rules_file, ns=(0, 0))
+    assert app_module.verify_categories_integrity()
+    
+    all_categories, file_categories = app_module.load_categories()
+    assert file_categories.pop('file-0001') == 'General Documents'
+    assert set(file_categories.values()) == {'Building Management'}
+
+def test_legacy_mappings_the_rules_disagree_with_are_kept_as_user_choices(client, tmp_path, monkeypatch):
+    rules = json.loads(open('categorization_rules.json').read())
+    rules_file = use_rules(monkeypatch, tmp_path, rules)
+    # Written before assignments were tracked: no user_assigned or rules_applied keys
+    stored = json.loads((tmp_path / 'categories.json').read_text())
+    stored['file_categories']['file-0002'] = 'Uncategorized'
+    (tmp_path / 'categories.json').write_text(json.dumps(stored))
+    assert app_module.verify_categories_integrity()
+    
+    rules['categories']['Financial Reports'].remove('budget')
+    rules_file.write_text(json.dumps(rules))
+    os.utime(rules_file, ns=(0, 0))
+    assert app_module.verify_categories_integrity()
+    
+    all_categories, file_categories = app_module.load_categories()
+    assert file_categories.pop('file-0002') == 'Uncategorized'
+    assert set(file_categories.values()) == {'General Documents'}
@@ -0,0 +1,22 @@
+import json
+import time
+
+from catalog_version import CatalogVersion
+
+def test_workers_share_last_modified_before_the_first_bump(tmp_path):
+    path = str(tmp_path / 'catalog_version.json')
+    first = CatalogVersion(path)
+    time.sleep(1.1)
+    second = CatalogVersion(path)
+    assert first.current() == second.current() == 0
+    assert first.last_modified() == second.last_modified()
+
+def test_bump_is_seen_by_other_workers(tmp_path):
+    path = tmp_path / 'catalog_version.json'
+    first = CatalogVersion(str(path))
+    second = CatalogVersion(str(path))
+    assert first.bump('test') == 1
+    assert second.bump('test') == 2
+    assert first.current() == 2
+    assert json.loads(path.read_text())['version'] == 2
+    assert not list(tmp_path.glob('*.tmp'))
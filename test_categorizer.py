@@ -0,0 +1,156 @@
+import os
+import json
+import time
+from categorizer import Categorizer, CategorizationRules, CategorizationCache, load_rules
+
+RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'categorization_rules.json')
+
+def write_rules(path, categories, version, fallback_rules=()):
+    with open(path, 'w') as f:
+        json.dump({'version': version, 'categories': categories, 'fallback_rules': list(fallback_rules)}, f)
+    # Make the change visible even when it lands within the filesystem's mtime granularity
+    os.utime(path, ns=(version * 10**9, version * 10**9))
+
+def test_filename_keywords_pick_a_category():
+    categorizer = load_rules(RULES_FILE)
+    assert categorizer.categorize('2024 Budget.pdf') == 'Financial Reports'
+    assert categorizer.categorize('Board Meeting Minutes.pdf') == 'Meeting Documents'
+    assert categorizer.categorize('Pool Schedule.pdf') == 'Building Management'
+    assert categorizer.categorize('scan0001.pdf') == 'General Documents'
+
+def test_specific_keywords_outweigh_shared_ones():
+    categorizer = load_rules(RULES_FILE)
+    # 'inspection' is shared by three categories, 'elevator' belongs to one
+    ranked = categorizer.score_batch([('Elevator Inspection.pdf', None)])[0]
+    assert ranked[0][0] == 'Maintenance & Installation'
+    assert ranked[0][1] > ranked[1][1]
+    assert abs(sum(confidence for category, confidence in ranked) - 1.0) < 0.2
+
+def test_ties_keep_declaration_order():
+    categorizer = load_rules(RULES_FILE)
+    # 'policy' is shared by Legal, Insurance and Rules; the old if/elif chain picked Legal
+    assert categorizer.categorize('Policy.pdf') == 'Legal & Governance'
+
+def test_content_is_scored_when_filename_is_silent():
+    categorizer = load_rules(RULES_FILE)
+    documents = [
+        ('scan0001.pdf', 'The quorum was reached and the agenda approved by the committee.'),
+        ('scan0002.pdf', 'A competent carpenter arrived.'),
+    ]
+    assert categorizer.categorize_batch(documents) == ['Meeting Documents', 'General Documents']
+
+def test_custom_keywords():
+    categorizer = Categorizer({'Pool': ['pool', 'swim'], 'Gym': ['gym']}, default='Other')
+    assert categorizer.score_batch([('Pool hours.pdf', None), ('Gym swim.pdf', None), ('x.pdf', None)]) == [
+        [('Pool', 1.0)],
+        [('Pool', 0.5), ('Gym', 0.5)],
+        [('Other', 0.0)],
+    ]
+    assert categorizer.category_names == ['Gym', 'Other', 'Pool']
+
+def test_rules_file_lists_the_default_categories():
+    assert load_rules(RULES_FILE).category_names == [
+        "Building Management", "Emergency & Safety", "Financial Reports",
+        "General Documents", "Insurance & Assessments", "Legal & Governance",
+        "Maintenance & Installation", "Meeting Documents", "Resident Information",
+        "Rules & Regulations", "Structural Reports", "Uncategorized"
+    ]
+
+def test_rules_reload_when_the_file_changes(tmp_path):
+    path = str(tmp_path / 'rules.json')
+    write_rules(path, {'Pool': ['pool']}, 1)
+    rules = CategorizationRules(path, check_interval=0)
+    assert rules.current().categorize('Gym.pdf') == 'General Documents'
+    write_rules(path, {'Pool': ['pool'], 'Gym': ['gym']}, 2)
+    assert rules.current().categorize('Gym.pdf') == 'Gym'
+
+    # A broken edit keeps the last good rules
+    with open(path, 'w') as f:
+        f.write('{not json')
+    os.utime(path, ns=(3 * 10**9, 3 * 10**9))
+    assert rules.current().version == 2
+
+class CountingRules(CategorizationRules):
+    """Records which filenames reach the categorizer."""
+    def __init__(self, *args, **kwargs):
+        self.scored = []
+        super().__init__(*args, **kwargs)
+
+    def current(self, force=False):
+        categorizer = super().current(force)
+        if 'score_batch' in vars(categorizer):
+            return categorizer
+        original = categorizer.score_batch
+        def score_batch(documents, *args, **kwargs):
+            self.scored.extend(filename for filename, content in documents)
+            return original(documents, *args, **kwargs)
+        categorizer.score_batch = score_batch
+        return categorizer
+
+def test_cache_scores_each_document_once_and_persists(tmp_path):
+    path = str(tmp_path / 'categorization_cache.json')
+    rules = CountingRules(RULES_FILE)
+    cache = CategorizationCache(rules, path)
+    assert cache.categorize_batch([('Budget.pdf', None), ('Minutes.pdf', None)]) == ['Financial Reports', 'Meeting Documents']
+    assert cache.score_batch([('Budget.pdf', None), ('Minutes.pdf', None)], top=1) == [
+        [('Financial Reports', 1.0)], [('Meeting Documents', 1.0)]
+    ]
+    assert rules.scored == ['Budget.pdf', 'Minutes.pdf']
+
+    # Same text under the same name hits; different content is a different document
+    cache.categorize('scan.pdf', 'agenda')
+    cache.categorize('scan.pdf', 'agenda')
+    cache.categorize('scan.pdf', 'invoice')
+    assert rules.scored[2:] == ['scan.pdf', 'scan.pdf']
+
+    # Misses are saved in one batch rather than one write each
+    assert not os.path.exists(path)
+    cache.flush()
+
+    # Another worker with the same rules reuses the saved results
+    other = CountingRules(RULES_FILE)
+    assert CategorizationCache(other, path).categorize('Budget.pdf') == 'Financial Reports'
+    assert other.scored == []
+
+def test_rule_changes_rescore_only_affected_documents(tmp_path):
+    rules_path = str(tmp_path / 'rules.json')
+    cache_path = str(tmp_path / 'categorization_cache.json')
+    write_rules(rules_path, {'Pool': ['pool', 'swim'], 'Gym': ['gym']}, 1, [('hours', 'Pool')])
+    rules = CountingRules(rules_path, check_interval=0)
+    cache = CategorizationCache(rules, cache_path)
+    filenames = ['Pool rules.pdf', 'Gym schedule.pdf', 'Swim team.pdf', 'Spa hours.pdf', 'Yoga.pdf', 'Sauna.pdf']
+    assert cache.categorize_batch([(filename, None) for filename in filenames]) == [
+        'Pool', 'Gym', 'Pool', 'Pool', 'General Documents', 'General Documents'
+    ]
+
+    # Moving 'swim' touches one document and the new 'yoga' keyword one more
+    write_rules(rules_path, {'Pool': ['pool'], 'Gym': ['gym', 'swim', 'yoga']}, 2, [('hours', 'Pool')])
+    rules.scored.clear()
+    assert cache.categorize_batch([(filename, None) for filename in filenames]) == [
+        'Pool', 'Gym', 'Gym', 'Pool', 'Gym', 'General Documents'
+    ]
+    assert sorted(rules.scored) == ['Swim team.pdf', 'Yoga.pdf']
+
+    # Fallback changes only touch documents that matched no keyword
+    write_rules(rules_path, {'Pool': ['pool'], 'Gym': ['gym', 'swim', 'yoga']}, 3, [('sauna', 'Gym')])
+    rules.scored.clear()
+    assert cache.categorize('Sauna.pdf') == 'Gym'
+    assert sorted(rules.scored) == ['Sauna.pdf', 'Spa hours.pdf']
+
+    # A restarted worker picks up the saved results without rescoring anything
+    restarted = CountingRules(rules_path)
+    assert CategorizationCache(restarted, cache_path).categorize_batch([(filename, None) for filename in filenames]) == [
+        'Pool', 'Gym', 'Gym', 'General Documents', 'Gym', 'Gym'
+    ]
+    assert restarted.scored == []
+
+def test_cache_saves_new_results_after_the_delay(tmp_path):
+    path = str(tmp_path / 'categorization_cache.json')
+    cache = CategorizationCache(CategorizationRules(RULES_FILE), path, save_delay=0.05)
+    cache.categorize('Budget.pdf')
+    cache.categorize('Minutes.pdf')
+    deadline = time.time() + 5
+    while not os.path.exists(path) and time.time() < deadline:
+        time.sleep(0.01)
+    with open(path) as f:
+        assert len(json.load(f)['results']) == 2
@@ -0,0 +1,46 @@
+import pytest
+from circuit_breaker import CircuitBreaker, CircuitOpenError, OPEN, HALF_OPEN, CLOSED
+
+def fail():
+    raise ConnectionError("down")
+
+def test_circuit_opens_after_consecutive_failures_and_fails_fast():
+    breaker = CircuitBreaker('test', failure_threshold=2, reset_seconds=60)
+    for attempt in range(2):
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+    assert breaker.state == OPEN
+    assert not breaker.available()
+    calls = []
+    with pytest.raises(CircuitOpenError):
+        breaker.call(calls.append, 1)
+    assert calls == []
+
+def test_half_open_trial_closes_or_reopens_the_circuit():
+    breaker = CircuitBreaker('test', failure_threshold=1, reset_seconds=0)
+    with pytest.raises(ConnectionError):
+        breaker.call(fail)
+    assert breaker.available()
+    with pytest.raises(ConnectionError):
+        breaker.call(fail)
+    assert breaker.state == OPEN
+    assert breaker.call(lambda: 'ok') == 'ok'
+    assert breaker.state == CLOSED
+
+def test_only_one_trial_call_while_half_open():
+    breaker = CircuitBreaker('test', failure_threshold=1, reset_seconds=0)
+    with pytest.raises(ConnectionError):
+        breaker.call(fail)
+
+    def trial():
+        assert breaker.state == HALF_OPEN
+        with pytest.raises(CircuitOpenError):
+            breaker.call(lambda: None)
+        return 'ok'
+    assert breaker.call(trial) == 'ok'
+
+def test_errors_that_are_not_outages_do_not_count():
+    breaker = CircuitBreaker('test', failure_threshold=1, is_failure=lambda error: not isinstance(error, ValueError))
+    with pytest.raises(ValueError):
+        breaker.call(int, 'not a number')
+    assert breaker.state == CLOSED
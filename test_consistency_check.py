@@ -0,0 +1,54 @@
+import io
+import json
+import random
+import consistency_check
+from consistency_check import (
+    iter_store, read_store_field, external_sort, merge_join, check_consistency, remove_stale_entries
+)
+
+def write_store(path, categories, file_categories):
+    with open(path, 'w') as f:
+        json.dump({'categories': categories, 'file_categories': file_categories}, f, indent=4)
+
+def test_store_is_read_item_by_item(tmp_path, monkeypatch):
+    path = str(tmp_path / 'categories.json')
+    mapping = {f'file-{i:03d}': f'Category {i % 3}' for i in range(50)}
+    write_store(path, ['Category 0', 'Category 1', 'Category 2', 'Empty'], mapping)
+    # Tiny reads make values straddle chunk boundaries
+    monkeypatch.setattr(consistency_check, 'READ_CHUNK_CHARS', 7)
+    assert dict(iter_store(path, 'file_categories')) == mapping
+    assert read_store_field(path, 'categories') == ['Category 0', 'Category 1', 'Category 2', 'Empty']
+    assert read_store_field(path, 'missing', []) == []
+
+def test_external_sort_spills_and_merges():
+    records = [(f'id-{i:04d}', i) for i in range(1000)]
+    shuffled = list(records)
+    random.Random(3).shuffle(shuffled)
+    assert list(external_sort(shuffled, chunk_size=64)) == records
+
+def test_merge_join_pairs_keys_from_both_sides():
+    joined = list(merge_join([('a', 1), ('c', 3), ('d', 4)], [('b', 'B'), ('c', 'C')]))
+    assert joined == [('a', 1, None), ('b', None, 'B'), ('c', 3, 'C'), ('d', 4, None)]
+
+def test_check_and_fix_keep_declared_categories(tmp_path):
+    path = str(tmp_path / 'categories.json')
+    write_store(path, ['Financial Reports', 'Unused Category'], {
+        'file-1': 'Financial Reports', 'file-2': 'Financial Reports', 'file-gone': 'Financial Reports'
+    })
+    diff = io.StringIO()
+    summary, stale_ids = check_consistency(
+        iter([('file-3', 'New.pdf'), ('file-2', 'Budget.pdf'), ('file-1', 'Audit.pdf')]), path, diff, chunk_size=2
+    )
+    assert summary == {'openai_files': 3, 'categorized_files': 3, 'missing_from_openai': 1, 'missing_from_categories': 1}
+    assert [json.loads(line) for line in diff.getvalue().splitlines()] == [
+        {'op': 'missing_from_categories', 'id': 'file-3', 'filename': 'New.pdf'},
+        {'op': 'missing_from_openai', 'id': 'file-gone', 'category': 'Financial Reports'},
+    ]
+
+    assert remove_stale_entries(path, stale_ids) == 1
+    with open(path) as f:
+        text = f.read()
+    expected = {'categories': ['Financial Reports', 'Unused Category'],
+                'file_categories': {'file-1': 'Financial Reports', 'file-2': 'Financial Reports'}}
+    assert json.loads(text) == expected
+    assert text == json.dumps(expected, indent=4)
@@ -0,0 +1,39 @@
+import os
+import pytest
+from file_cache import FileCache
+
+def chunks(data, size=4):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+def test_fill_streams_chunks_and_caches_complete_files(tmp_path):
+    cache = FileCache(str(tmp_path / 'cache'), max_bytes=100)
+    assert cache.lookup('file-a') is None
+    assert b''.join(cache.fill('file-a', chunks(b'hello world'))) == b'hello world'
+    with open(cache.lookup('file-a'), 'rb') as f:
+        assert f.read() == b'hello world'
+
+def test_interrupted_download_leaves_nothing_behind(tmp_path):
+    cache = FileCache(str(tmp_path / 'cache'), max_bytes=100)
+    stream = cache.fill('file-a', chunks(b'hello world'))
+    next(stream)
+    stream.close()
+    assert cache.lookup('file-a') is None
+    assert os.listdir(cache.directory) == []
+
+def test_least_recently_used_files_are_evicted(tmp_path):
+    cache = FileCache(str(tmp_path / 'cache'), max_bytes=25)
+    for age, file_id in enumerate(['file-a', 'file-b']):
+        cache.store(file_id, chunks(b'x' * 10))
+        os.utime(cache.path(file_id), (1000 + age, 1000 + age))
+    # Reading file-a makes file-b the least recently used
+    cache.lookup('file-a')
+    cache.store('file-c', chunks(b'y' * 10))
+    assert cache.lookup('file-b') is None
+    assert cache.lookup('file-a') and cache.lookup('file-c')
+    assert cache.size() == 20
+
+def test_file_ids_cannot_escape_the_cache_directory(tmp_path):
+    cache = FileCache(str(tmp_path / 'cache'))
+    with pytest.raises(ValueError):
+        cache.lookup('../secrets')
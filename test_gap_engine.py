@@ -0,0 +1,39 @@
+import random
+from gap_engine import GapEngine, build_bitmap, missing_ranges, expand_ranges, month_index, month_label
+
+def naive_missing(indices, start, end):
+    present = set(indices)
+    return [index for index in range(start, end + 1) if index not in present]
+
+def test_missing_ranges_matches_month_by_month_scan():
+    rng = random.Random(42)
+    for _ in range(200):
+        indices = rng.sample(range(24000, 24200), rng.randint(1, 60))
+        start = rng.randint(23990, 24100)
+        end = rng.randint(start, 24210)
+        bitmap, base = build_bitmap(indices)
+        assert expand_ranges(missing_ranges(bitmap, base, start, end)) == naive_missing(indices, start, end)
+
+def test_find_gaps_defaults_to_series_span_and_caches():
+    engine = GapEngine()
+    indices = [month_index(2024, 1), month_index(2024, 2), month_index(2024, 5)]
+    ranges = engine.find_gaps('Budget', indices)
+    assert ranges == [(month_index(2024, 3), month_index(2024, 4))]
+    assert engine.find_gaps('Budget', list(reversed(indices))) is ranges
+    assert engine.missing_months('Budget', indices) == ['March 2024', 'April 2024']
+
+def test_month_label_round_trip():
+    assert month_label(month_index(2023, 12)) == 'December 2023'
+    assert month_label(month_index(2024, 1)) == 'January 2024'
+
+def test_find_gaps_with_a_known_revision_skips_the_months():
+    engine = GapEngine()
+    indices = [month_index(2024, 1), month_index(2024, 4)]
+    assert engine.missing_months('Budget', indices, revision=7) == ['February 2024', 'March 2024']
+
+    def months():
+        raise AssertionError("months should not be collected for a cached revision")
+        yield
+    assert engine.missing_months('Budget', months(), revision=7) == ['February 2024', 'March 2024']
+    assert engine.cached_months('Budget', 8) is None
+    assert engine.missing_months('Budget', [month_index(2024, 1), month_index(2024, 2)], revision=8) == []
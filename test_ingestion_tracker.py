@@ -0,0 +1,48 @@
+from types import SimpleNamespace
+from ingestion_tracker import IngestionTracker, MemoryIngestionStore
+
+class FakeVectorStoreFiles:
+    def __init__(self, statuses):
+        self.statuses = statuses
+        self.list_calls = []
+
+    def list(self, vector_store_id, limit=100, order='desc', after=None):
+        self.list_calls.append(after)
+        ids = sorted(self.statuses, reverse=True)
+        if after:
+            ids = ids[ids.index(after) + 1:]
+        data = [SimpleNamespace(id=file_id, status=self.statuses[file_id], last_error=None) for file_id in ids[:limit]]
+        return SimpleNamespace(data=data, has_more=len(ids) > limit)
+
+def make_tracker(statuses):
+    files = FakeVectorStoreFiles(statuses)
+    analyzer = SimpleNamespace(
+        limited_mode=False,
+        vector_store_id='vs_test',
+        client=SimpleNamespace(beta=SimpleNamespace(vector_stores=SimpleNamespace(files=files)))
+    )
+    tracker = IngestionTracker(analyzer, store=MemoryIngestionStore())
+    # Exercise poll_once directly rather than through the background thread
+    tracker._ensure_running = lambda: None
+    return tracker, files
+
+def test_poll_once_checks_all_pending_files_with_one_paged_listing():
+    statuses = {f'file-{i:04d}': 'completed' for i in range(250)}
+    statuses['file-0249'] = 'in_progress'
+    statuses['file-0248'] = 'failed'
+    tracker, files = make_tracker(statuses)
+    tracker.track(['file-0249', 'file-0248', 'file-0200'])
+
+    assert tracker.poll_once() == 2
+    # Every pending file is on the first page, so no further pages are fetched
+    assert files.list_calls == [None]
+    assert tracker.statuses(['file-0249', 'file-0248', 'file-0200']) == {
+        'file-0249': {'status': 'in_progress', 'error': None},
+        'file-0248': {'status': 'failed', 'error': None},
+        'file-0200': {'status': 'completed', 'error': None},
+    }
+
+    statuses['file-0249'] = 'completed'
+    assert tracker.poll_once() == 1
+    assert tracker.summary() == {'completed': 2, 'failed': 1}
+    assert tracker.poll_once() == 0
@@ -0,0 +1,63 @@
+import os
+import time
+import logging
+import pytest
+import logging_config
+from logging_config import DebugRateLimitFilter
+
+def debug_record(msg):
+    return logging.LogRecord('test', logging.DEBUG, __file__, 1, msg, None, None)
+
+def test_debug_records_beyond_the_burst_are_dropped_and_reported(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(logging_config.time, 'monotonic', lambda: now[0])
+    rate_filter = DebugRateLimitFilter(burst=2, window=10)
+    assert [rate_filter.filter(debug_record('Parsed %s')) for i in range(4)] == [True, True, False, False]
+
+    now[0] += 10
+    record = debug_record('Parsed %s')
+    assert rate_filter.filter(record)
+    assert record.msg == 'Parsed %s [2 similar messages suppressed]'
+
+def test_expired_templates_are_forgotten(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(logging_config.time, 'monotonic', lambda: now[0])
+    rate_filter = DebugRateLimitFilter(burst=2, window=10, max_templates=50)
+    for i in range(200):
+        rate_filter.filter(debug_record(f"Parsed file-{i}"))
+    assert len(rate_filter._windows) == 50
+
+    now[0] += 10
+    rate_filter.filter(debug_record('Parsed again'))
+    assert list(rate_filter._windows) == [('test', 'Parsed again')]
+
+@pytest.fixture
+def restore_logging():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    yield
+    logging_config.stop_log_collector()
+    logging_config.stop_listener()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+def test_forked_workers_log_through_the_collector(tmp_path, restore_logging):
+    log_file = tmp_path / 'app.log'
+    logging_config.configure_logging(str(log_file), 'INFO')
+    logging_config.start_log_collector()
+
+    pid = os.fork()
+    if pid == 0:
+        logging_config.restart_listener()
+        logging.getLogger('worker').info('hello from %s', 'the worker')
+        logging_config.stop_listener()
+        os._exit(0)
+    os.waitpid(pid, 0)
+
+    deadline = time.time() + 5
+    while 'hello from the worker' not in log_file.read_text() and time.time() < deadline:
+        time.sleep(0.05)
+    assert 'worker - INFO - hello from the worker' in log_file.read_text()
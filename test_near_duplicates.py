@@ -0,0 +1,80 @@
+import random
+from near_duplicates import NearDuplicateIndex, shingles
+
+WORDS = ['owner', 'unit', 'board', 'roof', 'pool', 'reserve', 'budget', 'elevator', 'garage', 'insurance',
+         'vote', 'meeting', 'repair', 'notice', 'declaration', 'amendment', 'parking', 'lobby', 'paint', 'fee']
+
+def make_text(seed, words=400):
+    rng = random.Random(seed)
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+def lightly_edited(text, seed, edits=5):
+    rng = random.Random(seed)
+    words = text.split()
+    for _ in range(edits):
+        words[rng.randrange(len(words))] = 'edited'
+    return ' '.join(words)
+
+def test_near_duplicates_are_clustered_and_distinct_documents_are_not(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path / 'near.sqlite3'))
+    declaration = make_text(1)
+    matches = index.add_documents([
+        ('declaration', declaration),
+        ('declaration-rescan', lightly_edited(declaration, 2)),
+        ('minutes', make_text(3)),
+        ('budget', make_text(4)),
+    ])
+    assert set(matches['declaration-rescan']) == {'declaration'}
+
+    # New arrivals are matched incrementally against everything indexed so far
+    matches = index.add_documents([('declaration-copy', declaration)])
+    assert set(matches['declaration-copy']) == {'declaration', 'declaration-rescan'}
+
+    clusters = index.clusters()
+    assert len(clusters) == 1
+    assert clusters[0]['files'] == ['declaration', 'declaration-copy', 'declaration-rescan']
+    assert all(similarity >= 0.8 for a, b, similarity in clusters[0]['pairs'])
+
+    # Removal updates other workers' view of the saved signatures too
+    other = NearDuplicateIndex(str(tmp_path / 'near.sqlite3'))
+    index.remove_document('declaration-copy')
+    assert other.clusters()[0]['files'] == ['declaration', 'declaration-rescan']
+
+def test_workers_bucket_only_changed_signatures(tmp_path, monkeypatch):
+    path = str(tmp_path / 'near.sqlite3')
+    index = NearDuplicateIndex(path)
+    other = NearDuplicateIndex(path)
+    declaration = make_text(1)
+    index.add_documents([('declaration', declaration), ('minutes', make_text(3))])
+    assert other.clusters() == []
+
+    added = []
+    add = other._add
+    monkeypatch.setattr(other, '_add', lambda file_id, signature: added.append(file_id) or add(file_id, signature))
+    index.add_documents([('declaration-rescan', lightly_edited(declaration, 2))])
+    assert other.clusters()[0]['files'] == ['declaration', 'declaration-rescan']
+    assert added == ['declaration-rescan']
+
+def test_numpy_signatures_from_older_versions_are_imported(tmp_path):
+    import numpy as np
+    old = NearDuplicateIndex(str(tmp_path / 'scratch.sqlite3'))
+    declaration = make_text(1)
+    signatures = [old.hasher.signature(shingles(text)) for text in (declaration, lightly_edited(declaration, 2))]
+    np.savez_compressed(
+        str(tmp_path / 'near.npz'),
+        file_ids=np.array(['declaration', 'declaration-rescan'], dtype=str),
+        signatures=np.array(signatures, dtype=np.uint32)
+    )
+    index = NearDuplicateIndex(str(tmp_path / 'near.npz'))
+    assert index.path == str(tmp_path / 'near.sqlite3')
+    assert index.clusters()[0]['files'] == ['declaration', 'declaration-rescan']
+
+def test_catalog_removal_reaches_signatures_added_by_another_worker(tmp_path):
+    path = str(tmp_path / 'near.sqlite3')
+    index = NearDuplicateIndex(path)
+    other = NearDuplicateIndex(path)
+    declaration = make_text(1)
+    other.add_documents([('declaration', declaration), ('declaration-copy', declaration)])
+    assert 'declaration-copy' not in index
+    index.on_catalog_change('removed', {'id': 'declaration-copy'})
+    assert other.clusters() == []
@@ -0,0 +1,67 @@
+import httpx
+import openai_client
+from openai_client import RateLimitedTransport, AdaptiveLimiter, parse_reset, endpoint_class
+
+class ScriptedTransport(httpx.BaseTransport):
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def handle_request(self, request):
+        self.requests.append(request)
+        status, headers = self.responses.pop(0)
+        return httpx.Response(status, headers=headers, json={})
+
+def send(transport, method, path):
+    with httpx.Client(transport=transport, base_url='https://api.openai.com') as client:
+        return client.request(method, path, json={'purpose': 'assistants'} if method == 'POST' else None)
+
+def test_parse_reset_and_endpoint_class():
+    assert parse_reset('6m0s') == 360
+    assert parse_reset('20ms') == 0.02
+    assert parse_reset('1.5s') == 1.5
+    assert parse_reset('2') == 2
+    assert parse_reset(None) is None
+    assert endpoint_class('/v1/vector_stores/vs-1/files') == 'vector_stores'
+    assert endpoint_class('/v1/threads/t-1/runs') == 'assistants'
+    assert endpoint_class('/v1/chat/completions') == 'other'
+
+def test_throttled_request_is_retried_after_server_delay(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(openai_client.time, 'sleep', sleeps.append)
+    inner = ScriptedTransport([
+        (429, {'retry-after-ms': '1500', 'x-ratelimit-limit-requests': '600', 'x-ratelimit-remaining-requests': '0'}),
+        (200, {'x-ratelimit-limit-requests': '600', 'x-ratelimit-remaining-requests': '599'}),
+    ])
+    transport = RateLimitedTransport(inner)
+    limiter = transport.state('files').limiter
+    limiter.limit = 8
+    response = send(transport, 'POST', '/v1/files')
+    assert response.status_code == 200
+    assert len(inner.requests) == 2
+    assert inner.requests[1].content == inner.requests[0].content
+    assert sleeps[0] >= 1.5
+    # Halved by the 429, then grown by one while quota is plentiful again
+    assert limiter.limit == 5
+    assert transport.state('files').bucket.rate == 10
+
+def test_server_errors_are_retried_only_when_idempotent(monkeypatch):
+    monkeypatch.setattr(openai_client.time, 'sleep', lambda seconds: None)
+    inner = ScriptedTransport([(500, {}), (500, {}), (200, {})])
+    transport = RateLimitedTransport(inner)
+    assert send(transport, 'POST', '/v1/assistants').status_code == 500
+    assert len(inner.requests) == 1
+    assert send(transport, 'GET', '/v1/assistants').status_code == 200
+    assert len(inner.requests) == 3
+
+def test_limiter_shrinks_when_quota_runs_low():
+    limiter = AdaptiveLimiter(initial=4, maximum=6)
+    limiter.adjust(0.05)
+    assert limiter.limit == 3
+    limiter.adjust(0.3)
+    assert limiter.limit == 3
+    for _ in range(5):
+        limiter.adjust(0.9)
+    assert limiter.limit == 6
+    limiter.adjust(throttled=True)
+    assert limiter.limit == 3
@@ -0,0 +1,122 @@
+import os
+import time
+from pypdf import PdfWriter
+import docx
+import psutil
+import preview_pipeline
+from preview_pipeline import PreviewStore, PreviewPipeline, extract_preview
+
+def running(pid):
+    try:
+        return psutil.Process(pid).status() != psutil.STATUS_ZOMBIE
+    except psutil.NoSuchProcess:
+        return False
+
+def make_file(i, filename, size=100):
+    return {'id': f'file-{i}', 'filename': filename, 'bytes': size, 'created_at': 1700000000 + i}
+
+def test_extract_preview_counts_words_and_pages(tmp_path):
+    text_path = tmp_path / 'minutes.txt'
+    text_path.write_text("Board   meeting\nminutes for March")
+    assert extract_preview(str(text_path), 'Minutes.txt') == {'first_page': 'Board meeting minutes for March', 'pages': None, 'words': 5}
+
+    pdf_path = tmp_path / 'blank.pdf'
+    writer = PdfWriter()
+    for page in range(3):
+        writer.add_blank_page(width=200, height=200)
+    with open(pdf_path, 'wb') as f:
+        writer.write(f)
+    assert extract_preview(str(pdf_path), 'Blank.pdf') == {'first_page': '', 'pages': 3, 'words': 0}
+
+    docx_path = tmp_path / 'rules.docx'
+    document = docx.Document()
+    document.add_paragraph("Pool hours are 8am to 10pm")
+    document.save(docx_path)
+    assert extract_preview(str(docx_path), 'Rules.docx')['words'] == 6
+
+    broken = extract_preview(str(text_path), 'Minutes.pdf')
+    assert broken['pages'] is None and broken['error']
+
+def test_pipeline_parses_only_new_or_changed_files(tmp_path):
+    fetched = []
+    def fetch(file):
+        fetched.append(file['id'])
+        path = tmp_path / f"{file['id']}.txt"
+        path.write_text(f"Contents of {file['filename']}")
+        return str(path), True
+
+    store = PreviewStore(str(tmp_path / 'previews.json'))
+    pipeline = PreviewPipeline(store, fetch, workers=1)
+    try:
+        files = [make_file(1, 'Budget.txt'), make_file(2, 'Minutes.txt')]
+        assert pipeline.process(files) == 2
+        assert store.get('file-1')['first_page'] == 'Contents of Budget.txt'
+        assert store.get('file-2')['words'] == 3
+        # Temporary downloads are removed once parsed
+        assert not (tmp_path / 'file-1.txt').exists()
+
+        files[1] = make_file(2, 'Minutes (revised).txt', size=200)
+        assert pipeline.process(files + [make_file(3, 'Rules.txt')]) == 2
+        assert fetched == ['file-1', 'file-2', 'file-2', 'file-3']
+
+        # Another worker sees the saved previews without parsing anything
+        other = PreviewStore(str(tmp_path / 'previews.json'))
+        assert other.outdated(files) == []
+        pipeline.on_catalog_change('removed', files[0])
+        assert other.get('file-1') is None
+    finally:
+        pipeline.close()
+
+def test_hung_parse_gets_an_error_preview_and_a_fresh_pool(tmp_path, monkeypatch):
+    monkeypatch.setattr(preview_pipeline, 'PREVIEW_TIMEOUT_SECONDS', 3)
+    def fetch(file):
+        path = tmp_path / file['filename']
+        if file['id'] == 'file-1':
+            # Opening a pipe nobody writes to blocks forever
+            os.mkfifo(path)
+        else:
+            path.write_text(f"Contents of {file['filename']}")
+        return str(path), False
+
+    store = PreviewStore(str(tmp_path / 'previews.json'))
+    pipeline = PreviewPipeline(store, fetch, workers=1)
+    killed = []
+    worker_pids = pipeline._worker_pids
+    monkeypatch.setattr(pipeline, '_worker_pids', lambda: killed.extend(worker_pids()) or set(killed))
+    try:
+        assert pipeline.process([make_file(1, 'Stuck.txt'), make_file(2, 'Minutes.txt')]) == 2
+        assert store.get('file-1')['error'] == 'Timed out after 3s'
+        # The parse queued behind the stuck one was resubmitted to the new pool
+        assert store.get('file-2')['first_page'] == 'Contents of Minutes.txt'
+
+        # The stuck process itself was stopped
+        assert len(killed) == 1
+        deadline = time.time() + 10
+        while running(killed[0]):
+            assert time.time() < deadline
+            time.sleep(0.1)
+    finally:
+        pipeline.close()
+
+def test_pipeline_passes_parsed_text_on_and_removes_local_copies(tmp_path):
+    store = PreviewStore(str(tmp_path / 'previews.json'))
+    indexed = []
+    pipeline = PreviewPipeline(store, lambda file: None, workers=1, on_text=indexed.extend)
+    try:
+        local = tmp_path / 'upload.parse'
+        local.write_text("Pool hours are 8am to 10pm")
+        file = make_file(1, 'Pool Rules.txt')
+        with pipeline._lock:
+            pipeline._local_paths[file['id']] = str(local)
+        assert pipeline.process([file]) == 1
+        assert indexed == [('file-1', 'Pool Rules.txt', 'Pool hours are 8am to 10pm')]
+        assert 'text' not in store.get('file-1')
+        assert not local.exists()
+
+        # A local copy of a file that already has a preview is not parsed again
+        local.write_text("Pool hours are 8am to 10pm")
+        pipeline.schedule_local(file, str(local))
+        assert not local.exists()
+        assert len(indexed) == 1
+    finally:
+        pipeline.close()
@@ -0,0 +1,45 @@
+from gap_engine import month_index, month_label
+from series_index import SeriesIndex, series_key
+
+def month_of(filename):
+    for year in (2023, 2024):
+        for month in range(1, 13):
+            if f'{year}-{month:02d}' in filename:
+                return month_index(year, month)
+    return None
+
+def make_file(file_id, filename, created_at=1700000000):
+    return {'id': file_id, 'filename': filename, 'created_at': created_at}
+
+def test_series_key_ignores_dates_versions_and_separators():
+    assert series_key('Budget_Report-2024-01_v2.pdf') == 'budget report'
+    assert series_key('budget report Feb 2024.pdf') == 'budget report'
+    assert series_key('Budget Report (1) final.docx') == 'budget report'
+    assert series_key('Board Minutes 03-15-2024.pdf') == 'board minutes'
+
+def test_incremental_updates_track_range_latest_and_gaps():
+    index = SeriesIndex(month_of)
+    index.build([
+        make_file('a', 'Budget Report 2024-01.pdf'),
+        make_file('b', 'Budget Report 2024-02.pdf'),
+        make_file('c', 'Budget Report 2024-05.pdf'),
+        make_file('d', 'Pool Rules.pdf'),
+    ])
+    assert index.series() == ['budget report']
+    assert index.date_range('budget report') == (month_index(2024, 1), month_index(2024, 5))
+    assert index.latest('budget report')['id'] == 'c'
+    assert index.gaps('budget report') == ['March 2024', 'April 2024']
+
+    index.on_catalog_change('added', make_file('e', 'Budget_Report_2024-03.pdf'))
+    index.on_catalog_change('removed', {'id': 'c'})
+    assert index.series_of('e') == 'budget report'
+    assert index.date_range('budget report') == (month_index(2024, 1), month_index(2024, 3))
+    assert index.latest('budget report')['id'] == 'e'
+    assert index.gaps('budget report') == []
+
+    index.remove('a')
+    index.remove('b')
+    index.remove('e')
+    assert index.members('budget report') == []
+    assert index.date_range('budget report') is None
+    assert month_label(month_index(2024, 3)) == 'March 2024'
@@ -0,0 +1,68 @@
+import time
+import task_queue
+from task_queue import TaskQueue, PermanentTaskError, PENDING, RUNNING, DONE, FAILED
+
+def make_queue(tmp_path):
+    # No worker threads; tests drive the queue with run_once()
+    return TaskQueue(str(tmp_path / 'tasks.sqlite3'), workers=0, max_attempts=3)
+
+def test_same_key_reuses_the_task(tmp_path):
+    queue = make_queue(tmp_path)
+    runs = []
+    queue.register('delete_file', lambda payload: runs.append(payload['file_id']))
+    first = queue.enqueue('delete_file', {'file_id': 'file-1'}, 'delete_file:file-1')
+    again = queue.enqueue('delete_file', {'file_id': 'file-1'}, 'delete_file:file-1')
+    assert again['id'] == first['id']
+    assert queue.run_once() and not queue.run_once()
+    assert queue.enqueue('delete_file', {'file_id': 'file-1'}, 'delete_file:file-1')['status'] == DONE
+    assert runs == ['file-1']
+
+def test_failures_are_retried_with_backoff_until_they_give_up(tmp_path, monkeypatch):
+    monkeypatch.setattr(task_queue, 'RETRY_BASE_SECONDS', 0)
+    queue = make_queue(tmp_path)
+    attempts = []
+    def flaky(payload):
+        attempts.append(1)
+        if len(attempts) < 2:
+            raise ConnectionError("timeout")
+    queue.register('flaky', flaky)
+    task = queue.enqueue('flaky', {}, 'flaky')
+    queue.run_once()
+    assert queue.get(task['id'])['status'] == PENDING
+    assert queue.get(task['id'])['last_error'] == 'timeout'
+    queue.run_once()
+    assert queue.get(task['id'])['status'] == DONE
+
+    queue.register('broken', lambda payload: 1 / 0)
+    task = queue.enqueue('broken', {}, 'broken')
+    for attempt in range(3):
+        queue.run_once()
+    assert queue.get(task['id'])['status'] == FAILED
+    assert queue.get(task['id'])['attempts'] == 3
+
+    # Asking again after a failure starts over
+    assert queue.enqueue('broken', {}, 'broken')['status'] == PENDING
+
+def test_permanent_errors_fail_at_once(tmp_path):
+    queue = make_queue(tmp_path)
+    def refuse(payload):
+        raise PermanentTaskError("file is not ours")
+    queue.register('refuse', refuse)
+    task = queue.enqueue('refuse', {}, 'refuse')
+    queue.run_once()
+    assert queue.get(task['id'])['status'] == FAILED
+
+def test_tasks_left_running_by_a_dead_process_are_resumed(tmp_path):
+    path = tmp_path / 'tasks.sqlite3'
+    crashed = TaskQueue(str(path), workers=0)
+    task = crashed.enqueue('delete_file', {'file_id': 'file-1'}, 'delete_file:file-1')
+    assert crashed._claim()['id'] == task['id']
+    crashed._connect().execute('UPDATE tasks SET lease_until = ? WHERE id = ?', (time.time() - 1, task['id']))
+
+    restarted = TaskQueue(str(path), workers=0)
+    runs = []
+    restarted.register('delete_file', lambda payload: runs.append(payload['file_id']))
+    assert [t['status'] for t in restarted.unfinished()] == [RUNNING]
+    assert restarted.run_once()
+    assert runs == ['file-1']
+    assert restarted.get(task['id'])['status'] == DONE
@@ -0,0 +1,78 @@
+from text_index import TextIndex, tokenize
+
+def test_bm25_ranks_documents_with_more_relevant_matches_first(tmp_path):
+    index = TextIndex(str(tmp_path / 'index.sqlite3'))
+    index.add_documents([
+        ('a', 'Pool Rules.pdf', 'The pool is open from 9am. No glass near the pool. Pool towels are provided.'),
+        ('b', 'Minutes March.pdf', 'The board discussed the roof and briefly the pool heater.'),
+        ('c', 'Budget 2024.pdf', 'Reserve contributions and insurance premiums for 2024.'),
+    ])
+    results = index.search('pool')
+    assert [file_id for file_id, score, snippet in results] == ['a', 'b']
+    assert results[0][1] > results[1][1]
+    assert 'pool' in results[1][2].lower()
+    assert index.search('elevator') == []
+
+def test_index_updates_incrementally_and_persists(tmp_path):
+    path = str(tmp_path / 'index.sqlite3')
+    index = TextIndex(path)
+    index.add_document('a', 'Insurance.pdf', 'Flood insurance renewal notice')
+    index.add_document('b', 'Roof.pdf', 'Roof inspection found minor flood damage')
+    index.remove_document('a')
+    assert [file_id for file_id, score, snippet in index.search('flood')] == ['b']
+
+    # Another worker sees the saved index, and its own changes merge with ours
+    other = TextIndex(path)
+    assert [file_id for file_id, score, snippet in other.search('flood')] == ['b']
+    other.add_document('c', 'Notice.pdf', 'Flood watch for the garage level')
+    index.on_catalog_change('removed', {'id': 'b'})
+    assert [file_id for file_id, score, snippet in other.search('flood')] == ['c']
+
+def test_tokenize_drops_stopwords_and_single_characters():
+    assert tokenize('The Roof & a 2024 Budget-Report') == ['roof', '2024', 'budget', 'report']
+
+def test_workers_read_only_changed_documents_and_reload_after_compaction(tmp_path, monkeypatch):
+    import text_index
+    path = str(tmp_path / 'index.sqlite3')
+    index = TextIndex(path)
+    other = TextIndex(path)
+    index.add_documents([('a', 'Pool.pdf', 'Pool hours'), ('b', 'Roof.pdf', 'Roof repairs')])
+    assert [file_id for file_id, score, snippet in other.search('pool')] == ['a']
+
+    # Once loaded, the other worker only reads the documents named in new change log entries
+    loaded = []
+    add = other._add
+    monkeypatch.setattr(other, '_add', lambda file_id, *args: loaded.append(file_id) or add(file_id, *args))
+    index.add_document('c', 'Pool Rules.pdf', 'No glass near the pool')
+    assert sorted(file_id for file_id, score, snippet in other.search('pool')) == ['a', 'c']
+    assert loaded == ['c']
+
+    # A worker behind the compacted part of the log loads the whole index again
+    monkeypatch.setattr(text_index, 'CHANGE_LOG_KEEP', 1)
+    index.remove_document('a')
+    index.add_document('d', 'Pool Heater.pdf', 'Pool heater quote')
+    loaded.clear()
+    assert sorted(file_id for file_id, score, snippet in other.search('pool')) == ['c', 'd']
+    assert sorted(loaded) == ['b', 'c', 'd']
+    assert other.revision() == index.revision()
+
+def test_gzip_index_from_older_versions_is_imported(tmp_path):
+    import gzip
+    import json
+    with gzip.open(tmp_path / 'index.json.gz', 'wt', encoding='utf-8') as f:
+        json.dump({'format': 1, 'saved_at': 0, 'docs': {
+            'a': {'filename': 'Pool.pdf', 'text': 'Pool hours', 'terms': {'pool': 2, 'pdf': 1, 'hours': 1}}
+        }}, f)
+    index = TextIndex(str(tmp_path / 'index.json.gz'))
+    assert index.path == str(tmp_path / 'index.sqlite3')
+    assert [file_id for file_id, score, snippet in index.search('pool')] == ['a']
+    assert [file_id for file_id, score, snippet in TextIndex(index.path).search('hours')] == ['a']
+
+def test_catalog_removal_reaches_documents_indexed_by_another_worker(tmp_path):
+    path = str(tmp_path / 'index.sqlite3')
+    index = TextIndex(path)
+    other = TextIndex(path)
+    other.add_document('a', 'Pool.pdf', 'Pool hours')
+    assert 'a' not in index
+    index.on_catalog_change('removed', {'id': 'a'})
+    assert other.search('pool') == []
@@ -0,0 +1,63 @@
+import io
+import os
+import logging
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+try:
+    import docx
+except ImportError:
+    docx = None
+
+logger = logging.getLogger(__name__)
+
+# Long documents are cut off here; the opening pages carry most of what residents search for
+MAX_TEXT_CHARS = 200000
+
+PLAIN_TEXT_EXTENSIONS = {'.txt', '.md', '.csv'}
+
+def _pdf_text(stream):
+    if not PdfReader:
+        return ''
+    reader = PdfReader(stream)
+    parts = []
+    size = 0
+    for page in reader.pages:
+        text = page.extract_text() or ''
+        parts.append(text)
+        size += len(text)
+        if size >= MAX_TEXT_CHARS:
+            break
+    return '\n'.join(parts)
+
+def _docx_text(stream):
+    if not docx:
+        return ''
+    document = docx.Document(stream)
+    return '\n'.join(paragraph.text for paragraph in document.paragraphs)
+
+def extract_text_from_bytes(data, filename):
+    """Extract plain text from a document's bytes, choosing the parser by file extension."""
+    ext = os.path.splitext(filename)[1].lower()
+    try:
+        if ext in PLAIN_TEXT_EXTENSIONS:
+            text = data.decode('utf-8', errors='replace')
+        elif ext == '.pdf':
+            text = _pdf_text(io.BytesIO(data))
+        elif ext == '.docx':
+            text = _docx_text(io.BytesIO(data))
+        else:
+            # Legacy .doc and spreadsheets are searchable by filename only
+            text = ''
+        return text[:MAX_TEXT_CHARS]
+    except Exception as e:
+        logger.error(f"Error extracting text from {filename}: {str(e)}")
+        return ''
+
+def extract_text(file_path, filename=None):
+    """Extract plain text from a document on disk."""
+    with open(file_path, 'rb') as f:
+        return extract_text_from_bytes(f.read(), filename or os.path.basename(file_path))
@@ -0,0 +1,381 @@
+import os
+import re
+import sys
+import json
+import gzip
+import sqlite3
+import logging
+import threading
+from collections import Counter
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Bump when tokenization or the stored layout changes so old indexes are rebuilt
+INDEX_FORMAT = 1
+
+# Change log entries kept; a worker further behind than this reloads the whole index
+CHANGE_LOG_KEEP = 10000
+
+# Indexes saved before the move to SQLite are imported once from this file next to the database
+LEGACY_SUFFIX = '.json.gz'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    file_id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    text TEXT NOT NULL,
+    terms TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    file_id TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value
+);
+"""
+
+# Standard BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Text kept per document for building result snippets
+SNIPPET_SOURCE_CHARS = 20000
+SNIPPET_RADIUS = 80
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'has', 'in', 'is', 'it',
+    'of', 'on', 'or', 'that', 'the', 'this', 'to', 'was', 'were', 'will', 'with'
+}
+
+def tokenize(text):
+    """Split text into lowercase index terms."""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if len(token) > 1 and token not in STOPWORDS]
+
+class TextIndex:
+    """Inverted index over extracted document text with BM25 ranking.
+
+    Postings are kept as {term: {slot: term frequency}} and turned into NumPy
+    arrays per term on first use, so a query is a handful of vectorized
+    operations over the matching documents only. Documents and their term
+    counts are stored in SQLite shared by every worker on the host; each
+    write also appends the file ID to a change log, so other workers read
+    only the documents that changed since they last looked.
+    """
+
+    def __init__(self, path):
+        if path.endswith(LEGACY_SUFFIX):
+            # Settings written for the gzip JSON index keep working
+            path = path[:-len(LEGACY_SUFFIX)] + '.sqlite3'
+        self.path = path
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._seq = None
+        self._reset()
+        self._migrate()
+        self._reload_if_changed()
+
+    def _reset(self):
+        self._slots = {}
+        self._file_ids = []
+        self._free_slots = []
+        self._lengths = np.zeros(0, dtype=np.float32)
+        self._docs = {}
+        self._postings = {}
+        self._arrays = {}
+
+    def _grow(self, size):
+        if size > len(self._lengths):
+            lengths = np.zeros(max(size, 2 * len(self._lengths), 64), dtype=np.float32)
+            lengths[:len(self._lengths)] = self._lengths
+            self._lengths = lengths
+
+    def _add(self, file_id, filename, text, terms=None):
+        self._remove(file_id)
+        if terms is None:
+            terms = Counter(tokenize(f"{filename}\n{text}"))
+        slot = self._free_slots.pop() if self._free_slots else len(self._file_ids)
+        if slot == len(self._file_ids):
+            self._file_ids.append(file_id)
+        else:
+            self._file_ids[slot] = file_id
+        self._grow(slot + 1)
+        self._slots[file_id] = slot
+        self._lengths[slot] = sum(terms.values())
+        self._docs[file_id] = {'filename': filename, 'text': text[:SNIPPET_SOURCE_CHARS], 'terms': dict(terms)}
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[slot] = tf
+            self._arrays.pop(term, None)
+
+    def _remove(self, file_id):
+        slot = self._slots.pop(file_id, None)
+        if slot is None:
+            return False
+        doc = self._docs.pop(file_id)
+        for term in doc['terms']:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(slot, None)
+                if not postings:
+                    del self._postings[term]
+            self._arrays.pop(term, None)
+        self._lengths[slot] = 0
+        self._file_ids[slot] = None
+        self._free_slots.append(slot)
+        return True
+
+    def _term_arrays(self, term):
+        """Return (slots, term frequencies) for a term as NumPy arrays, cached until it changes."""
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            postings = self._postings.get(term, {})
+            arrays = (
+                np.fromiter(postings.keys(), dtype=np.int64, count=len(postings)),
+                np.fromiter(postings.values(), dtype=np.float32, count=len(postings))
+            )
+            self._arrays[term] = arrays
+        return arrays
+
+    def _connect(self):
+        """Return this thread's connection, reopening it after a fork."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _migrate(self):
+        """Create the tables, clearing an index built with another format or importing the old gzip JSON one."""
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'format'").fetchone()
+            if row and row[0] == INDEX_FORMAT:
+                conn.execute('COMMIT')
+                return
+            if row:
+                logger.warning(f"Rebuilding text index with unknown format {row[0]}")
+            # Readers that loaded the old contents see they are behind the log and load everything again
+            latest = conn.execute('SELECT COALESCE(MAX(seq), 0) FROM changes').fetchone()[0]
+            conn.execute('DELETE FROM docs')
+            conn.execute('DELETE FROM changes')
+            conn.executemany('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', [
+                ('format', INDEX_FORMAT),
+                ('compacted_through', max(latest, self._meta(conn).get('compacted_through', 0)))
+            ])
+            legacy_path = re.sub(r'\.sqlite3$', '', self.path) + LEGACY_SUFFIX
+            if row is None and os.path.exists(legacy_path):
+                self._import_legacy(conn, legacy_path)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    @staticmethod
+    def _meta(conn):
+        return dict(conn.execute('SELECT key, value FROM meta').fetchall())
+
+    @staticmethod
+    def _import_legacy(conn, legacy_path):
+        try:
+            with gzip.open(legacy_path, 'rt', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.error(f"Error importing text index from {legacy_path}: {str(e)}")
+            return
+        if data.get('format') != INDEX_FORMAT:
+            logger.warning(f"Not importing text index with unknown format {data.get('format')}")
+            return
+        conn.executemany('INSERT OR REPLACE INTO docs (file_id, filename, text, terms) VALUES (?, ?, ?, ?)', [
+            (file_id, doc['filename'], doc['text'], json.dumps(doc['terms'], separators=(',', ':')))
+            for file_id, doc in data['docs'].items()
+        ])
+        logger.info(f"Imported {len(data['docs'])} documents from {legacy_path}; it is no longer used")
+
+    def _reload_if_changed(self):
+        """Bring the in-memory index up to date with changes other processes have written.
+
+        Only documents changed since the last load are read. A reader that has
+        fallen behind the compacted part of the change log loads everything.
+        """
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN')
+            try:
+                compacted = self._meta(conn).get('compacted_through', 0)
+                latest = max(compacted, conn.execute('SELECT COALESCE(MAX(seq), 0) FROM changes').fetchone()[0])
+                if latest == self._seq:
+                    return
+                if self._seq is None or self._seq < compacted or self._seq > latest:
+                    self._reset()
+                    for file_id, filename, text, terms in conn.execute(
+                        'SELECT file_id, filename, text, terms FROM docs'
+                    ):
+                        self._add(file_id, filename, text, Counter(json.loads(terms)))
+                    logger.info(f"Loaded text index with {len(self._docs)} documents")
+                else:
+                    changed = [file_id for file_id, in conn.execute(
+                        'SELECT DISTINCT file_id FROM changes WHERE seq > ?', (self._seq,)
+                    )]
+                    for file_id in changed:
+                        row = conn.execute(
+                            'SELECT filename, text, terms FROM docs WHERE file_id = ?', (file_id,)
+                        ).fetchone()
+                        if row is None:
+                            self._remove(file_id)
+                        else:
+                            self._add(file_id, row[0], row[1], Counter(json.loads(row[2])))
+                self._seq = latest
+            finally:
+                conn.execute('COMMIT')
+        except Exception as e:
+            logger.error(f"Error loading text index: {str(e)}")
+
+    def _update(self, added=(), removed=()):
+        """Write documents and removals with their change log entries in one transaction, then load them."""
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany('INSERT OR REPLACE INTO docs (file_id, filename, text, terms) VALUES (?, ?, ?, ?)', added)
+            changed = [row[0] for row in added] + [
+                file_id for file_id in removed
+                if conn.execute('DELETE FROM docs WHERE file_id = ?', (file_id,)).rowcount
+            ]
+            if changed:
+                conn.executemany('INSERT INTO changes (file_id) VALUES (?)', [(file_id,) for file_id in changed])
+                cutoff = conn.execute('SELECT MAX(seq) FROM changes').fetchone()[0] - CHANGE_LOG_KEEP
+                if conn.execute('DELETE FROM changes WHERE seq <= ?', (cutoff,)).rowcount:
+                    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('compacted_through', ?)", (cutoff,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        with self._lock:
+            self._reload_if_changed()
+
+    def add_documents(self, documents):
+        """Index (file_id, filename, text) tuples and save once."""
+        documents = [doc for doc in documents if doc[2] or doc[1]]
+        if not documents:
+            return
+        self._update(added=[(
+            file_id,
+            filename,
+            text[:SNIPPET_SOURCE_CHARS],
+            json.dumps(Counter(tokenize(f"{filename}\n{text}")), separators=(',', ':'))
+        ) for file_id, filename, text in documents])
+        logger.info(f"Indexed text of {len(documents)} documents")
+
+    def add_document(self, file_id, filename, text):
+        self.add_documents([(file_id, filename, text)])
+
+    def remove_document(self, file_id):
+        """Drop a document from the index."""
+        self._update(removed=[file_id])
+
+    def on_catalog_change(self, event, file):
+        """Catalog listener that forgets deleted files, wherever they were deleted.
+
+        Another worker may have indexed the file after this one last loaded,
+        so the removal goes to the shared store unconditionally.
+        """
+        if event == 'removed':
+            self.remove_document(file['id'])
+
+    def documents(self):
+        """Return (file_id, filename, text) for every indexed document; text is truncated for snippets."""
+        with self._lock:
+            self._reload_if_changed()
+            return [(file_id, doc['filename'], doc['text']) for file_id, doc in self._docs.items()]
+
+    def __contains__(self, file_id):
+        return file_id in self._slots
+
+    def __len__(self):
+        return len(self._docs)
+
+    def revision(self):
+        """Changes whenever the stored index changes; used in response ETags."""
+        with self._lock:
+            self._reload_if_changed()
+            return self._seq
+
+    def snippet(self, file_id, terms):
+        """Return text around the first occurrence of any query term."""
+        text = self._docs[file_id]['text']
+        if not terms:
+            return text[:2 * SNIPPET_RADIUS].strip()
+        match = re.search(r'\b(?:' + '|'.join(re.escape(term) for term in terms) + r')', text, re.IGNORECASE)
+        if not match:
+            return text[:2 * SNIPPET_RADIUS].strip()
+        start = max(0, match.start() - SNIPPET_RADIUS)
+        end = min(len(text), match.end() + SNIPPET_RADIUS)
+        snippet = ' '.join(text[start:end].split())
+        return f"{'…' if start > 0 else ''}{snippet}{'…' if end < len(text) else ''}"
+
+    def search(self, query, limit=20):
+        """Return up to limit (file_id, score, snippet) tuples ranked by BM25."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            self._reload_if_changed()
+            doc_count = len(self._docs)
+            if not terms or not doc_count:
+                return []
+
+            lengths = self._lengths[:len(self._file_ids)]
+            average_length = float(lengths.sum()) / doc_count or 1.0
+            scores = np.zeros(len(self._file_ids), dtype=np.float32)
+            for term in terms:
+                slots, tfs = self._term_arrays(term)
+                if not len(slots):
+                    continue
+                idf = np.log(1 + (doc_count - len(slots) + 0.5) / (len(slots) + 0.5))
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[slots] / average_length)
+                scores[slots] += idf * tfs * (BM25_K1 + 1) / (tfs + norm)
+
+            matched = np.flatnonzero(scores)
+            if len(matched) > limit:
+                matched = matched[np.argpartition(-scores[matched], limit - 1)[:limit]]
+            ranked = matched[np.argsort(-scores[matched], kind='stable')]
+            return [
+                (self._file_ids[slot], float(scores[slot]), self.snippet(self._file_ids[slot], terms))
+                for slot in ranked
+            ]
+
+def backfill(index, analyzer):
+    """Index every catalog file that is not indexed yet, downloading its content from OpenAI."""
+    from text_extraction import extract_text_from_bytes
+
+    documents = []
+    for file in analyzer.get_file_list():
+        if file['id'] in index:
+            continue
+        try:
+            data = analyzer.client.files.content(file['id']).read()
+        except Exception as e:
+            logger.warning(f"Could not download {file['filename']} for indexing: {str(e)}")
+            data = b''
+        documents.append((file['id'], file['filename'], extract_text_from_bytes(data, file['filename'])))
+    index.add_documents(documents)
+    return len(documents)
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+    from assistant_analyzer import AssistantAnalyzer
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    index = TextIndex(sys.argv[1] if len(sys.argv) > 1 else os.getenv('TEXT_INDEX_FILE', 'text_index.sqlite3'))
+    analyzer = AssistantAnalyzer(
+        api_key=os.getenv('OPENAI_API_KEY'),
+        assistant_id=os.getenv('OPENAI_ASSISTANT_ID'),
+        vector_store_id=os.getenv('OPENAI_VECTOR_STORE_ID')
+    )
+    print(f"Indexed {backfill(index, analyzer)} files; the index now holds {len(index)} documents")